@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for codec, framing and get/set paths.
+
+Usage:
+  python3 benchmarks/run.py [--output result.json] [--compare baseline.json] [--threshold 1.2] [--filter lite]
+
+Results are printed as JSON. With --compare exit code is 1 if any benchmark is slower than baseline by more than
+threshold times.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import timeit
+from typing import Callable, Dict
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.tion import tion
+from tion_btle.s3 import S3
+from tion_btle.lite import Lite
+from tion_btle.framing import LiteFramer
+from tion_btle.loopback import LiteEmulator
+
+S3_FRAME = bytearray([
+    0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c, 0x0a, 0x00, 0x4b, 0x0a, 0x00, 0x33, 0x00,
+    0x5a
+])
+LITE_PAYLOAD = bytearray(LiteEmulator().payload)
+SETTINGS = {
+    "state": "on", "heater": "on", "sound": "off", "light": "on", "mode": "outside", "heater_temp": 20, "fan_speed": 3
+}
+
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+"""name -> function that prepares and returns benchmarked callable"""
+
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+@benchmark("decode_temperature")
+def _decode_temperature():
+    return lambda: tion.decode_temperature(0xfe)
+
+
+@benchmark("s3.decode_response")
+def _s3_decode():
+    device = S3("dummy")
+    return lambda: device._decode_response(S3_FRAME)
+
+
+@benchmark("lite.decode_response")
+def _lite_decode():
+    device = Lite("dummy")
+    return lambda: device._decode_response(LITE_PAYLOAD)
+
+
+def _collect(packets_count: int):
+    frame_size = {1: 17, 2: 39, 4: 74}[packets_count]
+    packets = [bytes(p) for p in LiteFramer().split(bytearray(frame_size))]
+    assert len(packets) == packets_count
+    device = Lite("dummy")
+
+    def collect():
+        for p in packets:
+            device._collect_message(p)
+    return collect
+
+
+for _count in (1, 2, 4):
+    benchmark("lite.collect_message.%d_packets" % _count)(lambda count=_count: _collect(count))
+
+
+@benchmark("s3.encode_request")
+def _s3_encode():
+    device = S3("dummy")
+    return lambda: device._encode_request(SETTINGS)
+
+
+@benchmark("lite.encode_request")
+def _lite_encode():
+    device = Lite("dummy")
+    return lambda: device._encode_request(SETTINGS)
+
+
+@benchmark("s3.get")
+def _s3_get():
+    return S3("dummy").get
+
+
+@benchmark("lite.get")
+def _lite_get():
+    return Lite("dummy").get
+
+
+@benchmark("s3.set")
+def _s3_set():
+    device = S3("dummy")
+    return lambda: device.set({"fan_speed": 2}, max_state_age=0)
+
+
+@benchmark("lite.set")
+def _lite_set():
+    device = Lite("dummy")
+    return lambda: device.set({"fan_speed": 2}, max_state_age=0)
+
+
+def measure(action: Callable[[], object], min_time: float, repeat: int) -> dict:
+    timer = timeit.Timer(action)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"ns_per_op": round(best * 1e9, 1), "ops_per_sec": round(1 / best, 1), "loops": number}
+
+
+def run(name_filter: str = "", min_time: float = 0.2, repeat: int = 5) -> dict:
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if name_filter in name:
+            results[name] = measure(setup(), min_time, repeat)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Find regressions
+    :return: list of (name, baseline ns, current ns) for benchmarks slower than baseline more than threshold times
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is not None and result["ns_per_op"] > old["ns_per_op"] * threshold:
+            regressions.append((name, old["ns_per_op"], result["ns_per_op"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tion_btle benchmarks")
+    parser.add_argument("--output", help="write JSON result to file")
+    parser.add_argument("--compare", help="baseline JSON result")
+    parser.add_argument("--threshold", type=float, default=1.2, help="allowed slowdown factor, default 1.2")
+    parser.add_argument("--filter", default="", help="run benchmarks with this substring in name")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per measurement, default 0.2")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per benchmark, default 5")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = run(args.filter, args.min_time, args.repeat)
+    dump = json.dumps(result, indent=2)
+    print(dump)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(dump)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for name, old, new in regressions:
+            print("REGRESSION %s: %.1f ns -> %.1f ns" % (name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,35 @@
 #!/usr/bin/env python3
+"""
+Pair breezers.
+
+Usage:
+  pair.py DEVICE [DEVICE ...]  pair listed breezers. DEVICE is MODEL:MAC, e.g. lite:XX:XX:XX:XX:XX:XX,
+                               or MAC to detect model by scan
+  pair.py                      scan and ask before pairing each breezer found nearby
+"""
 import sys
-from tion_btle.s3 import S3 as s3device
+from tion_btle.scanner import TionScanner
+
+
+def listed(specs, scanner):
+    for spec in specs:
+        model, mac, found = scanner.resolve(spec)
+        yield model(mac, adapter=found.adapter if found is not None else None)
+
+
+def confirmed(scanner):
+    found_any = False
+    for found in scanner.scan():
+        found_any = True
+        answer = input("Pair %s %s (rssi %d)? [y/N] " % (found.model.__name__, found.mac, found.rssi))
+        if answer.strip().lower() in ("y", "yes"):
+            yield found.model(found.mac, adapter=found.adapter)
+    if not found_any:
+        print("No breezers found")
+
 
-s3 = s3device(sys.argv[1])
-s3.pair()
+scanner = TionScanner()
+devices = listed(sys.argv[1:], scanner) if len(sys.argv) > 1 else confirmed(scanner)
+for device in devices:
+    print("Pairing %s %s" % (device.model, device.mac))
+    device.pair()
@@ -11,6 +11,12 @@ setup(
     long_description="Module for working with Tion breezers",
     url='https://github.com/TionAPI/tion_python/tree/dev',
     install_requires=['bluepy==1.3.0'],
+    extras_require={
+        'batch': ['numpy'],
+    },
     description='Python module for interacting with Tion breezers',
     packages=find_packages(),
+    entry_points={
+        'console_scripts': ['tion-gateway=tion_btle.gateway:main'],
+    },
 )
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+import asyncio
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.aio import AsyncS3
+from tion_btle.fleet import TionFleet
+from tion_btle.adapters import AdapterBalancer
+from tion_btle.retry import RetryPolicy
+from tion_btle.transport import TransportDisconnected
+from tion_btle.loopback import LoopbackTransport, S3Emulator
+
+
+class AdapterTransport(LoopbackTransport):
+    """Device is reachable only from some adapters"""
+    def __init__(self, reachable_from):
+        super().__init__(S3Emulator())
+        self.reachable_from = reachable_from
+        self.used = []
+
+    def connect(self, mac):
+        self.used.append(self.adapter)
+        if self.adapter not in self.reachable_from:
+            raise TransportDisconnected("Failed to connect to peripheral %s" % mac)
+        super().connect(mac)
+
+
+class TestBalancer(unittest.TestCase):
+    def test_spread_by_load(self):
+        balancer = AdapterBalancer(adapters=(0, 1))
+        for i in range(6):
+            balancer.assign("AA:00:00:00:00:%02X" % i)
+        self.assertEqual(balancer.load(), {0: 3, 1: 3})
+        self.assertEqual(balancer.assign("aa:00:00:00:00:00"), balancer.adapter_of("AA:00:00:00:00:00"))
+
+        balancer.release("AA:00:00:00:00:00")
+        self.assertEqual(sum(balancer.load().values()), 5)
+
+    def test_link_quality(self):
+        balancer = AdapterBalancer(adapters=(0, 1), rssi_per_device=10)
+        self.assertEqual(balancer.assign("AA:00:00:00:00:01", {0: -90, 1: -60}), 1)
+        self.assertEqual(balancer.assign("AA:00:00:00:00:02", {0: -90, 1: -60}), 1)
+        self.assertEqual(balancer.assign("AA:00:00:00:00:03", {0: -90, 1: -60}), 1)
+        self.assertEqual(balancer.assign("AA:00:00:00:00:04", {0: -90, 1: -60}), 0)
+
+    def test_failover(self):
+        balancer = AdapterBalancer(adapters=(0, 1), failure_threshold=2)
+        adapter = balancer.assign("AA:00:00:00:00:01")
+        self.assertIsNone(balancer.record_failure("AA:00:00:00:00:01"))
+        balancer.record_success("AA:00:00:00:00:01")
+        self.assertIsNone(balancer.record_failure("AA:00:00:00:00:01"))
+        other = balancer.record_failure("AA:00:00:00:00:01")
+        self.assertEqual(other, 1 - adapter)
+        self.assertEqual(balancer.adapter_of("AA:00:00:00:00:01"), other)
+
+        # both adapters failed, keep switching
+        balancer.record_failure("AA:00:00:00:00:01")
+        self.assertEqual(balancer.record_failure("AA:00:00:00:00:01"), adapter)
+
+
+class TestFleetFailover(unittest.TestCase):
+    def test_failover(self):
+        loop = asyncio.new_event_loop()
+        balancer = AdapterBalancer(adapters=(0, 1), failure_threshold=2)
+        fleet = TionFleet(balancer=balancer)
+        transport = AdapterTransport(reachable_from=[1])
+        device = AsyncS3("AA:00:00:00:00:01", transport=transport)
+        device.device.connect_retry = RetryPolicy(max_tries=1)
+        fleet.add(device)
+        self.assertEqual(fleet.adapter("AA:00:00:00:00:01"), "hci0")
+        try:
+            for _ in range(2):
+                with self.assertRaises(TransportDisconnected):
+                    loop.run_until_complete(fleet.get("AA:00:00:00:00:01"))
+            self.assertEqual(fleet.adapter("AA:00:00:00:00:01"), "hci1")
+            state = loop.run_until_complete(fleet.get("AA:00:00:00:00:01"))
+            self.assertEqual(state["fan_speed"], 4)
+            self.assertEqual(transport.used, [0, 0, 1])
+        finally:
+            device.close()
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
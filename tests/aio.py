@@ -0,0 +1,43 @@
+#!/usr/bin/python
+import asyncio
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.aio import AsyncS3, AsyncLite
+
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_get(self):
+        for cls, model in ((AsyncS3, 'S3'), (AsyncLite, 'Lite')):
+            with self.subTest(model):
+                device = cls("dummy")
+                result = self.loop.run_until_complete(device.get())
+                device.close()
+                self.assertEqual(result['model'], model)
+                self.assertEqual(result['fan_speed'], 4)
+
+    def test_gather(self):
+        devices = [AsyncS3("dummy"), AsyncLite("dummy"), AsyncS3("dummy")]
+
+        async def poll_all():
+            return await asyncio.gather(*[d.get() for d in devices])
+
+        results = self.loop.run_until_complete(poll_all())
+        for d in devices:
+            d.close()
+        self.assertEqual([r['model'] for r in results], ['S3', 'Lite', 'S3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/python
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+try:
+    import numpy as np
+    from tion_btle import batch
+except ImportError:
+    np = None
+
+from tion_btle.lite import Lite
+from tion_btle.s3 import S3
+
+S3_FRAME = bytearray([
+    0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c, 0x0a, 0x00, 0x4b, 0x0a, 0x00, 0x33, 0x00,
+    0x5a
+])
+LITE_FRAME = bytearray([
+    0xcf, 0xd8, 0x02, 0x0f, 0x04, 0x09, 0x0f, 0x1a, 0x80, 0x8e, 0x05, 0x00, 0xe9, 0x8b, 0x05, 0x00, 0x17, 0xc2,
+    0xe7, 0x00, 0x26, 0x1b, 0x18, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03,
+    0x00, 0x04, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0a, 0x14, 0x19, 0x02, 0x04, 0x06,
+    0x06, 0x18, 0x00
+])
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestBatch(unittest.TestCase):
+    def test_s3(self):
+        frames = [S3_FRAME, bytearray(S3_FRAME)]
+        frames[1][8] = 0xfe
+        result = batch.decode_s3(b"".join(frames))
+        device = S3("dummy")
+        for i, frame in enumerate(frames):
+            device._decode_response(frame)
+            for name in ('fan_speed', 'target_temp', 'in_temp', 'out_temp', 'filter_remain', 'heater', 'state',
+                         'sound', 'mode', 'error_code', 'productivity'):
+                with self.subTest(name=name, frame=i):
+                    self.assertEqual(result[name][i], getattr(device, "_" + name))
+        self.assertEqual(result['in_temp'][1], -2)
+
+    def test_lite(self):
+        frames = np.array([LITE_FRAME, LITE_FRAME], dtype=np.uint8)
+        frames[1, 5] = 0xff
+        result = batch.decode_lite(frames)
+        device = Lite("dummy")
+        for i in range(2):
+            device._decode_response(bytearray(frames[i]))
+            for name in ('state', 'sound', 'light', 'heater', 'mode', 'target_temp', 'fan_speed', 'in_temp',
+                         'out_temp', 'electronic_temp', 'electronic_work_time', 'filter_remain', 'device_work_time',
+                         'co2_auto_control', 'filter_change_required', 'error_code'):
+                with self.subTest(name=name, frame=i):
+                    self.assertAlmostEqual(result[name][i], getattr(device, "_" + name))
+        self.assertEqual(result['in_temp'][1], -1)
+
+    def test_bad_size(self):
+        with self.assertRaises(ValueError):
+            batch.decode_s3(bytes(30))
+
+
+if __name__ == '__main__':
+    unittest.main()
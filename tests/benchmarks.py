@@ -0,0 +1,32 @@
+#!/usr/bin/python
+import importlib.util
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+# benchmarks/run.py is a script, not a module: load it by path, so it does not clash with other modules named run
+_spec = importlib.util.spec_from_file_location(
+    "tion_benchmarks", os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT, 'benchmarks', 'run.py'))
+)
+benchmarks = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(benchmarks)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_all_run(self):
+        for name, setup in benchmarks.BENCHMARKS.items():
+            with self.subTest(name):
+                setup()()
+
+    def test_compare(self):
+        baseline = {"results": {"a": {"ns_per_op": 100.0}, "b": {"ns_per_op": 100.0}}}
+        current = {"results": {"a": {"ns_per_op": 110.0}, "b": {"ns_per_op": 130.0}, "c": {"ns_per_op": 1.0}}}
+        self.assertEqual(benchmarks.compare(current, baseline, 1.2), [("b", 100.0, 130.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/python
+import sys
+import os
+import unittest
+from unittest import mock
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle import transport
+from tion_btle.lite import Lite
+from tion_btle.loopback import LoopbackTransport, LiteEmulator
+from tion_btle.transport import BluepyTransport, TransportGattError, _BluepyDelegation
+
+
+class FrameLoopback(LoopbackTransport):
+    """Remembers write_many calls and may fail on chosen packet once"""
+    def __init__(self, emulator, no_response: bool = True, fail_at: int = None):
+        super().__init__(emulator)
+        self.no_response = no_response
+        self.fail_at = fail_at
+        self.frames = []
+        self.writes = 0
+
+    def write(self, handle, data, with_response=False):
+        self.writes += 1
+        if self.writes == self.fail_at:
+            raise TransportGattError("Write failed")
+        super().write(handle, data, with_response)
+
+    def write_many(self, handle, packets, with_response=False):
+        self.frames.append((len(packets), with_response))
+        super().write_many(handle, packets, with_response)
+
+    def can_write_without_response(self, handle):
+        return self.no_response
+
+
+class FakeBTLEException(Exception):
+    pass
+
+
+class FakeGattError(FakeBTLEException):
+    pass
+
+
+class FakePeripheral:
+    """Answers bluepy helper commands. errors maps response number to exception raised instead of it"""
+    def __init__(self, errors=None, notify_at=None):
+        self.commands = []
+        self.responses = 0
+        self.reads = []
+        self.errors = errors or {}
+        self.notify_at = notify_at
+        self.delegate = None
+
+    def _writeCmd(self, cmd):
+        self.commands.append(cmd)
+
+    def _getResp(self, want):
+        self.responses += 1
+        # at most max_in_flight commands are unconfirmed
+        assert len(self.commands) - self.responses < BluepyTransport.max_in_flight
+        if self.responses == self.notify_at:
+            self.delegate.handleNotification(0x0f, b"\x01")
+        if self.responses in self.errors:
+            raise self.errors[self.responses]
+        return {'rsp': [want]}
+
+    def readCharacteristic(self, handle):
+        # read response must not be mixed with pending write confirmations
+        assert len(self.commands) == self.responses
+        self.reads.append(handle)
+        return b""
+
+
+class TestBulkWrite(unittest.TestCase):
+    def setUp(self):
+        self.handle_cache = Lite.handle_cache
+        Lite.handle_cache = None
+
+    def tearDown(self):
+        Lite.handle_cache = self.handle_cache
+
+    def test_frame_in_one_call(self):
+        link = FrameLoopback(LiteEmulator())
+        device = Lite("loopback", link)
+        device.set({"fan_speed": 4})
+        # status request is single packet, set frame is two packets
+        self.assertIn((2, False), link.frames)
+        self.assertEqual(device.get()["fan_speed"], 4)
+
+        link = FrameLoopback(LiteEmulator(), no_response=False)
+        Lite("loopback", link).set({"fan_speed": 4})
+        self.assertTrue(all(with_response for _, with_response in link.frames))
+
+    def test_frame_is_retried_whole(self):
+        device = Lite("loopback", FrameLoopback(LiteEmulator()))
+        device.get()
+        # the first packet of the set frame succeeds, the second one fails
+        device._transport.fail_at = device._transport.writes + 2
+        device._transport.frames.clear()
+        device.set({"heater_temp": 25})
+        self.assertEqual([n for n, _ in device._transport.frames if n == 2], [2, 2])
+        self.assertEqual(device.get()["heater_temp"], 25)
+
+    def test_encode_request(self):
+        device = Lite("dummy")
+        device.target_temp = 20
+        frames = [device._encode_request({"state": "on", "sound": "off", "light": "on", "heater": "on",
+                                          "heater_temp": 20, "fan_speed": 3}) for _ in range(50)]
+        self.assertTrue(all(len(f) == len(frames[0]) for f in frames))
+        self.assertEqual(len({bytes(f) for f in frames}), 50)
+
+    def _bluepy(self, peripheral):
+        link = BluepyTransport.__new__(BluepyTransport)
+        link._peripheral = peripheral
+        link._delegation = _BluepyDelegation(link)
+        link._delegation.read_topic = 0x0f
+        peripheral.delegate = link._delegation
+        return link
+
+    def _write_many(self, link, packets):
+        btle = mock.Mock(BTLEException=FakeBTLEException, BTLEGattError=FakeGattError,
+                         BTLEDisconnectError=ConnectionError)
+        with mock.patch.object(transport, "btle", btle):
+            link.write_many(0x0d, packets)
+
+    def test_bluepy_pipeline(self):
+        packets = [bytes([i]) * 4 for i in range(6)]
+        link = self._bluepy(FakePeripheral({2: FakeGattError("atterr")}))
+        with self.assertRaises(TransportGattError):
+            self._write_many(link, packets)
+        # writing stops after error, but every sent command is confirmed
+        self.assertEqual(link._peripheral.commands, ["wr D %s\n" % p.hex() for p in packets[:5]])
+        self.assertEqual(link._peripheral.responses, 5)
+
+        link = self._bluepy(FakePeripheral({2: FakeBTLEException("Unexpected response (rd)")}))
+        with self.assertRaises(TransportGattError):
+            self._write_many(link, packets)
+        self.assertEqual(link._peripheral.responses, len(link._peripheral.commands))
+
+    def test_bluepy_notification_during_pipeline(self):
+        link = self._bluepy(FakePeripheral(notify_at=1))
+        self._write_many(link, [bytes([i]) * 4 for i in range(6)])
+        # read requested by notification is done after the last confirmation
+        self.assertEqual(link._peripheral.reads, [0x0f])
+        self.assertFalse(link._delegation.suspended)
+
+if __name__ == '__main__':
+    unittest.main()
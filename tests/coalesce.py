@@ -0,0 +1,169 @@
+#!/usr/bin/python
+import asyncio
+import sys
+import os
+import threading
+import time
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.s3 import S3
+from tion_btle.aio import AsyncS3
+from tion_btle.fleet import TionFleet
+from tion_btle.coalesce import SetCoalescer
+from tion_btle.loopback import LoopbackTransport, S3Emulator
+
+
+class CountingS3Emulator(S3Emulator):
+    def __init__(self):
+        super().__init__()
+        self.sets = 0
+
+    def handle_write(self, handle, data):
+        if data[1] == self.command_SET_PARAMS:
+            self.sets += 1
+        return super().handle_write(handle, data)
+
+
+def in_threads(*actions):
+    threads = []
+    for action in actions:
+        threads.append(threading.Thread(target=action))
+        threads[-1].start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+
+
+class TestCoalesce(unittest.TestCase):
+    def test_burst_is_one_write(self):
+        emulator = CountingS3Emulator()
+        device = S3("loopback", LoopbackTransport(emulator))
+        device.coalesce(0.05)
+        in_threads(
+            lambda: device.set({"fan_speed": 2}),
+            lambda: device.set({"heater_temp": 22}),
+            lambda: device.set({"fan_speed": 5, "heater": "off"}),
+        )
+        self.assertEqual(emulator.sets, 1)
+        state = device.get()
+        self.assertEqual((state["fan_speed"], state["heater_temp"], state["heater"]), (5, 22, "off"))
+
+        device.coalesce(0)
+        device.set({"fan_speed": 1})
+        device.set({"fan_speed": 2})
+        self.assertEqual(emulator.sets, 3)
+
+    def test_all_callers_get_result(self):
+        calls = []
+        results = []
+
+        def apply(settings, max_state_age, confirm):
+            calls.append((settings, max_state_age))
+            if "fail" in settings:
+                raise ValueError("failed")
+            return len(calls)
+
+        def submit(settings, max_state_age=None):
+            try:
+                results.append(coalescer.submit(settings, max_state_age))
+            except ValueError as e:
+                results.append(str(e))
+
+        coalescer = SetCoalescer(apply, 0.03)
+        in_threads(lambda: submit({"a": 1}, 5), lambda: submit({"b": 2}, 1), lambda: submit({"a": 3}))
+        self.assertEqual(calls, [({"a": 3, "b": 2}, 1)])
+        self.assertEqual(results, [1, 1, 1])
+
+        results.clear()
+        in_threads(lambda: submit({"a": 1}), lambda: submit({"fail": True}))
+        self.assertEqual(results, ["failed", "failed"])
+
+    def test_session_and_direct_calls(self):
+        emulator = CountingS3Emulator()
+        device = S3("loopback", LoopbackTransport(emulator))
+        device.coalesce(0.1)
+        session = device.session()
+        session.open()
+        for first, second in ((device.set, session.set), (session.set, device.set)):
+            threads = [threading.Thread(target=first, args=({"fan_speed": 2},), daemon=True),
+                       threading.Thread(target=second, args=({"heater_temp": 22},), daemon=True)]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.01)
+            for thread in threads:
+                # deadlocked threads keep device lock, so session is not closed on failure
+                thread.join(5)
+                self.assertFalse(thread.is_alive())
+        self.assertEqual(emulator.sets, 2)
+        state = session.get()
+        session.close()
+        self.assertEqual((state["fan_speed"], state["heater_temp"]), (2, 22))
+
+    def test_max_delay(self):
+        calls = []
+        coalescer = SetCoalescer(lambda settings, age, confirm: calls.append(time.monotonic()), 0.05, max_delay=0.1)
+        stop = threading.Event()
+
+        def flood():
+            while not stop.is_set():
+                coalescer.submit({"fan_speed": 1})
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=flood) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.25)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertLess(calls[0] - started, 0.2)
+
+
+class TestAsyncCoalesce(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.emulator = CountingS3Emulator()
+        self.device = AsyncS3("AA:00:00:00:00:01", transport=LoopbackTransport(self.emulator))
+        self.device.device.handle_cache = None
+
+    def tearDown(self):
+        self.device.close()
+        self.loop.close()
+
+    def _burst(self, set_):
+        async def scenario():
+            return await asyncio.gather(
+                set_({"fan_speed": 2}), set_({"heater_temp": 22}), set_({"fan_speed": 5}, confirm=True),
+            )
+        started = time.monotonic()
+        results = self.loop.run_until_complete(scenario())
+        return results, time.monotonic() - started
+
+    def test_async_calls_are_merged(self):
+        self.device.coalesce(0.2)
+        results, elapsed = self._burst(self.device.set)
+        self.assertEqual(self.emulator.sets, 1)
+        self.assertEqual((results[0], results[2]["fan_speed"], results[2]["heater_temp"]), (None, 5, 22))
+        # merged before worker thread, so no second coalescing window inside it
+        self.assertLess(elapsed, 0.4)
+
+    def test_fleet_calls_are_merged(self):
+        fleet = TionFleet(max_connections=1)
+        fleet.add(self.device)
+        self.device.coalesce(0.05)
+        results, _ = self._burst(lambda settings, confirm=False: fleet.set(self.device.mac, settings, confirm=confirm))
+        self.assertEqual(self.emulator.sets, 1)
+        self.assertEqual(fleet.state(self.device.mac), results[2])
+
+    def test_disabled(self):
+        self._burst(self.device.set)
+        self.assertEqual(self.emulator.sets, 3)
+        self.assertIsNone(self.device.coalescer)
+
+
+if __name__ == '__main__':
+    unittest.main()
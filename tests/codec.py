@@ -0,0 +1,83 @@
+#!/usr/bin/python
+import sys
+import os
+import struct
+import subprocess
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle import codec
+
+SCHEMAS = [codec.S3_STATUS, codec.S3_COMMAND, codec.LITE_STATUS, codec.LITE_SET_PARAMS]
+
+
+def sample_values(field: codec.Field) -> list:
+    """Edge values that field must hold"""
+    if field.width:
+        return [0, 1, field.mask]
+    bits = 8 * struct.calcsize("<" + field.fmt)
+    if field.fmt.islower():
+        return [0, -1, -(1 << (bits - 1)), (1 << (bits - 1)) - 1]
+    return [0, 1, (1 << bits) - 1]
+
+
+class TestCodec(unittest.TestCase):
+    def test_field_round_trip(self):
+        for schema in SCHEMAS:
+            for field in schema.fields:
+                for value in sample_values(field):
+                    with self.subTest(schema=schema.name, field=field.name, value=value):
+                        frame = schema.encode({field.name: value})
+                        self.assertEqual(len(frame), schema.size)
+                        self.assertEqual(schema.decode(frame)[field.name], value)
+
+    def test_fields_do_not_interfere(self):
+        for schema in SCHEMAS:
+            with self.subTest(schema.name):
+                values = {f.name: sample_values(f)[-1] for f in schema.fields}
+                self.assertEqual(schema.decode(schema.encode(values)), values)
+
+    def test_defaults(self):
+        frame = codec.S3_COMMAND.encode({})
+        self.assertEqual(frame[0], 61)
+        self.assertEqual(frame[19], 90)
+        self.assertEqual(bytes(codec.LITE_SET_PARAMS.encode({})[-2:]), bytes([0xbb, 0xaa]))
+
+    def test_short_frame(self):
+        with self.assertRaises(ValueError):
+            codec.S3_STATUS.decode(bytes(10))
+
+    def test_optional_fields(self):
+        frame = codec.LITE_STATUS.encode({"fan_speed": 3, "error_code": 7, "max_fan": 6})
+        self.assertEqual(codec.LITE_STATUS.min_size, 29)
+        for size in (29, 40, 55):
+            with self.subTest(size=size):
+                values = codec.LITE_STATUS.decode(frame[:size])
+                self.assertEqual((values["fan_speed"], values["error_code"]), (3, 7))
+                self.assertNotIn("max_fan", values)
+        self.assertEqual(codec.LITE_STATUS.decode(frame[:56])["max_fan"], 6)
+        with self.assertRaises(ValueError):
+            codec.Schema("bad", 4, [codec.Field("a", 0, optional=True), codec.Field("b", 1)])
+
+    def test_overlap(self):
+        with self.assertRaises(ValueError):
+            codec.Schema("bad", 4, [codec.Field("a", 0, "H"), codec.Field("b", 1)])
+
+    def test_import_side_effects(self):
+        script = (
+            "import logging, sys\n"
+            "from tion_btle.lite import Lite\n"
+            "from tion_btle.codec import LITE_STATUS\n"
+            "assert 'bluepy' not in sys.modules\n"
+            "assert not logging.getLogger().handlers\n"
+            "assert logging.getLogger().level == logging.WARNING\n"
+        )
+        root = os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT))
+        subprocess.check_call([sys.executable, "-c", script], cwd=root)
+
+
+if __name__ == '__main__':
+    unittest.main()
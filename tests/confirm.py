@@ -0,0 +1,71 @@
+#!/usr/bin/python
+import asyncio
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.aio import AsyncLite
+from tion_btle.fleet import TionFleet
+from tion_btle.lite import Lite
+from tion_btle.s3 import S3
+from tion_btle.loopback import LoopbackTransport, LiteEmulator, S3Emulator
+
+
+class TestConfirm(unittest.TestCase):
+    def setUp(self):
+        self.handle_cache = Lite.handle_cache
+        Lite.handle_cache = None
+
+    def tearDown(self):
+        Lite.handle_cache = self.handle_cache
+
+    def test_lite(self):
+        link = LoopbackTransport(LiteEmulator())
+        device = Lite("loopback", link)
+        device.get()
+        link.written.clear()
+        state = device.set({"fan_speed": 5, "heater_temp": 24}, max_state_age=60, confirm=True)
+        self.assertEqual((state["fan_speed"], state["heater_temp"]), (5, 24))
+        # set frame only, state comes with the reply to it
+        self.assertEqual([f[5:7] for f in link.written if f[0] in (0x80, 0x00)], [LiteEmulator.SET_PARAMS])
+        self.assertIsNone(device.set({"fan_speed": 2}, max_state_age=60))
+        self.assertEqual(device.get()["fan_speed"], 2)
+
+    def test_s3(self):
+        link = LoopbackTransport(S3Emulator())
+        device = S3("loopback", link)
+        state = device.set({"fan_speed": 3, "heater": "off"}, max_state_age=0, confirm=True)
+        self.assertEqual((state["fan_speed"], state["heater"]), (3, "off"))
+        self.assertEqual(link.connects, 1)
+        commands = [f[1] for f in link.written]
+        self.assertEqual(commands[commands.index(S3Emulator.command_SET_PARAMS) + 1:],
+                         [S3Emulator.command_REQUEST_PARAMS])
+
+    def test_session_and_coalescing(self):
+        device = S3("loopback", LoopbackTransport(S3Emulator()))
+        with device.session() as session:
+            self.assertEqual(session.set({"fan_speed": 4}, confirm=True)["fan_speed"], 4)
+        device.coalesce(0.01)
+        self.assertEqual(device.set({"fan_speed": 1}, confirm=True)["fan_speed"], 1)
+        self.assertIsNone(device.set({"fan_speed": 2}))
+
+    def test_fleet(self):
+        loop = asyncio.new_event_loop()
+        fleet = TionFleet()
+        device = AsyncLite("loopback", transport=LoopbackTransport(LiteEmulator()))
+        fleet.add(device)
+        try:
+            state = loop.run_until_complete(fleet.set(device.mac, {"fan_speed": 6}, confirm=True))
+            self.assertEqual(state["fan_speed"], 6)
+            self.assertEqual(fleet.state(device.mac), state)
+        finally:
+            device.close()
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.lite import Lite
+from tion_btle.loopback import LoopbackTransport, LiteEmulator
+from tion_btle.metrics import HistogramRegistry, COUNTER_STALE_FRAMES
+
+
+class LateLiteEmulator(LiteEmulator):
+    """Sends late reply to some old request before every response"""
+    def _handle_frame(self, frame):
+        late = bytearray(self.payload)
+        late[4] = 1
+        return self.packets(self.RESPONSE_PARAMS, b"\x01\x02\x03\x04", late) + super()._handle_frame(frame)
+
+
+class ReorderingLiteEmulator(LiteEmulator):
+    """Answers pipelined requests in reverse order"""
+    def __init__(self):
+        super().__init__()
+        self.held = []
+
+    def _handle_frame(self, frame):
+        self.held.insert(0, super()._handle_frame(frame))
+        if len(self.held) < 2:
+            return []
+        packets = [p for response in self.held for p in response]
+        self.held = []
+        return packets
+
+
+class TestCorrelation(unittest.TestCase):
+    def test_unique_ids(self):
+        device = Lite("dummy")
+        first = device._create_request(Lite.REQUEST_PARAMS)
+        second = device._create_request(Lite.REQUEST_PARAMS)
+        self.assertNotEqual(first[7:11], second[7:11])
+        self.assertEqual(first[:7], second[:7])
+        self.assertEqual(first[11:], second[11:])
+
+    def test_decode_header(self):
+        device = Lite("dummy")
+        device._decode_header(bytes.fromhex("004900" "3a4e3112" "0dd71f8f" "bfc94037"))
+        self.assertEqual(bytes(device._request_id), bytes.fromhex("0dd71f8f"))
+
+    def test_stale_frame_dropped(self):
+        device = Lite("loopback", LoopbackTransport(LateLiteEmulator()))
+        device.metrics = HistogramRegistry()
+        self.assertEqual(device.get()["fan_speed"], 4)
+        self.assertEqual(device.metrics.counter(COUNTER_STALE_FRAMES), 1)
+
+    def test_pipelined_requests(self):
+        device = Lite("loopback", LoopbackTransport(ReorderingLiteEmulator()))
+        device.connect()
+        try:
+            state, info = device._exchange([
+                device._create_request(Lite.REQUEST_PARAMS),
+                device._create_request(Lite.REQUEST_DEVICE_INFO),
+            ])
+        finally:
+            device.disconnect()
+        self.assertEqual(info, LiteEmulator.DEVICE_INFO)
+        self.assertEqual(state, LiteEmulator().payload)
+
+    def test_device_info(self):
+        self.assertEqual(Lite("dummy").get_device_info(), LiteEmulator.DEVICE_INFO)
+
+
+if __name__ == '__main__':
+    unittest.main()
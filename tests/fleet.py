@@ -0,0 +1,146 @@
+#!/usr/bin/python
+import asyncio
+import sys
+import time
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.aio import AsyncS3
+from tion_btle.loopback import LoopbackTransport, S3Emulator
+from tion_btle.fleet import TionFleet
+
+
+class SlowS3(AsyncS3):
+    active = 0
+    max_active = 0
+    log = []
+
+    async def _run(self, action, *args, timeout=None):
+        SlowS3.active += 1
+        SlowS3.max_active = max(SlowS3.max_active, SlowS3.active)
+        SlowS3.log.append((self._name, action.__name__))
+        try:
+            await asyncio.sleep(0.01)
+            return await super()._run(action, *args, timeout=timeout)
+        finally:
+            SlowS3.active -= 1
+
+
+class SlowLink(LoopbackTransport):
+    """Connection takes 0.1 s, links that are open at the same time are counted"""
+    active = 0
+    max_active = 0
+
+    def connect(self, mac):
+        SlowLink.active += 1
+        SlowLink.max_active = max(SlowLink.max_active, SlowLink.active)
+        time.sleep(0.1)
+        super().connect(mac)
+
+    def disconnect(self):
+        if self.connection_status != "disc":
+            SlowLink.active -= 1
+        super().disconnect()
+
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        SlowS3.active = 0
+        SlowS3.max_active = 0
+        SlowS3.log = []
+        self.fleet = TionFleet(max_connections=2)
+        self.devices = []
+        for i in range(6):
+            device = SlowS3("dummy")
+            device._name = "d%d" % i
+            self.devices.append(device)
+        for i, device in enumerate(self.devices):
+            # dummy devices share MAC, so use unique keys
+            device.device._mac = "dummy%d" % i
+            self.fleet.add(device, "hci%d" % (i % 2))
+
+    def tearDown(self):
+        for d in self.devices:
+            d.close()
+        self.loop.close()
+
+    def test_poll(self):
+        self.assertEqual(set(self.fleet.staleness().values()), {None})
+        result = self.loop.run_until_complete(self.fleet.poll())
+        self.assertEqual(len(result), 6)
+        self.assertEqual(SlowS3.max_active, 4)
+        for age in self.fleet.staleness().values():
+            self.assertLess(age, 1)
+
+    def test_set_priority(self):
+        self.fleet = TionFleet(max_connections=1)
+        for d in self.devices:
+            self.fleet.add(d)
+
+        async def scenario():
+            poll = asyncio.ensure_future(self.fleet.poll())
+            await asyncio.sleep(0.005)
+            await self.fleet.set("dummy5", {"fan_speed": 1})
+            await poll
+
+        self.loop.run_until_complete(scenario())
+        self.assertEqual(SlowS3.max_active, 1)
+        # first poll is already on air, set goes right after it
+        self.assertEqual(SlowS3.log[1], ("d5", "set"))
+
+    def test_kept_links_are_bounded(self):
+        fleet = TionFleet(max_connections=2)
+        fleet.keep_links(60)
+        devices = [AsyncS3("AA:00:00:00:00:0%d" % i, transport=SlowLink(S3Emulator())) for i in range(5)]
+        for d in devices:
+            d.device.handle_cache = None
+            fleet.add(d, "hci0")
+
+        async def scenario():
+            await fleet.get(devices[0].mac)
+            await fleet.get(devices[0].mac)
+            for _ in range(2):
+                await fleet.poll()
+            await asyncio.sleep(0.2)
+            return SlowLink.active
+
+        SlowLink.active = SlowLink.max_active = 0
+        try:
+            kept = self.loop.run_until_complete(scenario())
+        finally:
+            for d in devices:
+                d.close()
+        # two requests over one link, then the link is given away to other devices and restored
+        self.assertEqual(devices[0].device.transport.connects, 2)
+        self.assertEqual(SlowLink.max_active, 2)
+        self.assertEqual(kept, 2)
+
+    def test_cancelled_caller_keeps_slot(self):
+        fleet = TionFleet(max_connections=1)
+        devices = [AsyncS3("AA:00:00:00:00:0%d" % i, transport=SlowLink(S3Emulator())) for i in range(2)]
+        for d in devices:
+            d.device.handle_cache = None
+            fleet.add(d)
+
+        async def scenario():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(fleet.get(devices[0].mac), 0.02)
+            # the first exchange is still on air, so the second device waits for it
+            await fleet.get(devices[1].mac)
+            await fleet.get(devices[0].mac)
+
+        try:
+            self.loop.run_until_complete(scenario())
+        finally:
+            for d in devices:
+                d.close()
+        self.assertEqual(SlowLink.max_active, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.framing import LiteFramer
+
+
+class TestLiteFramer(unittest.TestCase):
+    def test_round_trip(self):
+        for size in (17, 20, 21, 31, 39, 40, 74, 300):
+            with self.subTest(size):
+                frame = bytearray(range(size % 256)) + bytearray(size - size % 256)
+                framer = LiteFramer()
+                packets = framer.split(frame)
+                self.assertTrue(all(len(p) <= 20 for p in packets))
+                self.assertEqual(len(packets), 1 if size <= 20 else 1 + (size - 20 + 18) // 19)
+                for p in packets[:-1]:
+                    self.assertFalse(framer.feed(bytes(p)))
+                self.assertTrue(framer.feed(bytes(packets[-1])))
+                self.assertEqual(bytes(framer.frame), bytes(frame))
+
+    def test_packet_ids(self):
+        packets = LiteFramer().split(bytearray(74))
+        self.assertEqual([p[0] for p in packets], [0x00, 0x40, 0x40, 0xc0])
+        self.assertEqual([p[0] for p in LiteFramer().split(bytearray(17))], [0x80])
+
+    def test_parts(self):
+        framer = LiteFramer()
+        frame = bytearray(range(40))
+        for p in framer.split(frame):
+            framer.feed(bytes(p))
+        self.assertEqual(bytes(framer.header), bytes(frame[:15]))
+        self.assertEqual(bytes(framer.payload), bytes(frame[15:-2]))
+        self.assertEqual(bytes(framer.crc), bytes(frame[-2:]))
+
+    def test_sequence_validation(self):
+        framer = LiteFramer()
+        self.assertFalse(framer.feed(bytes([0x40, 1, 2])))
+        self.assertFalse(framer.feed(bytes([0xc0, 1, 2])))
+        self.assertFalse(framer.feed(bytes([0x00, 1, 2])))
+        self.assertFalse(framer.feed(bytes([0x00, 3, 4])))
+        self.assertTrue(framer.feed(bytes([0xc0, 5])))
+        self.assertEqual(bytes(framer.frame), bytes([0x00, 3, 4, 5]))
+
+
+if __name__ == '__main__':
+    unittest.main()
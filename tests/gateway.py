@@ -0,0 +1,105 @@
+#!/usr/bin/python
+import json
+import sys
+import os
+import threading
+import time
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.aio import AsyncLite, AsyncS3
+from tion_btle.fleet import TionFleet
+from tion_btle.gateway import Gateway, UnknownDevice
+from tion_btle.loopback import LoopbackTransport, LiteEmulator, S3Emulator
+
+LITE = "AA:BB:CC:DD:EE:01"
+S3_MAC = "AA:BB:CC:DD:EE:02"
+
+
+class TestGateway(unittest.TestCase):
+    def setUp(self):
+        self.links = {LITE: LoopbackTransport(LiteEmulator()), S3_MAC: LoopbackTransport(S3Emulator())}
+        self.fleet = fleet = TionFleet()
+        fleet.add(AsyncLite(LITE, transport=self.links[LITE]))
+        fleet.add(AsyncS3(S3_MAC, transport=self.links[S3_MAC]))
+        for device in fleet.devices:
+            device.device.handle_cache = None
+        self.gateway = Gateway(fleet, max_age=60, timeout=10)
+        host, port = self.gateway.start("127.0.0.1", 0)
+        self.url = "http://%s:%d" % (host, port)
+
+    def tearDown(self):
+        self.gateway.stop()
+
+    def request(self, path, settings=None):
+        data = None if settings is None else json.dumps(settings).encode()
+        with urlopen(Request(self.url + path, data), timeout=10) as response:
+            return json.loads(response.read().decode())
+
+    def test_shared_reads(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.request("/devices/" + LITE)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r == results[0] for r in results))
+        # eight clients, one radio exchange
+        self.assertEqual(self.links[LITE].connects, 1)
+        self.request("/devices/" + LITE.lower())
+        self.assertEqual(self.links[LITE].connects, 1)
+
+        devices = self.request("/devices")
+        self.assertEqual(devices[LITE]["state"], results[0])
+        self.assertIsNone(devices[S3_MAC]["state"])
+
+    def test_set(self):
+        state = self.request("/devices/" + S3_MAC, {"fan_speed": 5})
+        self.assertEqual(state["fan_speed"], 5)
+        connects = self.links[S3_MAC].connects
+        # confirmed state is cached
+        self.assertEqual(self.request("/devices/" + S3_MAC), state)
+        self.assertEqual(self.links[S3_MAC].connects, connects)
+
+    def test_link_is_kept(self):
+        for speed in (2, 3, 4):
+            self.assertEqual(self.request("/devices/" + S3_MAC, {"fan_speed": speed})["fan_speed"], speed)
+        self.assertEqual(self.links[S3_MAC].connects, 1)
+        self.assertEqual(self.links[S3_MAC].connection_status, "conn")
+        self.gateway.stop()
+        # link is dropped by device worker
+        deadline = time.monotonic() + 5
+        while self.links[S3_MAC].connection_status != "disc" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.links[S3_MAC].connection_status, "disc")
+
+    def test_errors(self):
+        for path, settings, code in (("/devices/AA:AA:AA:AA:AA:AA", None, 404), ("/unknown", None, 404),
+                                     ("/devices/" + LITE, [1], 400)):
+            with self.assertRaises(HTTPError) as error:
+                self.request(path, settings)
+            self.assertEqual(error.exception.code, code)
+
+    def test_unknown_device(self):
+        with self.assertRaises(UnknownDevice):
+            self.gateway.call(self.gateway.get("AA:AA:AA:AA:AA:AA"))
+        # lookup error inside device is not mistaken for unknown device
+        self.fleet.devices[0].device.get = lambda: {}["state"]
+        with self.assertRaises(HTTPError) as error:
+            self.request("/devices/" + LITE)
+        self.assertEqual(error.exception.code, 502)
+        for path in ("/devices/dummy", "/devices/loopback"):
+            with self.assertRaises(HTTPError) as error:
+                self.request(path)
+            self.assertEqual(error.exception.code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
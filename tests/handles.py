@@ -0,0 +1,118 @@
+#!/usr/bin/python
+import sys
+import os
+import tempfile
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.s3 import S3
+from tion_btle.lite import Lite
+from tion_btle.tion import TionException
+from tion_btle.handles import HandleCache, GattHandles
+from tion_btle.loopback import LoopbackTransport, S3Emulator, LiteEmulator
+
+
+class TestHandleCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = HandleCache()
+
+    def _device(self, cls, emulator):
+        transport = LoopbackTransport(emulator)
+        device = cls("AA:BB:CC:DD:EE:FF", transport)
+        device.handle_cache = self.cache
+        device.response_timeout = 0.1
+        return device, transport
+
+    def test_discovery_skipped_on_reconnect(self):
+        device, transport = self._device(Lite, LiteEmulator())
+        device.get()
+        device.get()
+        self.assertEqual(transport.discoveries, 1)
+        self.assertEqual(self.cache.get("aa:bb:cc:dd:ee:ff", "Lite"), GattHandles(0x0d, 0x0f, 0x10))
+        self.assertIsNone(self.cache.get("aa:bb:cc:dd:ee:ff", "S3"))
+
+    def test_no_cache(self):
+        device, transport = self._device(S3, S3Emulator())
+        device.handle_cache = None
+        device.get()
+        device.get()
+        self.assertEqual(transport.discoveries, 2)
+
+    def test_stale_handles(self):
+        self.cache.put("AA:BB:CC:DD:EE:FF", "S3", GattHandles(0x20, 0x22, 0x23))
+        device, transport = self._device(S3, S3Emulator())
+        self.assertEqual(device.get()["fan_speed"], 4)
+        self.assertEqual(transport.discoveries, 1)
+        self.assertEqual(self.cache.get("AA:BB:CC:DD:EE:FF", "S3"), GattHandles(0x0d, 0x0f, 0x10))
+
+    def test_write_handle_changed(self):
+        for cls, emulator in ((Lite, LiteEmulator()), (S3, S3Emulator())):
+            with self.subTest(cls.__name__):
+                self.cache = HandleCache()
+                device, transport = self._device(cls, emulator)
+                device.get()
+                # writes to old handle are dropped silently, like real device does
+                emulator.write_handle = 0x11
+                device.set({"fan_speed": 2}, max_state_age=0)
+                self.assertEqual(device.get()["fan_speed"], 2)
+                self.assertEqual(transport.discoveries, 2)
+                self.assertEqual(self.cache.get("AA:BB:CC:DD:EE:FF", cls.__name__).write, 0x11)
+
+    def test_unconfirmed_set_with_changed_handles(self):
+        for cls, emulator in ((Lite, LiteEmulator()), (S3, S3Emulator())):
+            with self.subTest(cls.__name__):
+                self.cache = HandleCache()
+                device, transport = self._device(cls, emulator)
+                device.get()
+                emulator.write_handle = 0x11
+                # known state is fresh, so nothing but the write itself would be sent
+                device.set({"fan_speed": 2})
+                self.assertEqual(transport.discoveries, 2)
+                self.assertEqual(self.cache.get("AA:BB:CC:DD:EE:FF", cls.__name__).write, 0x11)
+                self.assertEqual(device.get()["fan_speed"], 2)
+
+    def test_pair_discovers_handles(self):
+        self.cache.put("AA:BB:CC:DD:EE:FF", "S3", GattHandles(0x20, 0x22, 0x23))
+        device, transport = self._device(S3, S3Emulator())
+        device.pair()
+        self.assertEqual(transport.discoveries, 1)
+        self.assertEqual(transport.written[-1][1], S3.command_PAIR)
+
+    def test_handles_checked_once_per_link(self):
+        device, transport = self._device(S3, S3Emulator())
+        device.get()
+        device.response_timeout = 0.01
+        with device.session():
+            device.get()
+            device.transport.emulator.write_handle = 0x11
+            with self.assertRaises(TionException):
+                device.get()
+        self.assertEqual(transport.discoveries, 1)
+
+    def test_persistent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "handles.json")
+            self.cache = HandleCache(path)
+            device, _ = self._device(S3, S3Emulator())
+            device.get()
+
+            self.cache = HandleCache(path)
+            device, transport = self._device(S3, S3Emulator())
+            device.get()
+            self.assertEqual(transport.discoveries, 0)
+
+            self.cache.invalidate("AA:BB:CC:DD:EE:FF", "S3")
+            self.assertIsNone(HandleCache(path).get("AA:BB:CC:DD:EE:FF", "S3"))
+
+    def test_broken_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+            f.write("{broken")
+            f.flush()
+            self.assertIsNone(HandleCache(f.name).get("AA:BB:CC:DD:EE:FF", "S3"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -38,6 +38,15 @@ class TestLite(unittest.TestCase):
             with self.subTest(s[0]):
                 self.assertEqual(getattr(self.lite, s[0]), s[1], "%s should be '%s'" % (s[0], s[1]) )
 
+    def test_decode_short(self):
+        """Status without presets, as some firmwares send it"""
+        lite = Lite("dummy")
+        lite._decode_response(self.data[:29])
+        self.assertEqual((lite.fan_speed, lite.target_temp, lite.in_temp, lite._error_code), (4, 15, 9, 0))
+        self.assertEqual(lite._preset_temp, [])
+        lite._decode_response(self.data)
+        self.assertEqual((lite._preset_temp, lite._max_fan), ([0x0a, 0x14, 0x19], 6))
+
 
 TestLite.data = bytearray([
     0xcf, 0xd8, 0x02, 0x0f, 0x04, 0x09, 0x0f, 0x1a, 0x80, 0x8e, 0x05, 0x00, 0xe9, 0x8b, 0x05, 0x00, 0x17, 0xc2,
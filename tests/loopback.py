@@ -0,0 +1,126 @@
+#!/usr/bin/python
+import sys
+import os
+import time
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.s3 import S3
+from tion_btle.tion import TionException
+from tion_btle.lite import Lite
+from tion_btle.loopback import LoopbackTransport, LiteEmulator, S3Emulator
+from tion_btle.retry import RetryPolicy
+from tion_btle.handles import HandleCache
+from tion_btle.transport import TransportGattError
+
+
+class CountingS3Emulator(S3Emulator):
+    def __init__(self):
+        super().__init__()
+        self.commands = []
+
+    def handle_write(self, handle, data):
+        self.commands.append(data[1])
+        return super().handle_write(handle, data)
+
+
+class TestLoopback(unittest.TestCase):
+    def test_get(self):
+        for cls in (S3, Lite):
+            with self.subTest(cls.__name__):
+                device = cls("dummy")
+                result = device.get()
+                self.assertEqual(result['model'], cls.__name__)
+                self.assertEqual(result['fan_speed'], 4)
+                self.assertEqual(result['state'], 'on')
+                self.assertEqual(device.connection_status, 'disc')
+
+    def test_set(self):
+        for cls in (S3, Lite):
+            with self.subTest(cls.__name__):
+                device = cls("dummy")
+                device.set({'fan_speed': 2, 'heater_temp': 18, 'heater': 'off'})
+                result = device.get()
+                self.assertEqual(result['fan_speed'], 2)
+                self.assertEqual(result['heater_temp'], 18)
+                self.assertEqual(result['heater'], 'off')
+                self.assertEqual(result['state'], 'on')
+
+    def test_set_uses_known_state(self):
+        emulator = CountingS3Emulator()
+        device = S3("loopback", LoopbackTransport(emulator))
+        # handles are discovered on every link, so there is nothing to check after write
+        device.handle_cache = None
+        device.get()
+        device.set({'fan_speed': 2})
+        device.set({'heater_temp': 18})
+        self.assertEqual(emulator.commands, [S3.command_REQUEST_PARAMS, S3.command_SET_PARAMS, S3.command_SET_PARAMS])
+        result = device.get()
+        self.assertEqual(result['fan_speed'], 2)
+        self.assertEqual(result['heater_temp'], 18)
+
+    def test_set_with_known_state_and_stale_handles(self):
+        for cls, emulator in ((Lite, LiteEmulator()), (S3, S3Emulator())):
+            with self.subTest(cls.__name__):
+                device = cls("loopback", LoopbackTransport(emulator))
+                device.handle_cache = HandleCache()
+                device.response_timeout = 0.1
+                device.get()
+                # writes to old handle are dropped silently, like real device does
+                emulator.write_handle = 0x11
+                self.assertIsNone(device.set({"fan_speed": 2}))
+                # known state is the one device reported after write
+                self.assertEqual(device._get_current_state(60)["fan_speed"], 2)
+                self.assertEqual(device.get()["fan_speed"], 2)
+
+    def test_set_reads_stale_state(self):
+        emulator = CountingS3Emulator()
+        device = S3("loopback", LoopbackTransport(emulator))
+        device.get()
+        device.set({'fan_speed': 2}, max_state_age=0)
+        self.assertEqual(emulator.commands, [S3.command_REQUEST_PARAMS] * 2 + [S3.command_SET_PARAMS])
+
+    def test_response_deadline(self):
+        class SilentEmulator(S3Emulator):
+            def handle_write(self, handle, data):
+                return []
+
+        device = S3("loopback", LoopbackTransport(SilentEmulator()))
+        device.response_timeout = 0.05
+        started = time.monotonic()
+        with self.assertRaises(TionException):
+            device.get()
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_transport_errors_are_tion_exceptions(self):
+        transport = LoopbackTransport(S3Emulator())
+        transport.reachable = False
+        device = S3("loopback", transport)
+        device.connect_retry = RetryPolicy(max_tries=1)
+        with self.assertRaises(TionException):
+            device.get()
+        self.assertTrue(issubclass(TransportGattError, TionException))
+
+    def test_lite_packets(self):
+        packets = LiteEmulator().status_packets(bytes([0x0d, 0xd7, 0x1f, 0x8f]))
+        self.assertEqual([p[0] for p in packets], [0x00, 0x40, 0x40, 0xc0])
+        self.assertEqual(
+            bytes(packets[0]).hex(), "0049003a4e31120dd71f8fbfc94037cfd8020f04"
+        )
+
+    def test_undelivered_notifications_dropped(self):
+        transport = LoopbackTransport(LiteEmulator())
+        device = Lite("loopback", transport)
+        device.connect()
+        device._try_write(bytearray([0x80, 0x10, 0x00, 0x3a, 0x02, 0x32, 0x12, 0, 0, 0, 0, 0, 0, 0, 0, 0xbb, 0xaa]))
+        device.disconnect()
+        device.connect()
+        self.assertFalse(transport.wait_for_notifications(0))
+        device.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.tion import TionException
+from tion_btle.s3 import S3
+from tion_btle.lite import Lite
+from tion_btle.loopback import LoopbackTransport, S3Emulator
+from tion_btle.metrics import Histogram, HistogramRegistry, CallbackInstrumentation, PHASE_GET, PHASE_SET, \
+    PHASE_CONNECT, PHASE_WAIT, PHASE_DECODE, PHASE_WRITE, COUNTER_TIMEOUTS, COUNTER_REASSEMBLY_ERRORS
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        for _ in range(90):
+            histogram.add(0.0015)
+        for _ in range(10):
+            histogram.add(0.3)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.percentile(50), 0.002)
+        self.assertEqual(histogram.percentile(95), 0.5)
+        histogram.add(100)
+        self.assertEqual(histogram.percentile(100), 100)
+
+    def test_phases(self):
+        registry = HistogramRegistry()
+        device = Lite("dummy")
+        device.metrics = registry
+        device.get()
+        device.set({'fan_speed': 2}, max_state_age=0)
+        for phase in (PHASE_GET, PHASE_SET, PHASE_CONNECT, PHASE_WAIT, PHASE_DECODE, PHASE_WRITE):
+            self.assertIsNotNone(registry.histogram(phase), phase)
+        # set() reads current state first
+        self.assertEqual(registry.histogram(PHASE_GET).count, 2)
+        self.assertEqual(registry.histogram(PHASE_SET).count, 1)
+        self.assertIn(PHASE_GET, registry.snapshot()["timings"])
+
+    def test_per_device(self):
+        registry = HistogramRegistry(per_device=True)
+        device = S3("dummy")
+        device.metrics = registry
+        device.get()
+        self.assertIsNone(registry.histogram(PHASE_GET))
+        self.assertEqual(registry.histogram(PHASE_GET, "dummy").count, 1)
+        self.assertIn("dummy/" + PHASE_GET, registry.snapshot()["timings"])
+
+    def test_timeouts(self):
+        class SilentEmulator(S3Emulator):
+            def handle_write(self, handle, data):
+                return []
+
+        registry = HistogramRegistry()
+        device = S3("loopback", LoopbackTransport(SilentEmulator()))
+        device.metrics = registry
+        device.response_timeout = 0.01
+        with self.assertRaises(TionException):
+            device.get()
+        self.assertGreater(registry.counter(COUNTER_TIMEOUTS), 0)
+
+    def test_reassembly_errors(self):
+        counts = []
+        device = Lite("dummy")
+        device.metrics = CallbackInstrumentation(on_count=lambda mac, counter, value: counts.append(counter))
+        device._collect_message(bytearray([0xc0, 0x01]))
+        self.assertEqual(counts, [COUNTER_REASSEMBLY_ERRORS])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+import asyncio
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.aio import AsyncS3
+from tion_btle.fleet import TionFleet
+from tion_btle.polling import AdaptiveInterval, AdaptivePoller
+from tion_btle.loopback import LoopbackTransport, S3Emulator
+
+STATE = {"state": "on", "heater": "on", "heating": "off", "sound": "off", "mode": "outside", "heater_temp": 20,
+         "fan_speed": 2, "in_temp": 18, "out_temp": -5}
+
+
+class DriftingS3Emulator(S3Emulator):
+    """Outside temperature changes on every read"""
+    def handle_write(self, handle, data):
+        if data[1] == self.command_REQUEST_PARAMS:
+            self.frame[7] = (self.frame[7] + 2) & 0x7f
+        return super().handle_write(handle, data)
+
+
+class HangingS3(AsyncS3):
+    """Breezer that does not answer for a second"""
+    async def get(self, timeout=None):
+        await asyncio.sleep(1)
+        return await super().get(timeout)
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+    def test_next_interval(self):
+        policy = AdaptiveInterval(min_interval=10, max_interval=100, backoff=2, temp_threshold=1)
+        self.assertEqual(policy.next_interval(40, None, STATE), 10)
+        self.assertEqual(policy.next_interval(40, STATE, dict(STATE)), 80)
+        self.assertEqual(policy.next_interval(80, STATE, dict(STATE)), 100)
+        self.assertEqual(policy.next_interval(40, STATE, dict(STATE, heating="on")), 10)
+        self.assertEqual(policy.next_interval(40, STATE, dict(STATE, out_temp=-3)), 20)
+        self.assertEqual(policy.next_interval(15, STATE, dict(STATE, in_temp=17)), 10)
+
+
+class TestAdaptivePoller(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.fleet = TionFleet(max_connections=2)
+        self.stable = AsyncS3("AA:00:00:00:00:01", transport=LoopbackTransport(S3Emulator()))
+        self.drifting = AsyncS3("AA:00:00:00:00:02", transport=LoopbackTransport(DriftingS3Emulator()))
+        self.fleet.add(self.stable)
+        self.fleet.add(self.drifting)
+        self.poller = AdaptivePoller(
+            self.fleet, AdaptiveInterval(min_interval=0.02, max_interval=0.16, backoff=2, after_set=0)
+        )
+
+    def tearDown(self):
+        self.stable.close()
+        self.drifting.close()
+        self.loop.close()
+
+    def _run_for(self, seconds: float, coroutine=None):
+        async def scenario():
+            task = asyncio.ensure_future(self.poller.run())
+            if coroutine is not None:
+                await asyncio.sleep(seconds / 2)
+                await coroutine
+                await asyncio.sleep(seconds / 2)
+            else:
+                await asyncio.sleep(seconds)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.loop.run_until_complete(scenario())
+
+    def test_intervals_adapt(self):
+        self._run_for(0.5)
+        schedule = self.poller.schedule()
+        stable = schedule["AA:00:00:00:00:01"]
+        drifting = schedule["AA:00:00:00:00:02"]
+        self.assertEqual(stable["interval"], 0.16)
+        self.assertEqual(drifting["interval"], 0.02)
+        self.assertGreater(drifting["polls"], 2 * stable["polls"])
+
+    def test_fast_poll_after_set(self):
+        self._run_for(0.6, self.poller.set("AA:00:00:00:00:01", {"fan_speed": 5}))
+        stable = self.poller.schedule()["AA:00:00:00:00:01"]
+        self.assertEqual(stable["changes"], 1)
+        self.assertEqual(self.fleet.state("AA:00:00:00:00:01")["fan_speed"], 5)
+
+    def test_hanging_device(self):
+        self.fleet.remove("AA:00:00:00:00:02")
+        hanging = HangingS3("AA:00:00:00:00:03", transport=LoopbackTransport(S3Emulator()))
+        self.fleet.add(hanging)
+        try:
+            self._run_for(0.5)
+        finally:
+            hanging.close()
+        schedule = self.poller.schedule()
+        self.assertEqual(schedule["AA:00:00:00:00:03"]["polls"], 0)
+        # stable device is polled on its own cadence: 0.02 + 0.04 + 0.08 + 0.16 s
+        self.assertGreaterEqual(schedule["AA:00:00:00:00:01"]["polls"], 4)
+
+    def test_removed_device(self):
+        self.fleet.remove("AA:00:00:00:00:02")
+        self.assertEqual(list(self.poller.schedule()), ["AA:00:00:00:00:01"])
+
+
+if __name__ == '__main__':
+    unittest.main()
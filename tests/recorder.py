@@ -0,0 +1,73 @@
+#!/usr/bin/python
+import sys
+import os
+import tempfile
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.lite import Lite
+from tion_btle.s3 import S3
+from tion_btle.loopback import LoopbackTransport, LiteEmulator
+from tion_btle.recorder import FrameRecorder, read_records, replay
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_ring(self):
+        with FrameRecorder(self.path, size=200) as recorder:
+            for i in range(50):
+                recorder.record(FrameRecorder.DIRECTION_RX, "AA:BB:CC:DD:EE:%02X" % i, i, bytes([i] * (i % 7 + 1)), i)
+        records = list(read_records(self.path))
+        self.assertGreater(len(records), 3)
+        self.assertEqual([r.handle for r in records], list(range(50 - len(records), 50)))
+        last = records[-1]
+        self.assertEqual(last.mac, "AA:BB:CC:DD:EE:31")
+        self.assertEqual(last.data, bytes([49] * (49 % 7 + 1)))
+        self.assertEqual(last.timestamp, 49)
+
+    def test_reopen(self):
+        with FrameRecorder(self.path, size=1000) as recorder:
+            recorder.record(FrameRecorder.DIRECTION_TX, "dummy", 1, b"\x01")
+        with FrameRecorder(self.path, size=1000) as recorder:
+            recorder.record(FrameRecorder.DIRECTION_TX, "dummy", 2, b"\x02")
+        self.assertEqual([r.handle for r in read_records(self.path)], [1, 2])
+
+    def test_replay(self):
+        device = Lite("AA:BB:CC:DD:EE:FF", LoopbackTransport(LiteEmulator()))
+        # set() over unchecked cached handles would read state after write
+        device.handle_cache = None
+        with FrameRecorder(self.path) as recorder:
+            device.recorder = recorder
+            first = device.get_state()
+            device.set({'fan_speed': 2})
+            second = device.get_state()
+            device.recorder = None
+
+        records = list(read_records(self.path))
+        self.assertEqual({r.direction for r in records}, {FrameRecorder.DIRECTION_RX, FrameRecorder.DIRECTION_TX})
+        replayed = list(replay(records, Lite("dummy"), mac="aa:bb:cc:dd:ee:ff"))
+        self.assertEqual([s for _, s in replayed], [first, second])
+        received = [r.timestamp for r in records if r.direction == FrameRecorder.DIRECTION_RX]
+        for timestamp, state in replayed:
+            self.assertEqual(state.taken_at, timestamp)
+            self.assertIn(timestamp, received)
+
+    def test_replay_s3(self):
+        device = S3("dummy")
+        with FrameRecorder(self.path) as recorder:
+            device.recorder = recorder
+            state = device.get_state()
+        self.assertEqual([s for _, s in replay(read_records(self.path), S3("dummy"))], [state])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+import sys
+import os
+import time
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.tion import TionException, DeviceOffline
+from tion_btle.s3 import S3
+from tion_btle.retry import RetryPolicy, CircuitBreaker
+from tion_btle.transport import TransportDisconnected, TransportGattError
+from tion_btle.loopback import LoopbackTransport, S3Emulator
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_delays(self):
+        policy = RetryPolicy(max_tries=5, base_delay=0.5, multiplier=2, max_delay=3, jitter=0)
+        self.assertEqual(list(policy.delays()), [0.5, 1, 2, 3])
+
+        policy.jitter = 0.5
+        for delay, limit in zip(policy.delays(), [0.5, 1, 2, 3]):
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+
+    def test_run(self):
+        calls = []
+        retries = []
+
+        def action():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ValueError("fail")
+            return "done"
+
+        policy = RetryPolicy(max_tries=3, base_delay=0, jitter=0)
+        self.assertEqual(policy.run(action, on_retry=lambda e, n, d: retries.append(n)), "done")
+        self.assertEqual(retries, [1, 2])
+
+        calls.clear()
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_tries=2, base_delay=0).run(action)
+        self.assertEqual(len(calls), 2)
+
+        calls.clear()
+        with self.assertRaises(ValueError):
+            policy.run(action, retry_on=(KeyError,))
+        self.assertEqual(len(calls), 1)
+
+        calls.clear()
+        with self.assertRaises(ValueError):
+            policy.run(action, fatal=(ValueError,))
+        self.assertEqual(len(calls), 1)
+
+    def test_max_elapsed(self):
+        calls = []
+
+        def action():
+            calls.append(1)
+            raise ValueError("fail")
+
+        started = time.monotonic()
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_tries=10, base_delay=0.02, multiplier=1, jitter=0, max_elapsed=0.05).run(action)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(len(calls), 3)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_states(self):
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertGreater(breaker.retry_in, 0.05)
+
+        time.sleep(0.11)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+
+class TestDeviceRetries(unittest.TestCase):
+    def setUp(self):
+        self.transport = LoopbackTransport(S3Emulator())
+        self.transport.reachable = False
+        self.device = S3("AA:BB:CC:DD:EE:FF", self.transport)
+        self.device.connect_retry = RetryPolicy(max_tries=2, base_delay=0)
+        self.device.breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+        self.device.handle_cache = None
+
+    def test_offline_device_fails_fast(self):
+        for _ in range(2):
+            with self.assertRaises(TransportDisconnected):
+                self.device.get()
+        self.assertEqual(self.transport.connects, 4)
+
+        with self.assertRaises(DeviceOffline):
+            self.device.get()
+        self.assertEqual(self.transport.connects, 4)
+
+        time.sleep(0.06)
+        self.transport.reachable = True
+        self.assertEqual(self.device.get()["fan_speed"], 4)
+        self.assertEqual(self.device.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_write_failure_message(self):
+        self.transport.reachable = True
+        self.device.action_retry = RetryPolicy(max_tries=2, base_delay=0)
+        self.device.connect()
+
+        def rejected(handle, data, with_response=False):
+            raise TransportGattError("Invalid handle %d" % handle)
+        self.transport.write = rejected
+        with self.assertRaises(TionException) as context:
+            self.device._do_action(self.device._try_write, request=bytearray([0x3d, 0x01]))
+        self.assertEqual(context.exception.expression, "_try_write")
+        self.assertIn("Could not write request 3d01", context.exception.message)
+
+    def test_lost_link_is_not_retried(self):
+        self.transport.reachable = True
+        self.device.action_retry = RetryPolicy(max_tries=3, base_delay=1)
+        self.device.connect()
+        self.transport.disconnect()
+        started = time.monotonic()
+        with self.assertRaises(TionException) as context:
+            self.device._do_action(self.device._try_write, request=bytearray([0x3d, 0x01]))
+        self.assertIsInstance(context.exception.__cause__, TransportDisconnected)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/python
+import sys
+import os
+import threading
+import time
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.tion import TionException
+from tion_btle.s3 import S3
+from tion_btle.lite import Lite
+from tion_btle.scanner import TionScanner, Advertisement
+from tion_btle.loopback import LoopbackTransport, S3Emulator, LiteEmulator
+
+AIR = {
+    0: [
+        Advertisement("aa:00:00:00:00:01", -70, [S3.uuid], "Tion Breezer"),
+        Advertisement("AA:00:00:00:00:02", -80, [Lite.uuid], "Breezer Lite"),
+        Advertisement("AA:00:00:00:00:03", -40, ["0000180f-0000-1000-8000-00805f9b34fb"], "Thermometer"),
+    ],
+    1: [
+        Advertisement("AA:00:00:00:00:02", -50, [Lite.uuid], "Breezer Lite"),
+    ],
+}
+
+
+class FakeAir:
+    def __init__(self):
+        self.scans = []
+        self.lock = threading.Lock()
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    def __call__(self, adapter, timeout):
+        with self.lock:
+            self.scans.append(adapter)
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        time.sleep(timeout)
+        with self.lock:
+            self.concurrent -= 1
+        if adapter == 2:
+            raise RuntimeError("No such adapter")
+        return AIR[adapter]
+
+
+class TestScanner(unittest.TestCase):
+    def setUp(self):
+        self.air = FakeAir()
+        self.scanner = TionScanner(adapters=(0, 1, 2), backend=self.air)
+
+    def test_scan(self):
+        found = self.scanner.scan(timeout=0.05)
+        self.assertEqual([(r.mac, r.model, r.adapter) for r in found], [
+            ("AA:00:00:00:00:01", S3, 0),
+            ("AA:00:00:00:00:02", Lite, 1),
+        ])
+        self.assertEqual(self.air.max_concurrent, 3)
+        self.assertEqual(found[1].rssi_by_adapter, {0: -80, 1: -50})
+
+    def test_cache(self):
+        self.scanner.scan(timeout=0.01)
+        self.scanner.scan(timeout=0.01)
+        device = self.scanner.create("aa:00:00:00:00:02", transport=LoopbackTransport(LiteEmulator()))
+        self.assertIsInstance(device, Lite)
+        self.assertEqual(len(self.air.scans), 3)
+
+        self.scanner.ttl = 0
+        self.scanner.scan(timeout=0.01)
+        self.assertEqual(len(self.air.scans), 6)
+
+    def test_missing_device(self):
+        self.assertIsNone(self.scanner.find("AA:00:00:00:00:09", timeout=0.01))
+        self.assertIsNone(self.scanner.find("AA:00:00:00:00:09", timeout=0.01))
+        with self.assertRaises(TionException):
+            self.scanner.create("AA:00:00:00:00:09", timeout=0.01)
+        # one scan with every adapter
+        self.assertEqual(len(self.air.scans), 3)
+
+        self.scanner.ttl = 0
+        self.assertIsNone(self.scanner.find("AA:00:00:00:00:09", timeout=0.01))
+        self.assertEqual(len(self.air.scans), 6)
+
+    def test_resolve(self):
+        self.assertEqual(self.scanner.resolve("lite:AA:00:00:00:00:07"), (Lite, "AA:00:00:00:00:07", None))
+        self.assertEqual(self.air.scans, [])
+        model, mac, found = self.scanner.resolve("AA:00:00:00:00:02", timeout=0.01)
+        self.assertEqual((model, mac, found.adapter), (Lite, "AA:00:00:00:00:02", 1))
+        with self.assertRaises(TionException):
+            self.scanner.resolve("AA:00:00:00:00:09", timeout=0.01)
+
+    def test_factory(self):
+        device = self.scanner.create("AA:00:00:00:00:01", timeout=0.01, transport=LoopbackTransport(S3Emulator()))
+        self.assertIsInstance(device, S3)
+        self.assertEqual(device.get()["model"], "S3")
+        self.assertEqual(device.adapter, 0)
+        with self.assertRaises(TionException):
+            self.scanner.create("AA:00:00:00:00:03", timeout=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
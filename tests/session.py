@@ -0,0 +1,47 @@
+#!/usr/bin/python
+import sys
+import os
+import time
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.lite import Lite
+from tion_btle.loopback import LoopbackTransport, LiteEmulator
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.transport = LoopbackTransport(LiteEmulator())
+        self.device = Lite("loopback", self.transport)
+
+    def test_keeps_link(self):
+        with self.device.session(idle_timeout=10) as session:
+            session.get()
+            session.set({'fan_speed': 2})
+            result = session.get()
+            self.assertEqual(self.device.connection_status, 'conn')
+        self.assertEqual(result['fan_speed'], 2)
+        self.assertEqual(self.transport.connects, 1)
+        self.assertEqual(self.device.connection_status, 'disc')
+
+    def test_idle_disconnect(self):
+        with self.device.session(idle_timeout=0.01) as session:
+            session.get()
+            time.sleep(0.1)
+            self.assertEqual(self.device.connection_status, 'disc')
+            session.get()
+        self.assertEqual(self.transport.connects, 2)
+
+    def test_reconnect(self):
+        with self.device.session() as session:
+            session.get()
+            self.transport.disconnect()
+            self.assertEqual(session.get()['model'], 'Lite')
+        self.assertEqual(self.transport.connects, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
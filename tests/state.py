@@ -0,0 +1,48 @@
+#!/usr/bin/python
+import sys
+import os
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.s3 import S3, S3State
+from tion_btle.lite import Lite, LiteState
+
+
+class TestState(unittest.TestCase):
+    def test_snapshot(self):
+        for cls, state_cls in ((S3, S3State), (Lite, LiteState)):
+            with self.subTest(cls.__name__):
+                device = cls("dummy")
+                state = device.get_state()
+                self.assertIsInstance(state, state_cls)
+                self.assertEqual(state.fan_speed, 4)
+                self.assertEqual(state.model, cls.__name__)
+                self.assertEqual(list(state.as_dict().keys()), list(device.get().keys()))
+                self.assertFalse(hasattr(state, "__dict__"))
+                with self.assertRaises(AttributeError):
+                    state.fan_speed = 1
+
+    def test_diff(self):
+        device = Lite("dummy")
+        first = device.get_state()
+        second = device.get_state()
+        self.assertEqual(first, second)
+        self.assertEqual(second.diff(first), {})
+        device.set({'fan_speed': 2})
+        third = device.get_state()
+        self.assertEqual(third.diff(second), {'fan_speed': 2})
+        self.assertNotEqual(third, second)
+        self.assertIn('fan_speed', third.diff(None))
+        self.assertNotIn('taken_at', third.diff(None))
+
+    def test_s3_time(self):
+        state = S3("dummy").get_state()
+        self.assertEqual(state.time, "12:10")
+        self.assertEqual(state.as_dict()['fw_version'], "0033")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+import sys
+import os
+import time
+import unittest
+
+PACKAGE_PARENT = '..'
+SCRIPT_DIR = os.path.dirname(os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__))))
+sys.path.append(os.path.normpath(os.path.join(SCRIPT_DIR, PACKAGE_PARENT)))
+
+from tion_btle.s3 import S3
+from tion_btle.lite import Lite
+from tion_btle.loopback import LoopbackTransport, S3Emulator, LiteEmulator
+
+
+def wait_for(condition, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestSubscribe(unittest.TestCase):
+    def test_get_publishes_changes(self):
+        device = S3("dummy")
+        events = []
+        unsubscribe = device.subscribe(lambda state, changes: events.append(changes))
+        device.get()
+        device.get()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["fan_speed"], 4)
+
+        device.set({"fan_speed": 2}, max_state_age=0)
+        device.get()
+        self.assertEqual(events[-1], {"fan_speed": 2})
+
+        unsubscribe()
+        device.set({"fan_speed": 3}, max_state_age=0)
+        device.get()
+        self.assertEqual(len(events), 2)
+
+    def test_s3_push(self):
+        emulator = S3Emulator()
+        transport = LoopbackTransport(emulator)
+        device = S3("loopback", transport)
+        events = []
+        device.subscribe(lambda state, changes: events.append((state, changes)))
+        with device.session(idle_timeout=0.05) as session:
+            session.get()
+            session.listen(poll_interval=0.01)
+            time.sleep(0.1)
+            self.assertEqual(device.connection_status, "conn")
+
+            emulator.frame[2] = (emulator.frame[2] & 0xf0) | 6
+            transport.push(bytes(emulator.frame))
+            self.assertTrue(wait_for(lambda: len(events) == 2))
+            self.assertEqual(events[-1][1], {"fan_speed": 6})
+            self.assertEqual(events[-1][0].fan_speed, 6)
+        self.assertEqual(device.connection_status, "disc")
+
+    def test_lite_push(self):
+        emulator = LiteEmulator()
+        transport = LoopbackTransport(emulator)
+        device = Lite("loopback", transport)
+        events = []
+        device.subscribe(lambda state, changes: events.append(changes))
+        with device.session() as session:
+            session.get()
+            session.listen(poll_interval=0.01)
+            emulator.payload[3] = 25
+            # frames that are not state responses are ignored
+            transport.push(bytes([0x80, 0x11, 0x00, 0x3a, 0x00, 0x33, 0x12, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]))
+            transport.push(*[bytes(p) for p in emulator.status_packets(bytes(4))])
+            self.assertTrue(wait_for(lambda: len(events) == 2))
+        self.assertEqual(events[-1], {"heater_temp": 25})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,2 +1,6 @@
 from .s3 import S3
 from .lite import Lite
+from .aio import AsyncS3, AsyncLite
+from .fleet import TionFleet
+from .scanner import TionScanner
+from .polling import AdaptivePoller
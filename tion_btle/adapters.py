@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+_LOGGER = logging.getLogger(__name__)
+
+UNKNOWN_RSSI = -100
+"""Signal level assumed for adapter that did not hear device"""
+
+
+class AdapterBalancer:
+    """
+    Assigns devices to bluetooth adapters.
+
+    Device goes to adapter with the smallest score: number of devices already assigned to adapter minus signal
+    level of device on this adapter divided by rssi_per_device. So with default rssi_per_device adapter that hears
+    device 10 dBm better may serve one device more.
+
+    After failure_threshold failures in a row device is moved to the best other adapter, and its old adapter is not
+    used for this device during cooldown seconds.
+    """
+
+    def __init__(self, adapters: Sequence[int] = (0, 1), failure_threshold: int = 3, cooldown: float = 300.0,
+                 rssi_per_device: float = 10.0):
+        """
+        :param adapters: indexes of hci adapters
+        :param failure_threshold: failures in a row that cause failover
+        :param cooldown: seconds during which failed adapter is not used for device
+        :param rssi_per_device: signal level difference in dBm that is worth one device of load
+        """
+        self.adapters = tuple(adapters)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.rssi_per_device = rssi_per_device
+        self._lock = threading.Lock()
+        self._assigned: Dict[str, int] = {}
+        self._rssi: Dict[str, Dict[int, int]] = {}
+        self._failures: Dict[str, int] = {}
+        self._banned: Dict[str, Dict[int, float]] = {}
+
+    def load(self) -> Dict[int, int]:
+        """
+        :return: adapter -> number of assigned devices
+        """
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> Dict[int, int]:
+        load = {adapter: 0 for adapter in self.adapters}
+        for adapter in self._assigned.values():
+            load[adapter] = load.get(adapter, 0) + 1
+        return load
+
+    def _choose(self, mac: str, exclude: Optional[int] = None) -> int:
+        load = self._load()
+        current = self._assigned.get(mac)
+        if current is not None:
+            load[current] -= 1
+        now = time.monotonic()
+        banned = {a for a, until in self._banned.get(mac, {}).items() if until > now}
+        candidates = [a for a in self.adapters if a != exclude and a not in banned]
+        if not candidates:
+            candidates = [a for a in self.adapters if a != exclude] or list(self.adapters)
+        rssi = self._rssi.get(mac, {})
+        return min(candidates, key=lambda a: load[a] - rssi.get(a, UNKNOWN_RSSI) / self.rssi_per_device)
+
+    def update_rssi(self, mac: str, rssi: Dict[int, int]) -> None:
+        """
+        Remember signal level of device
+        :param mac: device MAC address
+        :param rssi: adapter -> rssi in dBm, e.g. from scan results
+        """
+        with self._lock:
+            self._rssi.setdefault(mac.upper(), {}).update(rssi)
+
+    def assign(self, mac: str, rssi: Dict[int, int] = None) -> int:
+        """
+        Choose adapter for device. Device that already has adapter keeps it
+        :param mac: device MAC address
+        :param rssi: adapter -> rssi, if known
+        :return: adapter index
+        """
+        mac = mac.upper()
+        if rssi:
+            self.update_rssi(mac, rssi)
+        with self._lock:
+            adapter = self._assigned.get(mac)
+            if adapter is None:
+                adapter = self._assigned[mac] = self._choose(mac)
+                _LOGGER.debug("%s is assigned to hci%d", mac, adapter)
+            return adapter
+
+    def adapter_of(self, mac: str) -> Optional[int]:
+        return self._assigned.get(mac.upper())
+
+    def release(self, mac: str) -> None:
+        """Forget device"""
+        mac = mac.upper()
+        with self._lock:
+            for table in (self._assigned, self._rssi, self._failures, self._banned):
+                table.pop(mac, None)
+
+    def record_success(self, mac: str) -> None:
+        with self._lock:
+            self._failures.pop(mac.upper(), None)
+
+    def record_failure(self, mac: str) -> Optional[int]:
+        """
+        Count failed exchange with device
+        :return: new adapter if device is moved, None otherwise
+        """
+        mac = mac.upper()
+        with self._lock:
+            current = self._assigned.get(mac)
+            failures = self._failures[mac] = self._failures.get(mac, 0) + 1
+            if current is None or failures < self.failure_threshold or len(self.adapters) < 2:
+                return None
+            self._failures[mac] = 0
+            self._banned.setdefault(mac, {})[current] = time.monotonic() + self.cooldown
+            adapter = self._choose(mac, exclude=current)
+            self._assigned[mac] = adapter
+            _LOGGER.warning("%s failed %d times on hci%d, moving to hci%d", mac, failures, current, adapter)
+            return adapter
@@ -0,0 +1,191 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Type
+
+if __package__ == "":
+    from tion_btle.tion import tion, TionSession
+    from tion_btle.coalesce import AsyncSetCoalescer
+    from tion_btle.transport import Transport
+    from tion_btle.state import TionState
+    from tion_btle.s3 import S3
+    from tion_btle.lite import Lite
+else:
+    from .tion import tion, TionSession
+    from .coalesce import AsyncSetCoalescer
+    from .transport import Transport
+    from .state import TionState
+    from .s3 import S3
+    from .lite import Lite
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncTion:
+    """
+    asyncio frontend for tion breezers.
+
+    Every device owns a single worker thread, so all radio exchanges with one breezer are serialized, while
+    exchanges with different breezers run concurrently. Polling N devices with asyncio.gather() takes roughly the
+    time of the slowest one.
+
+    Cancelling an awaiting coroutine (directly or by timeout) releases the caller at once. The exchange that is
+    already on air is finished by the worker, and the next queued call starts only after it.
+    """
+    device_class: Type[tion] = tion
+
+    def __init__(self, mac: str, executor: Optional[ThreadPoolExecutor] = None, transport: Transport = None,
+                 adapter: int = None):
+        self._device = self.device_class(mac, transport, adapter)
+        self._own_executor = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="tion-%s" % mac
+        )
+        self._last_call: Optional[asyncio.Future] = None
+        self._coalescer: Optional[AsyncSetCoalescer] = None
+        self._session: Optional[TionSession] = None
+
+    @property
+    def device(self) -> tion:
+        """Underlying blocking device object"""
+        return self._device
+
+    @property
+    def mac(self) -> str:
+        return self._device.mac
+
+    @property
+    def model(self) -> str:
+        return self._device.model
+
+    @property
+    def busy(self) -> Optional[asyncio.Future]:
+        """
+        Worker call that is still running or queued, e.g. after its caller was cancelled
+        :return: future that is done when worker finishes the last submitted call, None if worker is idle
+        """
+        future = self._last_call
+        return future if future is not None and not future.done() else None
+
+    async def _run(self, action: Callable, *args, timeout: Optional[float] = None):
+        loop = asyncio.get_event_loop()
+        future = self._last_call = loop.run_in_executor(self._executor, functools.partial(action, *args))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            _LOGGER.warning("%s: %s did not finish in %s seconds", self.mac, action.__name__, timeout)
+            raise
+
+    def keep_link(self, idle_timeout: float = 30.0) -> None:
+        """
+        Keep link to device between requests, see tion.session(). Link is opened by the next request and dropped after
+        idle_timeout seconds without requests or by close()
+        """
+        if self._session is None:
+            self._session = self._device.session(idle_timeout)
+
+    def drop_link(self) -> Optional[asyncio.Future]:
+        """
+        Close link kept by keep_link() on worker thread. The next request opens it again
+        :return: future that is done when link is closed, None if link is not kept
+        """
+        session = self._session
+        if session is None:
+            return None
+        return asyncio.get_event_loop().run_in_executor(self._executor, session.close)
+
+    def _linked(self, action: Callable) -> Callable:
+        """Wrap device action to run over kept link, if keep_link() was called"""
+        @functools.wraps(action)
+        def call(*args):
+            session = self._session
+            if session is None:
+                return action(*args)
+            # restores session which link failed to open before
+            session.open()
+            return session._run(action, *args)
+        return call
+
+    async def get(self, timeout: Optional[float] = None) -> dict:
+        """
+        Get current device state
+        :param timeout: seconds to wait for the result. None means wait forever
+        :return: dictionary with device state, same as tion.get()
+        """
+        return await self._run(self._linked(self._device.get), timeout=timeout)
+
+    async def get_state(self, timeout: Optional[float] = None) -> TionState:
+        """
+        Get current device state as immutable snapshot
+        :param timeout: seconds to wait for the result. None means wait forever
+        :return: state snapshot, same as tion.get_state()
+        """
+        return await self._run(self._linked(self._device.get_state), timeout=timeout)
+
+    async def set(self, new_settings: dict = None, timeout: Optional[float] = None,
+                  confirm: bool = False) -> Optional[dict]:
+        """
+        Set new breezer state
+        :param new_settings: json with new state, same as for tion.set()
+        :param timeout: seconds to wait for the result. None means wait forever
+        :param confirm: get state from device after write, same as for tion.set()
+        :return: None, or dictionary with device state after write if confirm is True
+        """
+        coalescer = self.coalescer
+        if coalescer is None:
+            return await self._run(self._linked(self._device.set), new_settings, None, confirm, timeout=timeout)
+        result = await asyncio.wait_for(
+            coalescer.submit(self._device._normalize_settings(new_settings), None, confirm), timeout
+        )
+        return result if confirm else None
+
+    def coalesce(self, window: float, max_delay: float = None) -> None:
+        """Merge set() calls that come within window seconds, see tion.coalesce()"""
+        self._device.coalesce(window, max_delay)
+
+    @property
+    def coalescer(self) -> Optional[AsyncSetCoalescer]:
+        """
+        Coalescer of concurrent set() calls, None if coalescing is disabled on device.
+
+        Calls are merged before worker thread: it serializes them, so merging in tion.set() would only delay them.
+        """
+        source = self._device.coalescer
+        if source is None:
+            self._coalescer = None
+        elif self._coalescer is None or (self._coalescer.window, self._coalescer.max_delay) != \
+                (source.window, source.max_delay):
+            self._coalescer = AsyncSetCoalescer(self._apply_settings, source.window, source.max_delay)
+        return self._coalescer
+
+    async def _apply_settings(self, new_settings: dict, max_state_age: Optional[float], confirm: bool,
+                              timeout: Optional[float] = None) -> Optional[dict]:
+        """Write normalized settings without coalescing of tion.set()"""
+        return await self._run(self._linked(self._device._apply_settings), new_settings, max_state_age, confirm,
+                               timeout=timeout)
+
+    async def pair(self, timeout: Optional[float] = None) -> None:
+        return await self._run(self._device.pair, timeout=timeout)
+
+    def close(self) -> None:
+        """Release worker thread and kept link. Exchange that is in progress will be finished."""
+        session, self._session = self._session, None
+        if session is not None:
+            self._executor.submit(session.close)
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncS3(AsyncTion):
+    device_class = S3
+
+
+class AsyncLite(AsyncTion):
+    device_class = Lite
@@ -0,0 +1,105 @@
+"""
+Columnar decoding of recorded breezer responses with numpy.
+
+numpy is optional dependency: pip3 install tion-btle[batch]
+"""
+from typing import Dict, Union
+
+import numpy as np
+
+FramesLike = Union[np.ndarray, bytes, bytearray, memoryview]
+
+S3_FRAME_SIZE = 20
+LITE_FRAME_SIZE = 57
+SECONDS_IN_DAY = 86400
+
+
+def _as_frames(frames: FramesLike, frame_size: int) -> np.ndarray:
+    """
+    Represent frames as 2-D uint8 array
+    :param frames: 2-D array with one frame per row or buffer with concatenated frames of frame_size bytes
+    :param frame_size: minimal length of frame
+    :return: array of shape (n, frame_size) or wider
+    """
+    if isinstance(frames, np.ndarray) and frames.ndim == 2:
+        array = frames.astype(np.uint8, copy=False)
+    else:
+        array = np.frombuffer(frames, dtype=np.uint8) if not isinstance(frames, np.ndarray) else frames
+        if len(array) % frame_size:
+            raise ValueError("Buffer length %d is not multiple of frame size %d" % (len(array), frame_size))
+        array = array.reshape(-1, frame_size)
+    if array.shape[1] < frame_size:
+        raise ValueError("Frames are %d bytes long, at least %d expected" % (array.shape[1], frame_size))
+    return array
+
+
+def decode_temperature(raw: np.ndarray) -> np.ndarray:
+    """Vectorized tion.decode_temperature()"""
+    return raw.astype(np.int16) - ((raw >= 0x80) * 0x100).astype(np.int16)
+
+
+def _bit(column: np.ndarray, bit: int) -> np.ndarray:
+    return ((column >> bit) & 1).astype(np.bool_)
+
+
+def _little_endian(frames: np.ndarray, start: int, size: int) -> np.ndarray:
+    result = np.zeros(len(frames), dtype=np.uint32)
+    for i in range(size):
+        result |= frames[:, start + i].astype(np.uint32) << (8 * i)
+    return result
+
+
+def decode_s3(frames: FramesLike) -> Dict[str, np.ndarray]:
+    """
+    Decode S3 status responses, as passed to S3._decode_response()
+    :param frames: 2-D array with one frame per row or buffer with concatenated 20-byte frames
+    :return: dictionary with column per field
+    """
+    f = _as_frames(frames, S3_FRAME_SIZE)
+    flags = f[:, 4]
+    return {
+        "fan_speed": f[:, 2] & 0x0f,
+        "mode": f[:, 2] >> 4,
+        "heater": _bit(flags, 0),
+        "state": _bit(flags, 1),
+        "timer": _bit(flags, 2),
+        "sound": _bit(flags, 3),
+        "target_temp": f[:, 3].copy(),
+        "out_temp": decode_temperature(f[:, 7]),
+        "in_temp": decode_temperature(f[:, 8]),
+        "filter_remain": f[:, 10].astype(np.uint16) * 256 + f[:, 9],
+        "hours": f[:, 11].copy(),
+        "minutes": f[:, 12].copy(),
+        "error_code": f[:, 13].copy(),
+        "productivity": f[:, 14].copy(),
+        "fw_version": f[:, 18].astype(np.uint16) << 8 | f[:, 17],
+    }
+
+
+def decode_lite(frames: FramesLike) -> Dict[str, np.ndarray]:
+    """
+    Decode Lite status payloads, as passed to Lite._decode_response()
+    :param frames: 2-D array with one payload per row or buffer with concatenated 57-byte payloads
+    :return: dictionary with column per field. Work times and filter_remain are in days
+    """
+    f = _as_frames(frames, LITE_FRAME_SIZE)
+    flags = f[:, 0]
+    return {
+        "state": _bit(flags, 0),
+        "sound": _bit(flags, 1),
+        "light": _bit(flags, 2),
+        "filter_change_required": _bit(flags, 4),
+        "co2_auto_control": _bit(flags, 5),
+        "heater": _bit(flags, 6),
+        "have_heater": _bit(flags, 7),
+        "mode": f[:, 2].copy(),
+        "target_temp": f[:, 3].copy(),
+        "fan_speed": f[:, 4].copy(),
+        "in_temp": decode_temperature(f[:, 5]),
+        "out_temp": decode_temperature(f[:, 6]),
+        "electronic_temp": f[:, 7].copy(),
+        "electronic_work_time": _little_endian(f, 8, 3) / SECONDS_IN_DAY,
+        "filter_remain": _little_endian(f, 16, 4) / SECONDS_IN_DAY,
+        "device_work_time": _little_endian(f, 20, 4) / SECONDS_IN_DAY,
+        "error_code": f[:, 28].copy(),
+    }
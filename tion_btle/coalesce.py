@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Batch:
+    def __init__(self, started: float):
+        self.settings: dict = {}
+        self.max_state_age: Optional[float] = None
+        self.confirm: bool = False
+        self.started = started
+        self.updated = started
+        self.callers: int = 0
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Future] = None
+        """Task that applies batch of AsyncSetCoalescer"""
+
+    def add(self, settings: dict, max_state_age: Optional[float], confirm: bool, now: float) -> None:
+        self.settings.update(settings)
+        if max_state_age is not None:
+            self.max_state_age = max_state_age if self.max_state_age is None else min(self.max_state_age, max_state_age)
+        self.confirm = self.confirm or confirm
+        self.updated = now
+        self.callers += 1
+
+    def delay(self, window: float, max_delay: float) -> float:
+        """Seconds until batch is closed"""
+        return min(self.updated + window, self.started + max_delay) - time.monotonic()
+
+
+class SetCoalescer:
+    """
+    Merges settings submitted from different threads within short time to one write.
+
+    The first caller of a batch waits until no new settings are submitted for window seconds, but not longer than
+    max_delay seconds since the batch was started, then applies merged settings. Later settings override earlier ones.
+    All callers of the batch get the same result or exception. Batch is confirmed if any of its callers asked for it.
+    """
+
+    def __init__(self, apply: Callable[[dict, Optional[float], bool], Any], window: float, max_delay: float = None):
+        """
+        :param apply: called with merged settings, the smallest max_state_age passed by callers and confirm flag
+        :param window: quiet time that closes batch
+        :param max_delay: maximum time between the first submit and apply, default is 4 windows
+        """
+        self._apply = apply
+        self.window = window
+        self.max_delay = max_delay if max_delay is not None else 4 * window
+        self._lock = threading.Lock()
+        self._batch: Optional[_Batch] = None
+
+    def submit(self, settings: dict, max_state_age: float = None, confirm: bool = False,
+               apply: Callable[[dict, Optional[float], bool], Any] = None) -> Any:
+        """
+        Add settings to current batch and wait until it is applied
+        :param apply: used instead of coalescer apply if this call starts the batch
+        :return: result of apply
+        :raises: exception raised by apply
+        """
+        now = time.monotonic()
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch(now)
+            batch.add(settings, max_state_age, confirm, now)
+
+        if leader:
+            self._run(batch, apply if apply is not None else self._apply)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.result
+
+    def _run(self, batch: _Batch, apply: Callable[[dict, Optional[float], bool], Any]):
+        while True:
+            with self._lock:
+                delay = batch.delay(self.window, self.max_delay)
+                if delay <= 0:
+                    # new submits start the next batch
+                    self._batch = None
+                    break
+            time.sleep(delay)
+
+        _LOGGER.debug("Applying %d merged set requests: %s", batch.callers, batch.settings)
+        try:
+            batch.result = apply(batch.settings, batch.max_state_age, batch.confirm)
+        except BaseException as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+
+class AsyncSetCoalescer:
+    """
+    SetCoalescer for coroutines: merges settings submitted within short time to one write.
+
+    Batch is applied by its own task, so cancelled caller does not cancel write for others.
+    """
+
+    def __init__(self, apply: Callable[[dict, Optional[float], bool], Awaitable], window: float,
+                 max_delay: float = None):
+        """
+        :param apply: coroutine function, called with merged settings, the smallest max_state_age passed by callers
+          and confirm flag
+        :param window: quiet time that closes batch
+        :param max_delay: maximum time between the first submit and apply, default is 4 windows
+        """
+        self._apply = apply
+        self.window = window
+        self.max_delay = max_delay if max_delay is not None else 4 * window
+        self._batch: Optional[_Batch] = None
+
+    async def submit(self, settings: dict, max_state_age: float = None, confirm: bool = False) -> Any:
+        """
+        Add settings to current batch and wait until it is applied
+        :return: result of apply
+        :raises: exception raised by apply
+        """
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = _Batch(time.monotonic())
+            batch.task = asyncio.ensure_future(self._run(batch))
+        batch.add(settings, max_state_age, confirm, time.monotonic())
+        return await asyncio.shield(batch.task)
+
+    async def _run(self, batch: _Batch):
+        while True:
+            delay = batch.delay(self.window, self.max_delay)
+            if delay <= 0:
+                # new submits start the next batch
+                self._batch = None
+                break
+            await asyncio.sleep(delay)
+
+        _LOGGER.debug("Applying %d merged set requests: %s", batch.callers, batch.settings)
+        return await self._apply(batch.settings, batch.max_state_age, batch.confirm)
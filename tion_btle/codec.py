@@ -0,0 +1,209 @@
+import struct
+from typing import Dict, List, Sequence, Tuple
+
+
+class Field:
+    """
+    Value stored in frame.
+
+    Field occupies struct item of format fmt at offset. If width is set, field is width bits of this item starting
+    from bit shift, so several fields may share one byte. Optional field may be missing in shorter frames sent by
+    some firmwares.
+    """
+    __slots__ = ("name", "offset", "fmt", "shift", "width", "default", "optional")
+
+    def __init__(self, name: str, offset: int, fmt: str = "B", shift: int = 0, width: int = 0, default: int = 0,
+                 optional: bool = False):
+        self.name = name
+        self.offset = offset
+        self.fmt = fmt
+        self.shift = shift
+        self.width = width
+        self.default = default
+        self.optional = optional
+
+    @property
+    def mask(self) -> int:
+        return (1 << self.width) - 1 if self.width else 0
+
+    @property
+    def size(self) -> int:
+        return struct.calcsize("<" + self.fmt)
+
+
+class Schema:
+    """
+    Frame layout compiled to single struct.Struct.
+
+    decode() is one unpack_from() plus shifts and masks, encode() is shifts and masks plus one pack_into(). Bytes
+    that are not covered by fields are zero in encoded frame. Frame is decoded if it holds all required fields, optional
+    fields that follow them are decoded only if frame holds all of them.
+    """
+
+    def __init__(self, name: str, size: int, fields: Sequence[Field]):
+        self.name = name
+        self.size = size
+        self.fields: Tuple[Field, ...] = tuple(fields)
+
+        slots: Dict[Tuple[int, str], int] = {}
+        for f in sorted(self.fields, key=lambda x: x.offset):
+            slots.setdefault((f.offset, f.fmt), len(slots))
+        required_end = max((f.offset + f.size for f in self.fields if not f.optional), default=0)
+        if any(f.optional and f.offset < required_end for f in self.fields):
+            raise ValueError("%s: optional fields must follow required ones" % name)
+
+        fmt = "<"
+        required_fmt = None
+        position = 0
+        for offset, item in slots:
+            if offset < position:
+                raise ValueError("%s: field at %d overlaps previous one" % (name, offset))
+            if required_fmt is None and offset >= required_end:
+                required_fmt = fmt
+            fmt += "%dx%s" % (offset - position, item) if offset > position else item
+            position = offset + struct.calcsize("<" + item)
+        if position > size:
+            raise ValueError("%s: fields do not fit %d bytes" % (name, size))
+
+        self._struct = struct.Struct(fmt)
+        self._required = struct.Struct(required_fmt) if required_fmt is not None else self._struct
+        self._slot_count = len(slots)
+        self._decoders: List[Tuple[str, int, int, int]] = [
+            (f.name, slots[(f.offset, f.fmt)], f.shift, f.mask) for f in self.fields
+        ]
+        self._required_decoders = [d for d, f in zip(self._decoders, self.fields) if not f.optional]
+        self._defaults: Dict[str, int] = {f.name: f.default for f in self.fields}
+
+    @property
+    def min_size(self) -> int:
+        """Size of frame that holds all required fields"""
+        return self._required.size
+
+    def decode(self, frame) -> Dict[str, int]:
+        """
+        Extract fields from frame
+        :param frame: bytes-like object, at least min_size bytes
+        :return: dictionary field name -> value. Optional fields are missing if frame is too short for them
+        """
+        if len(frame) >= self._struct.size:
+            layout, decoders = self._struct, self._decoders
+        else:
+            layout, decoders = self._required, self._required_decoders
+        try:
+            items = layout.unpack_from(frame)
+        except struct.error as e:
+            raise ValueError("%s: %s" % (self.name, str(e)))
+        return {
+            name: (items[slot] >> shift) & mask if mask else items[slot]
+            for name, slot, shift, mask in decoders
+        }
+
+    def encode(self, values: Dict[str, int]) -> bytearray:
+        """
+        Build frame
+        :param values: field name -> value. Missing fields get their default values
+        :return: frame of self.size bytes
+        """
+        items = [0] * self._slot_count
+        defaults = self._defaults
+        for name, slot, shift, mask in self._decoders:
+            value = values.get(name, defaults[name])
+            if mask:
+                items[slot] |= (value & mask) << shift
+            else:
+                items[slot] = value
+        frame = bytearray(self.size)
+        try:
+            self._struct.pack_into(frame, 0, *items)
+        except struct.error as e:
+            raise ValueError("%s: %s" % (self.name, str(e)))
+        return frame
+
+
+def _bit(name: str, offset: int, shift: int) -> Field:
+    return Field(name, offset, shift=shift, width=1)
+
+
+S3_STATUS = Schema("S3 status", 20, [
+    Field("fan_speed", 2, shift=0, width=4),
+    Field("mode", 2, shift=4, width=4),
+    Field("target_temp", 3),
+    _bit("heater", 4, 0),
+    _bit("state", 4, 1),
+    _bit("timer", 4, 2),
+    _bit("sound", 4, 3),
+    Field("out_temp", 7, "b"),
+    Field("in_temp", 8, "b"),
+    Field("filter_remain", 9, "H"),
+    Field("hours", 11),
+    Field("minutes", 12),
+    Field("error_code", 13),
+    Field("productivity", 14),
+    Field("fw_version", 17, "H"),
+])
+
+S3_COMMAND = Schema("S3 command", 20, [
+    Field("prefix", 0, default=61),
+    Field("command", 1),
+    Field("fan_speed", 2),
+    Field("heater_temp", 3),
+    Field("mode", 4),
+    _bit("heater", 5, 0),
+    _bit("state", 5, 1),
+    _bit("sound", 5, 3),
+    Field("suffix", 19, default=90),
+])
+
+LITE_STATUS = Schema("Lite status", 57, [
+    _bit("state", 0, 0),
+    _bit("sound", 0, 1),
+    _bit("light", 0, 2),
+    _bit("filter_change_required", 0, 4),
+    _bit("co2_auto_control", 0, 5),
+    _bit("heater", 0, 6),
+    _bit("have_heater", 0, 7),
+    Field("mode", 2),
+    Field("target_temp", 3),
+    Field("fan_speed", 4),
+    Field("in_temp", 5, "b"),
+    Field("out_temp", 6, "b"),
+    Field("electronic_temp", 7),
+    Field("electronic_work_time", 8, "I", width=24),
+    Field("filter_remain", 16, "I"),
+    Field("device_work_time", 20, "I"),
+    Field("error_code", 28),
+    Field("preset_temp_0", 48, optional=True),
+    Field("preset_temp_1", 49, optional=True),
+    Field("preset_temp_2", 50, optional=True),
+    Field("preset_fan_0", 51, optional=True),
+    Field("preset_fan_1", 52, optional=True),
+    Field("preset_fan_2", 53, optional=True),
+    Field("max_fan", 54, optional=True),
+    Field("heater_percent", 55, optional=True),
+])
+
+LITE_SET_PARAMS = Schema("Lite set params", 31, [
+    Field("packet_id", 0),
+    Field("size", 1, default=0x1e),
+    Field("magic", 3, default=0x3a),
+    Field("random", 4),
+    Field("command", 5, "H", default=0x1230),
+    Field("request_id", 7, "I"),
+    Field("command_number", 11, "I"),
+    _bit("state", 15, 0),
+    _bit("sound", 15, 1),
+    _bit("light", 15, 2),
+    _bit("heater", 15, 4),
+    Field("sb", 16),
+    Field("tb", 17),
+    Field("heater_temp", 18),
+    Field("fan_speed", 19),
+    Field("preset_temp_0", 20, default=0x0a),
+    Field("preset_temp_1", 21, default=0x14),
+    Field("preset_temp_2", 22, default=0x19),
+    Field("preset_fan_0", 23, default=0x02),
+    Field("preset_fan_1", 24, default=0x04),
+    Field("preset_fan_2", 25, default=0x06),
+    Field("lb", 26, "H"),
+    Field("crc", 29, "H", default=0xaabb),
+])
@@ -0,0 +1,5 @@
+class TionException(Exception):
+    """Base of all errors raised by tion_btle"""
+    def __init__(self, expression, message):
+        self.expression = expression
+        self.message = message
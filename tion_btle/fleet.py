@@ -0,0 +1,327 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+if __package__ == "":
+    from tion_btle.aio import AsyncTion
+    from tion_btle.coalesce import AsyncSetCoalescer
+    from tion_btle.adapters import AdapterBalancer
+else:
+    from .aio import AsyncTion
+    from .coalesce import AsyncSetCoalescer
+    from .adapters import AdapterBalancer
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_SET = 0
+PRIORITY_GET = 10
+PRIORITY_POLL = 20
+
+
+class _ConnectionSlots:
+    """Bounded number of simultaneous connections on one adapter, handed out by priority"""
+
+    def __init__(self, size: int):
+        self._free = size
+        self._waiters: List = []
+        self._counter = itertools.count()
+        self._releasing = 0
+
+    async def acquire(self, priority: int):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # slot was already handed to us
+                self.release()
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not waiter]
+                heapq.heapify(self._waiters)
+            raise
+
+    @property
+    def full(self) -> bool:
+        """New request has to wait: no free slots and slots being released are promised to waiters"""
+        return self._free <= 0 and self._releasing <= len(self._waiters)
+
+    @property
+    def waiting(self) -> bool:
+        """Somebody waits for slot that is not being released already"""
+        return len(self._waiters) > self._releasing
+
+    def release_when(self, future: Optional[asyncio.Future]) -> None:
+        """Release slot when future is done, at once if it is None"""
+        if future is None:
+            return self.release()
+        self._releasing += 1
+
+        def done(_):
+            self._releasing -= 1
+            self.release()
+        future.add_done_callback(done)
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+
+def _adapter_index(adapter: str) -> Optional[int]:
+    """hci1 -> 1"""
+    if adapter.startswith("hci") and adapter[3:].isdigit():
+        return int(adapter[3:])
+    return None
+
+
+class _FleetMember:
+    def __init__(self, device: AsyncTion, adapter: str):
+        self.device = device
+        self.adapter = adapter
+        self.state: Optional[dict] = None
+        self.updated_at: Optional[float] = None
+        self.last_error: Optional[Exception] = None
+        self.coalescer: Optional[AsyncSetCoalescer] = None
+        self.parked: Optional[asyncio.TimerHandle] = None
+        """Idle timer of connection slot that member keeps with open link between requests"""
+
+
+class TionFleet:
+    """
+    Scheduler for many breezers.
+
+    No more than max_connections devices are talking to breezers on each adapter at the same time. When slot is
+    busy, waiting requests are served by priority: set() goes first, then explicit get() and finally background
+    polls.
+
+    With balancer devices added without explicit adapter are spread over adapters, and device that keeps failing is
+    moved to another adapter.
+
+    After keep_links() device keeps its link and its slot between requests, until the link is idle for idle_timeout
+    seconds or another device of the same adapter needs the slot. So the number of open links per adapter is bounded
+    by max_connections as well.
+    """
+
+    def __init__(self, max_connections: int = 1, balancer: AdapterBalancer = None):
+        self._max_connections = max_connections
+        self._balancer = balancer
+        self._members: Dict[str, _FleetMember] = {}
+        self._slots: Dict[str, _ConnectionSlots] = {}
+        self._idle_timeout: Optional[float] = None
+
+    def _use_adapter(self, member: _FleetMember, adapter: str):
+        member.adapter = adapter
+        if adapter not in self._slots:
+            self._slots[adapter] = _ConnectionSlots(self._max_connections)
+        index = _adapter_index(adapter)
+        if index is not None:
+            member.device.device.adapter = index
+
+    def add(self, device: AsyncTion, adapter: str = None) -> None:
+        """
+        Add device to the fleet
+        :param device: device to manage
+        :param adapter: name of bluetooth adapter device is connected with. Default is adapter chosen by balancer or
+          hci0 if fleet has no balancer
+        :return: None
+        """
+        if adapter is None:
+            adapter = "hci%d" % self._balancer.assign(device.mac) if self._balancer is not None else "hci0"
+        member = self._members[device.mac] = _FleetMember(device, adapter)
+        self._use_adapter(member, adapter)
+        if self._idle_timeout is not None:
+            device.keep_link(self._idle_timeout)
+
+    def keep_links(self, idle_timeout: float) -> None:
+        """
+        Keep link to device between requests while its connection slot is not needed by other devices
+        :param idle_timeout: seconds without requests after which link is dropped
+        :return: None
+        """
+        self._idle_timeout = idle_timeout
+        for member in self._members.values():
+            member.device.keep_link(idle_timeout)
+
+    def remove(self, mac: str) -> None:
+        member = self._members.pop(mac)
+        if member.parked is not None:
+            self._unpark(member)
+        if self._balancer is not None:
+            self._balancer.release(mac)
+
+    def adapter(self, mac: str) -> str:
+        """Name of adapter device is connected with"""
+        return self._members[mac].adapter
+
+    def _record_result(self, member: _FleetMember, error: Optional[Exception]):
+        if self._balancer is None:
+            return
+        if error is None:
+            self._balancer.record_success(member.device.mac)
+            return
+        adapter = self._balancer.record_failure(member.device.mac)
+        if adapter is not None:
+            self._use_adapter(member, "hci%d" % adapter)
+            # new adapter deserves a try at once
+            member.device.device.breaker.reset()
+
+    @property
+    def devices(self) -> List[AsyncTion]:
+        return [m.device for m in self._members.values()]
+
+    def _release(self, member: _FleetMember, slots: _ConnectionSlots) -> None:
+        """Give slot back after exchange, or keep it with open link until idle timeout"""
+        if member.parked is not None:
+            # link is kept by another slot of the member
+            slots.release()
+        elif self._idle_timeout is None or slots.waiting or self._slots.get(member.adapter) is not slots:
+            self._drop_link(member, slots)
+        else:
+            member.parked = asyncio.get_event_loop().call_later(self._idle_timeout, self._unpark, member)
+
+    def _unpark(self, member: _FleetMember) -> None:
+        member.parked.cancel()
+        member.parked = None
+        self._drop_link(member, self._slots[member.adapter])
+
+    def _drop_link(self, member: _FleetMember, slots: _ConnectionSlots) -> None:
+        # next device may connect only when this link is closed
+        slots.release_when(member.device.drop_link())
+
+    async def _acquire(self, member: _FleetMember, priority: int) -> _ConnectionSlots:
+        slots = self._slots[member.adapter]
+        if member.parked is not None:
+            member.parked.cancel()
+            member.parked = None
+            return slots
+        if slots.full:
+            idle = next((m for m in self._members.values() if m.parked is not None and m.adapter == member.adapter),
+                        None)
+            if idle is not None:
+                self._unpark(idle)
+        await slots.acquire(priority)
+        return slots
+
+    async def _exclusive(self, member: _FleetMember, priority: int, action: str, *args):
+        slots = await self._acquire(member, priority)
+        try:
+            result = await getattr(member.device, action)(*args)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record_result(member, e)
+            raise
+        finally:
+            # cancelled or timed out caller leaves exchange on air, slot is busy until worker finishes it
+            busy = member.device.busy
+            if busy is None:
+                self._release(member, slots)
+            else:
+                busy.add_done_callback(lambda _: self._release(member, slots))
+        self._record_result(member, None)
+        return result
+
+    async def get(self, mac: str, priority: int = PRIORITY_GET) -> dict:
+        """
+        Get current state of the device
+        :param mac: device MAC address
+        :param priority: request priority, lower goes first
+        :return: dictionary with device state
+        """
+        member = self._members[mac]
+        try:
+            state = await self._exclusive(member, priority, "get")
+        except Exception as e:
+            member.last_error = e
+            raise
+        member.state = state
+        member.updated_at = time.monotonic()
+        member.last_error = None
+        return state
+
+    async def set(self, mac: str, new_settings: dict, priority: int = PRIORITY_SET,
+                  confirm: bool = False) -> Optional[dict]:
+        """
+        Set new breezer state ahead of any waiting polls
+        :param mac: device MAC address
+        :param new_settings: json with new state
+        :param priority: request priority, lower goes first
+        :param confirm: get state from device after write, it also refreshes state kept by the fleet
+        :return: None, or dictionary with device state after write if confirm is True
+        """
+        member = self._members[mac]
+        coalescer = self._coalescer(member)
+        if coalescer is None:
+            state = await self._exclusive(member, priority, "set", new_settings, None, confirm)
+        else:
+            state = await coalescer.submit(member.device.device._normalize_settings(new_settings), None, confirm)
+            state = state if confirm else None
+        if state is not None:
+            member.state = state
+            member.updated_at = time.monotonic()
+            member.last_error = None
+        return state
+
+    def _coalescer(self, member: _FleetMember) -> Optional[AsyncSetCoalescer]:
+        """Merges set() calls before they take connection slot, if coalescing is enabled on device"""
+        source = member.device.device.coalescer
+        if source is None:
+            member.coalescer = None
+        elif member.coalescer is None or (member.coalescer.window, member.coalescer.max_delay) != \
+                (source.window, source.max_delay):
+            member.coalescer = AsyncSetCoalescer(
+                lambda settings, age, confirm: self._exclusive(member, PRIORITY_SET, "_apply_settings", settings, age,
+                                                               confirm),
+                source.window, source.max_delay
+            )
+        return member.coalescer
+
+    async def poll(self) -> Dict[str, Optional[dict]]:
+        """
+        Refresh state of all devices with background priority
+        :return: dictionary MAC -> state. Failed devices keep their previous state, see last_error()
+        """
+        macs = list(self._members.keys())
+        await asyncio.gather(*[self.get(mac, PRIORITY_POLL) for mac in macs], return_exceptions=True)
+        return {mac: self._members[mac].state for mac in macs if mac in self._members}
+
+    async def run(self, interval: float) -> None:
+        """
+        Poll fleet forever
+        :param interval: seconds between beginnings of fleet refreshes
+        :return: None
+        """
+        while True:
+            started = time.monotonic()
+            await self.poll()
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def state(self, mac: str) -> Optional[dict]:
+        """Last known state of the device or None if it was never read"""
+        return self._members[mac].state
+
+    def last_error(self, mac: str) -> Optional[Exception]:
+        """Exception from the last failed read of the device or None if last read was successful"""
+        return self._members[mac].last_error
+
+    def staleness(self) -> Dict[str, Optional[float]]:
+        """
+        Age of known states
+        :return: dictionary MAC -> seconds since last successful read, None if device was never read
+        """
+        now = time.monotonic()
+        return {
+            mac: None if m.updated_at is None else now - m.updated_at
+            for mac, m in self._members.items()
+        }
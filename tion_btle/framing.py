@@ -0,0 +1,126 @@
+import logging
+from typing import List
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class LiteFramer:
+    """
+    Splits Lite frames to BLE packets and reassembles packets to frames.
+
+    Every packet starts with packet id. Frame that fits one packet is sent as SINGLE packet, longer frames are sent
+    as FIRST packet (packet id is the first byte of the frame itself) followed by MIDDLE packets and END packet,
+    each carrying packet_size - 1 bytes of frame after its id.
+
+    Incoming packets are copied to preallocated buffer, complete frame is exposed as memoryview of this buffer. It is
+    valid until the next FIRST or SINGLE packet is fed.
+    """
+    SINGLE_PACKET_ID = 0x80
+    FIRST_PACKET_ID = 0x00
+    MIDDLE_PACKET_ID = 0x40
+    END_PACKET_ID = 0xc0
+
+    HEADER_SIZE = 15
+    CRC_SIZE = 2
+
+    def __init__(self, packet_size: int = 20, buffer_size: int = 128):
+        self.packet_size = packet_size
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._length: int = 0
+        self._in_sequence: bool = False
+        self._complete: bool = False
+        self.errors: int = 0
+        """Number of packets dropped because of sequence errors"""
+
+    def reset(self) -> None:
+        self._length = 0
+        self._in_sequence = False
+        self._complete = False
+
+    def _append(self, data) -> None:
+        end = self._length + len(data)
+        if end > len(self._buffer):
+            self._buffer = self._buffer + bytearray(max(end, 2 * len(self._buffer)) - len(self._buffer))
+            self._view = memoryview(self._buffer)
+        self._view[self._length:end] = data
+        self._length = end
+
+    def feed(self, packet: bytes) -> bool:
+        """
+        Add received packet
+        :param packet: BLE packet
+        :return: True if frame is complete
+        """
+        packet_id = packet[0]
+        if packet_id == self.FIRST_PACKET_ID or packet_id == self.SINGLE_PACKET_ID:
+            if self._in_sequence:
+                self.errors += 1
+                _LOGGER.warning("Got new frame before end of previous one. Dropping %d bytes", self._length)
+            self._length = 0
+            self._append(packet)
+            self._in_sequence = packet_id == self.FIRST_PACKET_ID
+            self._complete = not self._in_sequence
+        elif packet_id == self.MIDDLE_PACKET_ID or packet_id == self.END_PACKET_ID:
+            if not self._in_sequence:
+                self.errors += 1
+                _LOGGER.critical("Got %s packet but waiting for a first!",
+                                 "middle" if packet_id == self.MIDDLE_PACKET_ID else "end")
+                return False
+            self._append(memoryview(packet)[1:])
+            if packet_id == self.END_PACKET_ID:
+                self._in_sequence = False
+                self._complete = True
+        else:
+            self.errors += 1
+            _LOGGER.error("Unknown package id %s", hex(packet_id))
+            return False
+
+        return self._complete
+
+    @property
+    def frame(self) -> memoryview:
+        """Complete frame"""
+        return self._view[:self._length]
+
+    @property
+    def header(self) -> memoryview:
+        return self._view[:self.HEADER_SIZE]
+
+    @property
+    def payload(self) -> memoryview:
+        return self._view[self.HEADER_SIZE:self._length - self.CRC_SIZE]
+
+    @property
+    def crc(self) -> memoryview:
+        return self._view[self._length - self.CRC_SIZE:self._length]
+
+    def split(self, frame: bytearray) -> List[memoryview]:
+        """
+        Split frame to packets. Packet ids are set here, the first byte of frame is overwritten.
+        :param frame: frame to send
+        :return: packets, that are views of one buffer
+        """
+        if len(frame) <= self.packet_size:
+            frame[0] = self.SINGLE_PACKET_ID
+            return [memoryview(frame)]
+
+        frame[0] = self.FIRST_PACKET_ID
+        chunk = self.packet_size - 1
+        tail = len(frame) - self.packet_size
+        count = (tail + chunk - 1) // chunk
+        out = bytearray(self.packet_size + tail + count)
+        out[:self.packet_size] = memoryview(frame)[:self.packet_size]
+
+        view = memoryview(out)
+        packets = [view[:self.packet_size]]
+        src = self.packet_size
+        dst = self.packet_size
+        for i in range(count):
+            size = min(chunk, len(frame) - src)
+            out[dst] = self.END_PACKET_ID if i == count - 1 else self.MIDDLE_PACKET_ID
+            view[dst + 1:dst + 1 + size] = memoryview(frame)[src:src + size]
+            packets.append(view[dst:dst + 1 + size])
+            src += size
+            dst += size + 1
+        return packets
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+import logging
+import re
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Dict, List, Optional, Tuple
+
+if __package__ == "":
+    from tion_btle.aio import AsyncTion, AsyncS3, AsyncLite
+    from tion_btle.exceptions import TionException
+    from tion_btle.fleet import TionFleet
+    from tion_btle.adapters import AdapterBalancer
+    from tion_btle.scanner import TionScanner, ScanResult
+else:
+    from .aio import AsyncTion, AsyncS3, AsyncLite
+    from .exceptions import TionException
+    from .fleet import TionFleet
+    from .adapters import AdapterBalancer
+    from .scanner import TionScanner, ScanResult
+
+_LOGGER = logging.getLogger(__name__)
+
+_ASYNC_CLASSES = {cls.device_class: cls for cls in (AsyncS3, AsyncLite)}
+
+_DEVICE_PATH = re.compile(r"^/devices/([0-9A-Fa-f:]+)/?$")
+
+
+class UnknownDevice(TionException):
+    """Device is not served by the gateway"""
+    def __init__(self, mac: str):
+        super().__init__("gateway", "Unknown device %s" % mac)
+
+
+class Gateway:
+    """
+    Shares breezers between local clients.
+
+    Gateway keeps link to device between requests, so clients polling the gateway do not reconnect to breezers. Link
+    is kept while it holds connection slot of the fleet: it is dropped after idle_timeout seconds without requests or
+    when another device of the same adapter needs the slot. Reads are answered from state cache while it is younger
+    than max_age seconds, and concurrent reads of the older state share one request to the device. Writes go through
+    the fleet, so they are serialized per device and served before reads.
+
+    Gateway methods are coroutines running in the gateway loop. HTTP clients talk to it via server started by start():
+      GET  /devices        -> {mac: {"model": ..., "state": {...}, "age": seconds, "error": message}}
+      GET  /devices/MAC    -> device state, as tion.get() returns
+      POST /devices/MAC    with json settings as body -> device state after write, as tion.set(confirm=True) returns
+    """
+
+    def __init__(self, fleet: TionFleet, max_age: float = 10.0, timeout: float = 60.0, idle_timeout: float = 10.0):
+        """
+        :param fleet: devices to serve
+        :param max_age: seconds during which cached state is returned without request to device
+        :param timeout: seconds that client waits for device
+        :param idle_timeout: seconds without requests after which link to device is dropped
+        """
+        self._fleet = fleet
+        self.max_age = max_age
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._server: Optional[HTTPServer] = None
+
+    def _member_mac(self, mac: str) -> str:
+        devices = {d.mac.upper(): d.mac for d in self._fleet.devices}
+        try:
+            return devices[mac.upper()]
+        except KeyError:
+            raise UnknownDevice(mac) from None
+
+    async def get(self, mac: str) -> dict:
+        """
+        Get device state from cache or from device if cached one is too old
+        :param mac: device MAC address
+        :return: dictionary with device state
+        :raises: UnknownDevice if device is not in the fleet
+        """
+        mac = self._member_mac(mac)
+        age = self._fleet.staleness().get(mac)
+        if age is not None and age < self.max_age:
+            return self._fleet.state(mac)
+
+        refresh = self._refreshing.get(mac)
+        if refresh is None:
+            refresh = self._refreshing[mac] = asyncio.ensure_future(self._fleet.get(mac))
+            refresh.add_done_callback(lambda _: self._refreshing.pop(mac, None))
+        # client that gave up must not cancel request shared with others
+        return await asyncio.shield(refresh)
+
+    async def set(self, mac: str, new_settings: dict) -> dict:
+        """
+        Set new device state
+        :param mac: device MAC address
+        :param new_settings: json with new state
+        :return: dictionary with device state after write
+        :raises: UnknownDevice if device is not in the fleet
+        """
+        return await self._fleet.set(self._member_mac(mac), new_settings, confirm=True)
+
+    def devices(self) -> Dict[str, dict]:
+        """
+        Cached states of all devices, without requests to devices
+        :return: dictionary MAC -> {"model": model, "state": state or None, "age": seconds or None,
+          "error": last error or None}
+        """
+        staleness = self._fleet.staleness()
+        result = {}
+        for device in self._fleet.devices:
+            error = self._fleet.last_error(device.mac)
+            result[device.mac] = {
+                "model": device.model,
+                "state": self._fleet.state(device.mac),
+                "age": staleness.get(device.mac),
+                "error": None if error is None else str(error),
+            }
+        return result
+
+    def call(self, coroutine):
+        """
+        Run coroutine in gateway loop from other thread
+        :return: coroutine result
+        :raises: coroutine exception or TimeoutError after timeout seconds
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError("Device did not answer in %s seconds" % self.timeout) from None
+
+    def start(self, host: str = "127.0.0.1", port: int = 8080) -> Tuple[str, int]:
+        """
+        Start gateway loop and HTTP server in background threads
+        :param host: address to listen on. Gateway has no authentication, so keep it local
+        :param port: TCP port, 0 to choose free one
+        :return: address server listens on
+        """
+        self._fleet.keep_links(self.idle_timeout)
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="tion-gateway-loop", daemon=True)
+        self._loop_thread.start()
+        self._server = _Server((host, port), _Handler)
+        self._server.gateway = self
+        threading.Thread(target=self._server.serve_forever, name="tion-gateway-http", daemon=True).start()
+        _LOGGER.info("Serving %d devices on %s:%d", len(self._fleet.devices), *self._server.server_address[:2])
+        return self._server.server_address[:2]
+
+    def stop(self) -> None:
+        """Stop HTTP server and gateway loop, drop links to devices"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+        for device in self._fleet.devices:
+            device.close()
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    gateway: Gateway = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "tion-gateway"
+
+    def log_message(self, format, *args):
+        _LOGGER.debug("%s %s", self.address_string(), format % args)
+
+    def _reply(self, code: int, data) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self, action) -> None:
+        gateway = self.server.gateway
+        match = _DEVICE_PATH.match(self.path)
+        if match is None:
+            return self._reply(404, {"error": "Unknown path %s" % self.path})
+        try:
+            self._reply(200, gateway.call(action(gateway, match.group(1))))
+        except UnknownDevice as e:
+            self._reply(404, {"error": e.message})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+        except TimeoutError as e:
+            self._reply(504, {"error": str(e)})
+        except Exception as e:
+            _LOGGER.debug("%s %s failed: %s", self.command, self.path, e)
+            self._reply(502, {"error": str(e)})
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/devices":
+            return self._reply(200, self.server.gateway.devices())
+        self._serve(lambda gateway, mac: gateway.get(mac))
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            settings = json.loads(self.rfile.read(length).decode() or "{}")
+            if not isinstance(settings, dict):
+                raise ValueError("Settings must be json object")
+        except ValueError as e:
+            return self._reply(400, {"error": "Bad settings: %s" % e})
+        self._serve(lambda gateway, mac: gateway.set(mac, settings))
+
+
+def _create_devices(specs: List[str], adapters: List[int]) -> List[Tuple[AsyncTion, Optional[ScanResult]]]:
+    """MODEL:MAC or MAC, model of the latter is detected by scan"""
+    scanner = TionScanner(adapters)
+    devices = []
+    for spec in specs:
+        try:
+            model, mac, found = scanner.resolve(spec)
+        except TionException as e:
+            raise SystemExit(e.message)
+        devices.append((_ASYNC_CLASSES[model](mac, adapter=found.adapter if found is not None else None), found))
+    return devices
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Share Tion breezers with local clients over HTTP")
+    parser.add_argument("devices", nargs="+", metavar="DEVICE",
+                        help="breezer as MODEL:MAC, e.g. lite:XX:XX:XX:XX:XX:XX, or MAC to detect model by scan")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--max-age", type=float, default=10.0,
+                        help="seconds during which cached state is served (default: %(default)s)")
+    parser.add_argument("--idle-timeout", type=float, default=10.0,
+                        help="seconds without requests after which link to breezer is dropped (default: %(default)s)")
+    parser.add_argument("--max-connections", type=int, default=1,
+                        help="simultaneous connections per adapter, kept links included (default: %(default)s)")
+    parser.add_argument("--adapter", type=int, action="append",
+                        help="hci adapter index, may be repeated to spread devices over adapters (default: 0)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    adapters = args.adapter or [0]
+    balancer = AdapterBalancer(adapters) if len(adapters) > 1 else None
+    fleet = TionFleet(args.max_connections, balancer)
+    for device, found in _create_devices(args.devices, adapters):
+        if balancer is not None:
+            if found is not None:
+                balancer.update_rssi(device.mac, found.rssi_by_adapter)
+            fleet.add(device)
+        else:
+            fleet.add(device, "hci%d" % (found.adapter if found is not None else adapters[0]))
+
+    gateway = Gateway(fleet, args.max_age, idle_timeout=args.idle_timeout)
+    gateway.start(args.host, args.port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from typing import Dict, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+GattHandles = namedtuple("GattHandles", ["write", "notify", "cccd"])
+"""Value handles of write and notify characteristics and handle of notify CCCD descriptor"""
+
+
+class HandleCache:
+    """
+    GATT handles of known devices, by MAC address and model.
+
+    Handles are assigned by device firmware and do not change between connections, so service discovery is needed
+    only once per device. With path set cache is stored in this JSON file and survives restarts.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: file to keep cache in, None for in-memory cache
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, GattHandles] = {}
+        if path is not None:
+            self._load()
+
+    @staticmethod
+    def _key(mac: str, model: str) -> str:
+        return "%s/%s" % (mac.upper(), model)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+            self._entries = {key: GattHandles(*value) for key, value in raw.items()}
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            _LOGGER.warning("Ignoring broken handle cache %s: %s", self.path, e)
+
+    def _store(self):
+        if self.path is None:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({key: list(value) for key, value in self._entries.items()}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            _LOGGER.warning("Could not save handle cache to %s: %s", self.path, e)
+
+    def get(self, mac: str, model: str) -> Optional[GattHandles]:
+        return self._entries.get(self._key(mac, model))
+
+    def put(self, mac: str, model: str, handles: GattHandles) -> None:
+        key = self._key(mac, model)
+        with self._lock:
+            if self._entries.get(key) == handles:
+                return
+            self._entries[key] = handles
+            self._store()
+
+    def invalidate(self, mac: str, model: str) -> None:
+        with self._lock:
+            if self._entries.pop(self._key(mac, model), None) is not None:
+                self._store()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._store()
@@ -1,13 +1,25 @@
 import logging
-from random import randrange
+from random import getrandbits
+from typing import Dict, List, Optional
 
 
 if __package__ == "":
     from tion_btle.tion import tion, TionException
+    from tion_btle.transport import Transport
+    from tion_btle.framing import LiteFramer
+    from tion_btle.codec import LITE_STATUS, LITE_SET_PARAMS
+    from tion_btle.state import TionState
+    from tion_btle.metrics import COUNTER_REASSEMBLY_ERRORS, COUNTER_STALE_FRAMES
+    from tion_btle.loopback import LoopbackTransport, LiteEmulator
 else:
     from .tion import tion, TionException
+    from .transport import Transport
+    from .framing import LiteFramer
+    from .codec import LITE_STATUS, LITE_SET_PARAMS
+    from .state import TionState
+    from .metrics import COUNTER_REASSEMBLY_ERRORS, COUNTER_STALE_FRAMES
+    from .loopback import LoopbackTransport, LiteEmulator
 
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -16,8 +28,6 @@ class Lite(tion):
     uuid_write: str = "98f00002-3788-83ea-453e-f52244709ddb"
     uuid_notify: str = "98f00003-3788-83ea-453e-f52244709ddb"
     uuid_notify_descriptor: str = "00002902-0000-1000-8000-00805f9b34fb"
-    write: None
-    notify: None
     MAGIC_NUMBER: int = 0x3a  # 58
     CRC = [0xbb, 0xaa]
 
@@ -28,35 +38,22 @@ class Lite(tion):
     REQUEST_DEVICE_INFO = [0x09, MIDDLE_PACKET_ID]
     REQUEST_PARAMS = [0x32, 0x12]
     SET_PARAMS = [0x30, 0x12]
+    STATUS_RESPONSE = bytes([0x31, 0x12])
 
-    def __init__(self, mac: str):
-        super().__init__(mac)
+    def __init__(self, mac: str, transport: Transport = None, adapter: int = None):
+        super().__init__(mac, transport, adapter)
 
         self._data: bytearray = bytearray()
         self._package_size: bytearray = bytearray()
         self._command_type: bytearray = bytearray()
         self._request_id: bytearray = bytearray()
-        self._sent_request_id: bytearray = bytearray()
+        self._last_request_id: int = getrandbits(32)
+        self._pending: Dict[int, Optional[bytes]] = {}
+        """Correlation table: request id -> response payload, None while response is not received"""
         self._crc: bytearray = bytearray()
         self._header: bytearray = bytearray()
         self._have_full_package = False
-        self._got_new_sequence = False
-
-        if mac == "dummy":
-            _LOGGER.info("Dummy mode!")
-            self._package_id: int = 0
-            self._packages = [
-                bytearray([0x00, 0x49, 0x00, 0x3a, 0x4e, 0x31, 0x12, 0x0d, 0xd7, 0x1f, 0x8f, 0xbf, 0xc9, 0x40, 0x37, 0xcf, 0xd8, 0x02, 0x0f, 0x04]),
-                bytearray([0x40, 0x09, 0x0f, 0x1a, 0x80, 0x8e, 0x05, 0x00, 0xe9, 0x8b, 0x05, 0x00, 0x17, 0xc2, 0xe7, 0x00, 0x26, 0x1b, 0x18, 0x00]),
-                bytearray([0x40, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x03, 0x00, 0x04, 0x02, 0x00, 0x00, 0x00, 0x00]),
-                bytearray([0xc0, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0a, 0x14, 0x19, 0x02, 0x04, 0x06, 0x06, 0x18, 0x00, 0xb5, 0xad])
-            ]
-            self._dummy_data = bytearray([
-                0xcf, 0xd8, 0x02, 0x0f, 0x04, 0x09, 0x0f, 0x1a, 0x80, 0x8e, 0x05, 0x00, 0xe9, 0x8b, 0x05, 0x00, 0x17,
-                0xc2, 0xe7, 0x00, 0x26, 0x1b, 0x18, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
-                0x00, 0x03, 0x00, 0x04, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0a, 0x14, 0x19,
-                0x02, 0x04, 0x06, 0x06, 0x18, 0x00
-            ])
+        self._framer = LiteFramer()
 
         # states
         self.have_breezer_state: bool = False
@@ -68,170 +65,178 @@ class Lite(tion):
         self._electronic_work_time: float = 0
         self._device_work_time: float = 0
         self._error_code: int = 0
-        if self.mac == "dummy":
-            self._get_data_from_breezer = self._get_data_from_breezer_dummy
+        self._preset_temp: list = []
+        self._preset_fan: list = []
+        self._max_fan: int = 0
+        self._heater_percent: int = 0
+
+    def _create_dummy_transport(self) -> Transport:
+        return LoopbackTransport(LiteEmulator())
 
     def _decode_header(self, header: bytearray):
-        _LOGGER.debug("Header is %s", bytes(header).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Header is %s", bytes(header).hex())
         self._package_size = int.from_bytes(header[1:2], byteorder='big', signed=False)
         if header[3] != self.MAGIC_NUMBER:
             _LOGGER.error("Got wrong magic number at position 3")
             raise Exception("wrong magic number")
         self._command_type = reversed(header[5:6])
-        self._request_id = header[7:10]  # must match self._sent_request_id
-        self._command_number = header[11:14]
+        self._request_id = header[7:11]  # must match one of pending requests
+        self._command_number = header[11:15]
 
     def _collect_message(self, package: bytearray) -> bool:
-        self._have_full_package = False
-
-        _LOGGER.debug("Got %s from tion", bytes(package).hex())
-
-        if package[0] == self.FIRST_PACKET_ID or package[0] == self.SINGLE_PACKET_ID:
-            self._data = package
-            self._have_full_package = True if package[0] == self.SINGLE_PACKET_ID else False
-            self._got_new_sequence = True if package[0] == self.FIRST_PACKET_ID else False
-        elif package[0] == self.MIDDLE_PACKET_ID:
-            if not self._got_new_sequence:
-                _LOGGER.critical("Got middle packet but waiting for a first!")
-            else:
-                package = list(package)
-                package.pop(0)
-                self._data += bytearray(package)
-        elif package[0] == self.END_PACKET_ID:
-            if not self._got_new_sequence:
-                _LOGGER.critical("Got end packet but waiting for a first!")
-            else:
-                self._have_full_package = True
-                self._got_new_sequence = False
-                package = list(package)
-                package.pop(0)
-                self._data += bytearray(package)
-        else:
-            _LOGGER.error("Unknown package id %s", hex(package[0]))
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Got %s from tion", bytes(package).hex())
 
+        errors = self._framer.errors
+        self._have_full_package = self._framer.feed(package)
+        if self._framer.errors != errors:
+            self._count(COUNTER_REASSEMBLY_ERRORS)
         if self._have_full_package:
-            self._header = self._data[:15]
-            self._data = self._data[15:-2]
-            self._crc = self._data[-2:]
+            self._header = self._framer.header
+            self._data = self._framer.payload
+            self._crc = self._framer.crc
 
         return self._have_full_package
 
-    def __try_get_state(self) -> bytearray:
-        if self.mac == "dummy":
-            p = self._packages[self._package_id]
-            self._package_id += 1
-            return p
-        return self.notify.read()
+    def _next_request_id(self) -> int:
+        self._last_request_id = (self._last_request_id + 1) & 0xffffffff or 1
+        return self._last_request_id
 
-    def _get_data_from_breezer(self) -> bytearray:
-        def generate_request_id() -> bytearray:
-            self._sent_request_id = bytearray([0x0d, 0xd7, 0x1f, 0x8f])
-            return self._sent_request_id
-
-        # def create_request_device_info_command() -> bytearray:
-        #    generate_request_id()
-        #    return bytearray(
-        #        [self.SINGLE_PACKET_ID, 0x10, 0x00, self.MAGIC_NUMBER, 0x02] +
-        #        self.REQUEST_DEVICE_INFO + list(self._sent_request_id) +
-        #        [0x3c, 0x9f, 0xe9] + self.CRC)
-        def create_request_params_command() -> bytearray:
-            generate_request_id()
-            packet_size = 0x10  # 17 bytes
-            return bytearray(
-                [self.SINGLE_PACKET_ID, packet_size, 0x00, self.MAGIC_NUMBER, 0x02] +
-                self.REQUEST_PARAMS + list(self._sent_request_id) +
-                [0x48, 0xd3, 0xc3, 0x1a] + self.CRC)
+    def _create_request(self, command: List[int]) -> bytearray:
+        """Build request without parameters, like REQUEST_PARAMS, with new request id"""
+        packet_size = 0x10  # 17 bytes
+        return bytearray(
+            [self.SINGLE_PACKET_ID, packet_size, 0x00, self.MAGIC_NUMBER, 0x02] + command +
+            list(self._next_request_id().to_bytes(4, "little")) + [0x48, 0xd3, 0xc3, 0x1a] + self.CRC
+        )
 
+    def _collect_response(self, package: bytearray) -> bool:
+        """
+        Collect responses to requests from correlation table. Frames with unknown request id are dropped
+        :return: True if all requests are answered
+        """
+        if self._collect_message(package):
+            try:
+                self._decode_header(self._header)
+                request_id = int.from_bytes(self._request_id, "little")
+            except Exception as e:
+                _LOGGER.debug("Dropping bad frame: %s", e)
+                request_id = 0
+            if self._pending.get(request_id, b"") is None:
+                self._pending[request_id] = bytes(self._data)
+            else:
+                _LOGGER.debug("Dropping frame with unexpected request id %08x", request_id)
+                self._count(COUNTER_STALE_FRAMES)
+        return None not in self._pending.values()
+
+    def _exchange(self, requests: List[bytearray]) -> List[bytes]:
+        """
+        Send several requests at once and wait for all responses
+        :param requests: complete frames with unique request ids
+        :return: payloads of responses, in order of requests
+        """
+        ids = [int.from_bytes(r[7:11], "little") for r in requests]
+        self._pending = dict.fromkeys(ids)
+        try:
+            self._framer.reset()
+            for request in requests:
+                self._send_request(request)
+            if not self._wait_for_response(self._collect_response):
+                _LOGGER.debug("Waiting too long for data")
+                raise TionException("Lite _exchange", "Could not get response for %d of %d requests" % (
+                    list(self._pending.values()).count(None), len(requests)))
+            return [self._pending[i] for i in ids]
+        finally:
+            self._pending = {}
+
+    def _get_data_from_breezer(self) -> bytearray:
         self.have_breezer_state = False
 
-        self._do_action(self._try_write, request=create_request_params_command())
+        self._drain_notifications()
         _LOGGER.debug("Collecting data")
-
-        i = 0
-        while i < 10:
-            if self.mac == "dummy":
-                while not self._collect_message(self.__try_get_state()):
-                    pass
-                else:
-                    self._package_id = 0
-                    self.have_breezer_state = True
-                    break
-            else:
-                if self._delegation.haveNewData:
-                    byte_response = self._delegation.data
-                    if self._collect_message(byte_response):
-                        self.have_breezer_state = True
-                        break
-                    i = 0
-                else:
-                    self._btle.waitForNotifications(1.0)
-                i += 1
-        else:
-            _LOGGER.debug("Waiting too long for data")
-            self.notify.read()
-
-        if self.have_breezer_state:
-            result = self._data
-        else:
+        try:
+            result = self._exchange([self._create_request(self.REQUEST_PARAMS)])[0]
+        except TionException:
             raise TionException("Lite _get_data_from_breezer", "Could not get breezer state")
 
+        self.have_breezer_state = True
         return result
 
+    def _send_confirmed_request(self, request: bytearray) -> bytearray:
+        """Breezer answers set request with status frame that carries request id of the set"""
+        self.have_breezer_state = False
+        self._drain_notifications()
+        try:
+            result = self._exchange([request])[0]
+        except TionException:
+            raise TionException("Lite _send_confirmed_request", "Could not get breezer state after set")
+
+        self.have_breezer_state = True
+        return result
+
+    def get_device_info(self) -> bytes:
+        """
+        Request device information
+        :return: payload of device info response. Its layout is not documented, so it is not decoded
+        """
+        with self._lock:
+            try:
+                self.connect()
+                self._drain_notifications()
+                return self._checked_exchange(self._exchange, [self._create_request(self.REQUEST_DEVICE_INFO)])[0]
+            finally:
+                self.disconnect()
+
+    def _is_state_response(self) -> bool:
+        return bytes(self._header[5:7]) == self.STATUS_RESPONSE
+
     def _decode_response(self, response: bytearray):
-        _LOGGER.debug("Data is %s", bytes(response).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Data is %s", bytes(response).hex())
         try:
-            self._state = response[0] & 1
-            self._sound = response[0] >> 1 & 1
-            self._light = response[0] >> 2 & 1
-            self._filter_change_required = response[0] >> 4 & 1
-            self._co2_auto_control = response[0] >> 5 & 1
-            self._heater = response[0] >> 6 & 1
-            self._have_heater = response[0] >> 7 & 1
-
-            self._mode = response[2]
-            self._target_temp = response[3]
-            self._fan_speed = response[4]
-            self._in_temp = self.decode_temperature(response[5])
-            self._out_temp = self.decode_temperature(response[6])
-            self._electronic_temp = response[7]
-            self._electronic_work_time = int.from_bytes(response[8:11], byteorder='little', signed=False) / 86400  # days
-            self._filter_remain = int.from_bytes(response[16:20], byteorder='little', signed=False) / 86400    # days
-            self._device_work_time = int.from_bytes(response[20:24], byteorder='little', signed=False) / 86400     # days
-            self._error_code = response[28]
-
-            # self._preset_temp = data[48:50]
-            # self._preset_fan = data[51:53]
-            # self._max_fan = data[54]
-            # self._heater_percent = data[55]
-        except IndexError as e:
+            values = LITE_STATUS.decode(response)
+        except ValueError as e:
             raise TionException(
                 "Lite _decode_response", "Got bad response from Tion '%s': %s while parsing" % (response, str(e))
             )
 
-    def _generate_model_specific_json(self) -> dict:
-        return {
-            "code": 200,
-            "device_work_time": self._device_work_time,
-            "electronic_work_time": self._electronic_work_time,
-            "electronic_temp": self._electronic_temp,
-            "co2_auto_control": str(self._co2_auto_control),
-            "filter_change_required": str(self._filter_change_required),
-            "light": self.light,
-        }
-
-    @property
-    def __random(self) -> bytes:
-        # return random hex number.
-        return randrange(0xFF)
-
-    @property
-    def __random4(self) -> list:
-        # return 4 random hex.
-        return [self.__random, self.__random, self.__random, self.__random]
-
-    @property
-    def __presets(self) -> list:
-        return [0x0a, 0x14, 0x19, 0x02, 0x04, 0x06]
+        self._state = values["state"]
+        self._sound = values["sound"]
+        self._light = values["light"]
+        self._filter_change_required = values["filter_change_required"]
+        self._co2_auto_control = values["co2_auto_control"]
+        self._heater = values["heater"]
+        self._have_heater = values["have_heater"]
+
+        self._mode = values["mode"]
+        self._target_temp = values["target_temp"]
+        self._fan_speed = values["fan_speed"]
+        self._in_temp = values["in_temp"]
+        self._out_temp = values["out_temp"]
+        self._electronic_temp = values["electronic_temp"]
+        self._electronic_work_time = values["electronic_work_time"] / 86400  # days
+        self._filter_remain = values["filter_remain"] / 86400  # days
+        self._device_work_time = values["device_work_time"] / 86400  # days
+        self._error_code = values["error_code"]
+
+        if "heater_percent" in values:
+            # some firmwares send status without presets
+            self._preset_temp = [values["preset_temp_0"], values["preset_temp_1"], values["preset_temp_2"]]
+            self._preset_fan = [values["preset_fan_0"], values["preset_fan_1"], values["preset_fan_2"]]
+            self._max_fan = values["max_fan"]
+            self._heater_percent = values["heater_percent"]
+
+    def _create_state(self, common: dict) -> "LiteState":
+        return LiteState(
+            device_work_time=self._device_work_time,
+            electronic_work_time=self._electronic_work_time,
+            electronic_temp=self._electronic_temp,
+            co2_auto_control=str(self._co2_auto_control),
+            filter_change_required=str(self._filter_change_required),
+            light=self.light,
+            **common
+        )
 
     @property
     def light(self) -> str:
@@ -242,50 +247,41 @@ class Lite(tion):
         self._light = self._encode_state(new_state)
 
     def _send_request(self, request: bytearray):
-        def chunks(lst, n):
-            """Yield successive n-sized chunks from lst."""
-            for j in range(0, len(lst), n):
-                yield lst[j:j + n]
-
-        if len(request) < 20:
-            request[0] = self.SINGLE_PACKET_ID
-            data_for_sent = [request]
-        else:
-            request[0] = self.FIRST_PACKET_ID
-            data_for_sent = list(chunks(request, 20))
-
-            for i in range(1, len(data_for_sent)):
-                if i == len(data_for_sent)-1:
-                    data_for_sent[i].insert(0, self.END_PACKET_ID)
-                else:
-                    data_for_sent[i].insert(0, self.MIDDLE_PACKET_ID)
-
         self.have_breezer_state = False
-
-        for d in data_for_sent:
-            _LOGGER.debug("Doing _try_write with request=%s", bytes(d).hex())
-            self._do_action(self._try_write, request=d)
+        # all packets are views of one buffer and go to transport in one call
+        self._do_action(self._try_write_frame, packets=self._framer.split(request))
 
     def _encode_request(self, request: dict) -> bytearray:
-        def encode_state():
-            result = \
-                self._encode_state(request["state"]) | \
-                (self._encode_state(request["sound"]) << 1) | \
-                (self._encode_state(request["light"]) << 2) | \
-                (self._encode_state(request["heater"]) << 4)
-            return result
-
         sb = 0x00  # ??
         tb = 0x02 if (self.target_temp > 0 or self.fan_speed > 0) else 0x01
-        lb = [0x60, 0x00] if sb == 0 else [0x00, 0x00]
-
-        return bytearray(
-            [0x00, 0x1e, 0x00, self.MAGIC_NUMBER, self.__random] +
-            self.SET_PARAMS + self.__random4 + self.__random4 +
-            [encode_state(), sb, tb, int(request["heater_temp"]), int(request["fan_speed"])] +
-            self.__presets + lb + [0x00] + self.CRC
-        )
+        lb = 0x0060 if sb == 0 else 0x0000
+        # one call to random generator for both random fields
+        bits = getrandbits(40)
+
+        return LITE_SET_PARAMS.encode({
+            "random": (bits & 0xFF) % 0xFF,
+            "request_id": self._next_request_id(),
+            "command_number": bits >> 8,
+            "state": self._encode_state(request["state"]),
+            "sound": self._encode_state(request["sound"]),
+            "light": self._encode_state(request["light"]),
+            "heater": self._encode_state(request["heater"]),
+            "sb": sb,
+            "tb": tb,
+            "heater_temp": int(request["heater_temp"]),
+            "fan_speed": int(request["fan_speed"]),
+            "lb": lb,
+        })
 
     def _pair(self):
         """Lite is not require special pairing procedure"""
         return
+
+
+class LiteState(TionState):
+    __slots__ = ("device_work_time", "electronic_work_time", "electronic_temp", "co2_auto_control",
+                 "filter_change_required", "light")
+    _fields = TionState._fields + __slots__
+    _keys = TionState._keys + ("code",) + __slots__
+    _counters = TionState._counters + ("device_work_time", "electronic_work_time", "filter_remain")
+    code = 200
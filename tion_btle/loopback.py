@@ -0,0 +1,246 @@
+import abc
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+if __package__ == "":
+    from tion_btle.transport import Transport, TransportDisconnected, TransportGattError, \
+        NotificationCallback
+else:
+    from .transport import Transport, TransportDisconnected, TransportGattError, \
+        NotificationCallback
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Emulator(abc.ABC):
+    """Device side of the GATT protocol for LoopbackTransport"""
+    uuid_write: str = ""
+    uuid_notify: str = ""
+    write_handle: int = 0x0d
+    notify_handle: int = 0x0f
+
+    @property
+    def gatt(self) -> Dict[str, int]:
+        return {self.uuid_write: self.write_handle, self.uuid_notify: self.notify_handle}
+
+    @abc.abstractmethod
+    def handle_write(self, handle: int, data: bytes) -> List[bytes]:
+        """ Process data written by client
+
+        Args:
+          handle: characteristic value handle
+          data: written value
+        Returns:
+          list of notifications that device sends in reply
+        """
+        raise NotImplementedError()
+
+    def read(self, handle: int) -> bytes:
+        return b""
+
+
+class S3Emulator(Emulator):
+    uuid_write = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
+    uuid_notify = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
+
+    command_REQUEST_PARAMS = 1
+    command_SET_PARAMS = 2
+
+    def __init__(self, frame: bytes = None):
+        if frame is None:
+            frame = bytes([0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c, 0x0a, 0x00, 0x4b,
+                           0x0a, 0x00, 0x33, 0x00, 0x5a])
+        self.frame = bytearray(frame)
+
+    def handle_write(self, handle: int, data: bytes) -> List[bytes]:
+        if handle != self.write_handle:
+            return []
+        command = data[1]
+        if command == self.command_REQUEST_PARAMS:
+            return [bytes(self.frame)]
+        if command == self.command_SET_PARAMS:
+            # request: [2] fan speed, [3] target temp, [4] mode, [5] heater | state << 1 | sound << 3
+            self.frame[2] = (data[4] << 4) | data[2]
+            self.frame[3] = data[3]
+            self.frame[4] = (self.frame[4] & 0b100) | (data[5] & 0b1011)
+        return []
+
+    def read(self, handle: int) -> bytes:
+        return bytes(self.frame)
+
+
+class LiteEmulator(Emulator):
+    uuid_write = "98f00002-3788-83ea-453e-f52244709ddb"
+    uuid_notify = "98f00003-3788-83ea-453e-f52244709ddb"
+
+    MAGIC_NUMBER = 0x3a
+    SINGLE_PACKET_ID = 0x80
+    FIRST_PACKET_ID = 0x00
+    MIDDLE_PACKET_ID = 0x40
+    END_PACKET_ID = 0xc0
+    REQUEST_PARAMS = bytes([0x32, 0x12])
+    SET_PARAMS = bytes([0x30, 0x12])
+    RESPONSE_PARAMS = bytes([0x31, 0x12])
+    REQUEST_DEVICE_INFO = bytes([0x09, 0x40])
+    DEVICE_INFO = bytes([0x03, 0x00, 0x2c, 0x00, 0x01, 0x00])
+    """Emulated device info payload, real layout is unknown"""
+    PACKET_SIZE = 20
+
+    def __init__(self, payload: bytes = None):
+        if payload is None:
+            payload = bytes([
+                0xcf, 0xd8, 0x02, 0x0f, 0x04, 0x09, 0x0f, 0x1a, 0x80, 0x8e, 0x05, 0x00, 0xe9, 0x8b, 0x05, 0x00, 0x17,
+                0xc2, 0xe7, 0x00, 0x26, 0x1b, 0x18, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+                0x00, 0x03, 0x00, 0x04, 0x02, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x0a, 0x14, 0x19,
+                0x02, 0x04, 0x06, 0x06, 0x18, 0x00
+            ])
+        self.payload = bytearray(payload)
+        self._incoming = bytearray()
+
+    def handle_write(self, handle: int, data: bytes) -> List[bytes]:
+        if handle != self.write_handle:
+            return []
+        packet_id = data[0]
+        if packet_id == self.SINGLE_PACKET_ID or packet_id == self.FIRST_PACKET_ID:
+            self._incoming = bytearray(data)
+        else:
+            self._incoming += data[1:]
+        if packet_id == self.SINGLE_PACKET_ID or packet_id == self.END_PACKET_ID:
+            return self._handle_frame(bytes(self._incoming))
+        return []
+
+    def _handle_frame(self, frame: bytes) -> List[bytes]:
+        command = frame[5:7]
+        request_id = frame[7:11]
+        if command == self.SET_PARAMS:
+            # set flags: state, sound, light at bits 0..2 and heater at bit 4. Status keeps heater at bit 6.
+            flags = frame[15]
+            self.payload[0] = (self.payload[0] & 0b10111000) | (flags & 0b111) | ((flags >> 4 & 1) << 6)
+            self.payload[3] = frame[18]
+            self.payload[4] = frame[19]
+        elif command == self.REQUEST_DEVICE_INFO:
+            return self.packets(self.REQUEST_DEVICE_INFO, request_id, self.DEVICE_INFO)
+        elif command != self.REQUEST_PARAMS:
+            return []
+        return self.status_packets(request_id)
+
+    def status_packets(self, request_id: bytes) -> List[bytes]:
+        """Split status frame to notification packets"""
+        return self.packets(self.RESPONSE_PARAMS, request_id, self.payload)
+
+    def packets(self, command: bytes, request_id: bytes, payload: bytes) -> List[bytes]:
+        """Build frame and split it to notification packets"""
+        header = bytes([0x00, 0x00, 0x00, self.MAGIC_NUMBER, 0x4e]) + command + bytes(request_id) + \
+            bytes([0xbf, 0xc9, 0x40, 0x37])
+        frame = bytearray(header + payload + bytes([0xb5, 0xad]))
+        size = len(frame) - 1
+        frame[1] = size & 0xff
+        frame[2] = size >> 8
+
+        packets = [bytes(frame[:self.PACKET_SIZE])]
+        chunk = self.PACKET_SIZE - 1
+        for i in range(self.PACKET_SIZE, len(frame), chunk):
+            last = i + chunk >= len(frame)
+            packets.append(bytes([self.END_PACKET_ID if last else self.MIDDLE_PACKET_ID]) + frame[i:i + chunk])
+        if len(packets) == 1:
+            packets[0] = bytes([self.SINGLE_PACKET_ID]) + packets[0][1:]
+        return packets
+
+
+class LoopbackTransport(Transport):
+    """
+    In-memory transport that talks to an emulated device.
+
+    Notifications are queued on write and handed to subscriber one per wait_for_notifications() call, like bluez
+    does. Disconnect drops undelivered notifications.
+
+    Transport counts connection attempts and discoveries and keeps the latest written packets, so radio traffic may
+    be checked without real device. Device out of range is emulated with reachable = False.
+    """
+
+    def __init__(self, emulator: Emulator):
+        self.emulator = emulator
+        self.reachable = True
+        self.connects = 0
+        self.discoveries = 0
+        self.written: Deque[bytes] = deque(maxlen=100)
+        self._connected_to: Optional[str] = None
+        self._callback: Optional[NotificationCallback] = None
+        self._subscribed_handle: int = 0
+        self._pending: List[bytes] = []
+
+    @property
+    def connection_status(self) -> str:
+        return "conn" if self._connected_to is not None else "disc"
+
+    def _check_connected(self):
+        if self._connected_to is None:
+            raise TransportDisconnected("Not connected")
+
+    def connect(self, mac: str) -> None:
+        _LOGGER.debug("Loopback connect to %s", mac)
+        self.connects += 1
+        if not self.reachable:
+            raise TransportDisconnected("Failed to connect to peripheral %s" % mac)
+        self._connected_to = mac
+
+    def disconnect(self) -> None:
+        self._connected_to = None
+        self._callback = None
+        self._pending.clear()
+
+    def discover(self, uuids: Iterable[str]) -> Dict[str, int]:
+        self._check_connected()
+        self.discoveries += 1
+        gatt = self.emulator.gatt
+        return {uuid: gatt[uuid] for uuid in uuids if uuid in gatt}
+
+    def _check_handle(self, handle: int):
+        if handle not in self.emulator.gatt.values():
+            raise TransportGattError("Invalid handle %d" % handle)
+
+    def write(self, handle: int, data: bytes, with_response: bool = False) -> None:
+        self._check_connected()
+        self.written.append(bytes(data))
+        if with_response:
+            self._check_handle(handle)
+        elif handle not in self.emulator.gatt.values():
+            # write command gets no answer, device drops it silently
+            _LOGGER.debug("Dropping write to unknown handle %d", handle)
+            return
+        notifications = self.emulator.handle_write(handle, bytes(data))
+        if self._callback is not None:
+            self._pending.extend(notifications)
+
+    def read(self, handle: int) -> bytes:
+        self._check_connected()
+        self._check_handle(handle)
+        return self.emulator.read(handle)
+
+    def subscribe(self, handle: int, callback: NotificationCallback, cccd_handle: int = None) -> None:
+        self._check_connected()
+        self._check_handle(handle)
+        if cccd_handle is not None and cccd_handle != self.find_cccd(handle):
+            raise TransportGattError("Invalid handle %d" % cccd_handle)
+        self._subscribed_handle = handle
+        self._callback = callback
+
+    def push(self, *notifications: bytes) -> None:
+        """Send notifications from device side without request, like device does when its state is changed"""
+        if self._callback is not None:
+            self._pending.extend(notifications)
+
+    def wait_for_notifications(self, timeout: float) -> bool:
+        self._check_connected()
+        if not self._pending:
+            # nobody else may write to emulator, so nothing will come
+            time.sleep(timeout)
+            return False
+        self._callback(self._subscribed_handle, self._pending.pop(0))
+        return True
+
+    def pair(self) -> dict:
+        self._check_connected()
+        return {'code': ['success']}
@@ -0,0 +1,168 @@
+import bisect
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# phases
+PHASE_CONNECT = "connect"
+PHASE_DISCOVERY = "discovery"
+PHASE_NOTIFY_ENABLE = "notify_enable"
+PHASE_WRITE = "write"
+PHASE_WAIT = "wait"
+PHASE_DECODE = "decode"
+PHASE_GET = "get"
+PHASE_SET = "set"
+
+# counters
+COUNTER_CONNECT_RETRIES = "connect_retries"
+COUNTER_FAILED_CONNECTS = "failed_connects"
+COUNTER_ACTION_RETRIES = "action_retries"
+COUNTER_FAILED_ACTIONS = "failed_actions"
+COUNTER_TIMEOUTS = "timeouts"
+COUNTER_REASSEMBLY_ERRORS = "reassembly_errors"
+COUNTER_STALE_FRAMES = "stale_frames"
+
+
+class Instrumentation:
+    """
+    Receiver of tion measurements. Assign instance to device.metrics to enable instrumentation.
+
+    Methods are called from the thread that talks to device and should be fast.
+    """
+
+    def timing(self, mac: str, phase: str, seconds: float) -> None:
+        """ Phase is finished
+
+        Args:
+          mac: device MAC address
+          phase: one of PHASE_* constants
+          seconds: phase duration
+        """
+
+    def count(self, mac: str, counter: str, value: int = 1) -> None:
+        """ Event happened
+
+        Args:
+          mac: device MAC address
+          counter: one of COUNTER_* constants
+          value: increment
+        """
+
+
+class CallbackInstrumentation(Instrumentation):
+    """Pass measurements to user callbacks"""
+
+    def __init__(self, on_timing: Callable[[str, str, float], None] = None,
+                 on_count: Callable[[str, str, int], None] = None):
+        self._on_timing = on_timing
+        self._on_count = on_count
+
+    def timing(self, mac: str, phase: str, seconds: float) -> None:
+        if self._on_timing is not None:
+            self._on_timing(mac, phase, seconds)
+
+    def count(self, mac: str, counter: str, value: int = 1) -> None:
+        if self._on_count is not None:
+            self._on_count(mac, counter, value)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets"""
+    BOUNDS: Tuple[float, ...] = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Upper bound of bucket with p-th percentile
+        :param p: percentile, 0..100
+        :return: seconds, max value for the last bucket, None if histogram is empty
+        """
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                ("le_%g" % b if i < len(self.BOUNDS) else "inf"): n
+                for i, (b, n) in enumerate(zip(self.BOUNDS + (float("inf"),), self.buckets))
+            },
+        }
+
+
+class HistogramRegistry(Instrumentation):
+    """
+    In-process histograms and counters.
+
+    Measurements are aggregated by phase or counter name, and by device too if per_device is set.
+    """
+
+    def __init__(self, per_device: bool = False):
+        self._per_device = per_device
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+
+    def _key(self, mac: str, name: str) -> Tuple[str, str]:
+        return (mac if self._per_device else "", name)
+
+    def timing(self, mac: str, phase: str, seconds: float) -> None:
+        key = self._key(mac, phase)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, mac: str, counter: str, value: int = 1) -> None:
+        key = self._key(mac, counter)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def histogram(self, phase: str, mac: str = "") -> Optional[Histogram]:
+        return self._histograms.get((mac, phase))
+
+    def counter(self, counter: str, mac: str = "") -> int:
+        return self._counters.get((mac, counter), 0)
+
+    def snapshot(self) -> dict:
+        """
+        :return: {"timings": {phase: histogram dict}, "counters": {name: value}}. With per_device keys are
+          "MAC/name"
+        """
+        def name(key):
+            return "%s/%s" % key if key[0] else key[1]
+
+        with self._lock:
+            return {
+                "timings": {name(k): h.as_dict() for k, h in self._histograms.items()},
+                "counters": {name(k): v for k, v in self._counters.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+if __package__ == "":
+    from tion_btle.fleet import TionFleet, PRIORITY_POLL
+else:
+    from .fleet import TionFleet, PRIORITY_POLL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AdaptiveInterval:
+    """
+    Poll interval policy.
+
+    Change of discrete state (on/off, heater, heating, mode, fan speed, target temperature) means that device is in
+    transition, so the next poll is done after min_interval. Temperature drift of temp_threshold or more shortens
+    interval by backoff times, stable state makes it backoff times longer, up to max_interval. After set() device is
+    polled in after_set seconds to see the result.
+    """
+    discrete = ("state", "heater", "heating", "sound", "mode", "heater_temp", "fan_speed")
+    temperatures = ("in_temp", "out_temp")
+
+    def __init__(self, min_interval: float = 10.0, max_interval: float = 600.0, backoff: float = 1.5,
+                 temp_threshold: float = 1.0, after_set: float = 3.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.temp_threshold = temp_threshold
+        self.after_set = after_set
+
+    def changed(self, previous: Optional[dict], current: dict) -> bool:
+        """Check if discrete state is changed"""
+        return previous is None or any(previous.get(k) != current.get(k) for k in self.discrete)
+
+    def next_interval(self, interval: float, previous: Optional[dict], current: dict) -> float:
+        """
+        :param interval: current interval
+        :param previous: state from previous poll, None if it is the first one
+        :param current: just polled state
+        :return: new interval
+        """
+        if self.changed(previous, current):
+            return self.min_interval
+        drift = max(abs((current.get(k) or 0) - (previous.get(k) or 0)) for k in self.temperatures)
+        if drift >= self.temp_threshold:
+            return max(self.min_interval, interval / self.backoff)
+        return min(self.max_interval, interval * self.backoff)
+
+
+class _Schedule:
+    def __init__(self, interval: float, next_at: float):
+        self.interval = interval
+        self.next_at = next_at
+        self.polls: int = 0
+        self.changes: int = 0
+
+
+class AdaptivePoller:
+    """
+    Polls fleet devices each with its own interval chosen by AdaptiveInterval policy.
+
+    Every device is polled by its own task and rescheduled when its poll finishes, so slow or offline device does
+    not delay polls of others. Devices added to fleet after poller start are picked up on the next wake up.
+    """
+
+    def __init__(self, fleet: TionFleet, policy: AdaptiveInterval = None):
+        self._fleet = fleet
+        self.policy = policy if policy is not None else AdaptiveInterval()
+        self._schedules: Dict[str, _Schedule] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._polling: Dict[str, asyncio.Future] = {}
+
+    def _schedule_of(self, mac: str) -> _Schedule:
+        schedule = self._schedules.get(mac)
+        if schedule is None:
+            schedule = self._schedules[mac] = _Schedule(self.policy.min_interval, time.monotonic())
+        return schedule
+
+    def _sync_members(self):
+        macs = {d.mac for d in self._fleet.devices}
+        for mac in macs:
+            self._schedule_of(mac)
+        for mac in list(self._schedules):
+            if mac not in macs:
+                del self._schedules[mac]
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def poll_soon(self, mac: str, delay: float = None) -> None:
+        """
+        Poll device sooner than planned, e.g. after its state was changed not by this poller
+        :param mac: device MAC address
+        :param delay: seconds to the poll, default is policy.after_set
+        """
+        schedule = self._schedule_of(mac)
+        schedule.interval = self.policy.min_interval
+        schedule.next_at = min(schedule.next_at, time.monotonic() + (self.policy.after_set if delay is None else delay))
+        self._wake()
+
+    async def set(self, mac: str, new_settings: dict) -> None:
+        """Set new state via fleet and check result soon"""
+        try:
+            await self._fleet.set(mac, new_settings)
+        finally:
+            self.poll_soon(mac)
+
+    def _start_due(self) -> List[asyncio.Future]:
+        """Start polls of devices whose time has come and that are not being polled already"""
+        self._sync_members()
+        now = time.monotonic()
+        started = []
+        for mac, schedule in self._schedules.items():
+            if schedule.next_at <= now and mac not in self._polling:
+                task = self._polling[mac] = asyncio.ensure_future(self._poll(mac))
+                task.add_done_callback(lambda _, mac=mac: self._poll_finished(mac))
+                started.append(task)
+        return started
+
+    def _poll_finished(self, mac: str):
+        self._polling.pop(mac, None)
+        # device is rescheduled, run() should recalculate its sleep
+        self._wake()
+
+    async def poll_due(self) -> int:
+        """
+        Poll devices whose time has come and wait for these polls
+        :return: number of polled devices
+        """
+        started = self._start_due()
+        if started:
+            await asyncio.wait(started)
+        return len(started)
+
+    async def _poll(self, mac: str):
+        previous = self._fleet.state(mac)
+        try:
+            current = await self._fleet.get(mac, PRIORITY_POLL)
+        except Exception as e:
+            _LOGGER.debug("Poll of %s failed: %s", mac, e)
+            current = None
+        schedule = self._schedules.get(mac)
+        if schedule is None:
+            return
+        schedule.polls += 1
+        if current is not None:
+            if previous is not None and self.policy.changed(previous, current):
+                schedule.changes += 1
+            schedule.interval = self.policy.next_interval(schedule.interval, previous, current)
+        # failed poll keeps interval, devices have own retries and circuit breaker
+        schedule.next_at = time.monotonic() + schedule.interval
+
+    async def run(self) -> None:
+        """Poll forever"""
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                self._wakeup.clear()
+                self._start_due()
+                now = time.monotonic()
+                next_at = min((s.next_at for mac, s in self._schedules.items() if mac not in self._polling),
+                              default=now + self.policy.min_interval)
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_at - now))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wakeup = None
+            for task in list(self._polling.values()):
+                task.cancel()
+
+    def schedule(self) -> Dict[str, dict]:
+        """
+        Current polling plan
+        :return: dictionary MAC -> {"interval": seconds, "next_poll_in": seconds, "polls": count, "changes": count}
+        """
+        self._sync_members()
+        now = time.monotonic()
+        return {
+            mac: {
+                "interval": s.interval,
+                "next_poll_in": max(0.0, s.next_at - now),
+                "polls": s.polls,
+                "changes": s.changes,
+            }
+            for mac, s in self._schedules.items()
+        }
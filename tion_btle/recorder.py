@@ -0,0 +1,180 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+FrameRecord = namedtuple("FrameRecord", ["timestamp", "direction", "mac", "handle", "data"])
+
+
+def _mac_to_bytes(mac: str) -> bytes:
+    try:
+        return bytes.fromhex(mac.replace(":", ""))[:6].ljust(6, b"\x00")
+    except ValueError:
+        return bytes(6)
+
+
+def _mac_from_bytes(raw: bytes) -> str:
+    return ":".join("%02X" % b for b in raw)
+
+
+class FrameRecorder:
+    """
+    Ring buffer of raw packets in memory-mapped file.
+
+    File starts with header (magic, data capacity, head, tail, record count) followed by data area. Every record is
+    timestamp, direction, MAC, handle and packet length followed by packet itself. When data area is full, the oldest
+    records are overwritten. Records never wrap around the end of data area: the rest of area is marked as unused
+    and writing continues from the start.
+    """
+    MAGIC = b"TIONREC1"
+    DIRECTION_RX = 0
+    DIRECTION_TX = 1
+
+    _file_header = struct.Struct("<8sIIIQ")
+    _record_header = struct.Struct("<dB6sHH")
+    _HEADER_SIZE = 32
+    _WRAP = 0xffff
+
+    def __init__(self, path: str, size: int = 1 << 20):
+        """
+        Open recording file. Existing recording is continued if it has the same size.
+        :param path: file name
+        :param size: data area size in bytes
+        """
+        self._lock = threading.Lock()
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            total = self._HEADER_SIZE + size
+            fresh = os.fstat(fd).st_size != total
+            if fresh:
+                os.ftruncate(fd, total)
+            self._mmap = mmap.mmap(fd, total)
+        finally:
+            os.close(fd)
+
+        self._capacity = size
+        magic, capacity, self._head, self._tail, self._count = self._file_header.unpack_from(self._mmap, 0)
+        if fresh or magic != self.MAGIC or capacity != size:
+            self._head = self._tail = self._count = 0
+            self._store_header()
+
+    def _store_header(self):
+        self._file_header.pack_into(self._mmap, 0, self.MAGIC, self._capacity, self._head, self._tail, self._count)
+
+    def _evict(self):
+        """Drop the oldest record"""
+        offset = self._HEADER_SIZE + self._tail
+        if self._capacity - self._tail < self._record_header.size:
+            self._tail = 0
+            return
+        length = self._record_header.unpack_from(self._mmap, offset)[4]
+        if length == self._WRAP:
+            self._tail = 0
+            return
+        self._tail += self._record_header.size + length
+        self._count -= 1
+        if self._count == 0:
+            self._tail = self._head
+
+    def record(self, direction: int, mac: str, handle: int, data, timestamp: float = None) -> None:
+        """
+        Append packet
+        :param direction: DIRECTION_RX for notifications, DIRECTION_TX for writes
+        :param mac: device MAC address
+        :param handle: characteristic handle
+        :param data: packet
+        :param timestamp: packet time, default is now
+        :return: None
+        """
+        size = self._record_header.size + len(data)
+        if size > self._capacity or len(data) >= self._WRAP:
+            _LOGGER.warning("Packet of %d bytes does not fit recorder", len(data))
+            return
+        if timestamp is None:
+            timestamp = time.time()
+
+        with self._lock:
+            if self._head + size > self._capacity:
+                while self._count and self._tail >= self._head:
+                    self._evict()
+                if self._capacity - self._head >= self._record_header.size:
+                    self._record_header.pack_into(self._mmap, self._HEADER_SIZE + self._head, 0, 0, bytes(6), 0,
+                                                  self._WRAP)
+                self._head = 0
+            while self._count and self._head <= self._tail < self._head + size:
+                self._evict()
+
+            offset = self._HEADER_SIZE + self._head
+            self._record_header.pack_into(self._mmap, offset, timestamp, direction, _mac_to_bytes(mac), handle,
+                                          len(data))
+            offset += self._record_header.size
+            self._mmap[offset:offset + len(data)] = bytes(data)
+            if self._count == 0:
+                self._tail = self._head
+            self._head += size
+            self._count += 1
+            self._store_header()
+
+    def close(self) -> None:
+        with self._lock:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_records(path: str) -> Iterator[FrameRecord]:
+    """
+    Read recording made by FrameRecorder
+    :param path: file name
+    :return: records from the oldest to the newest
+    """
+    with open(path, "rb") as f:
+        buffer = f.read()
+
+    magic, capacity, head, tail, count = FrameRecorder._file_header.unpack_from(buffer, 0)
+    if magic != FrameRecorder.MAGIC:
+        raise ValueError("%s is not a frame recording" % path)
+
+    record_header = FrameRecorder._record_header
+    base = FrameRecorder._HEADER_SIZE
+    position = tail
+    while count:
+        if capacity - position < record_header.size:
+            position = 0
+            continue
+        timestamp, direction, mac, handle, length = record_header.unpack_from(buffer, base + position)
+        if length == FrameRecorder._WRAP:
+            position = 0
+            continue
+        start = base + position + record_header.size
+        yield FrameRecord(timestamp, direction, _mac_from_bytes(mac), handle, buffer[start:start + length])
+        position += record_header.size + length
+        count -= 1
+
+
+def replay(records: Iterable[FrameRecord], device, mac: Optional[str] = None) -> Iterator:
+    """
+    Decode recorded notifications as device would do
+    :param records: records from read_records()
+    :param device: S3 or Lite object, used for decoding only
+    :param mac: replay packets of this device only, default is all
+    :return: (timestamp, state snapshot) for every complete response
+    """
+    if mac is not None:
+        mac = mac.upper()
+    for r in records:
+        if r.direction != FrameRecorder.DIRECTION_RX or (mac is not None and r.mac != mac):
+            continue
+        if device._collect_message(bytearray(r.data)):
+            yield r.timestamp, device._state_from_response(device._data, r.timestamp)
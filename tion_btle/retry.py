@@ -0,0 +1,147 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple, Type, TypeVar
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter.
+
+    Delay before n-th retry is base_delay * multiplier ** (n - 1), limited by max_delay, and randomly reduced by up to
+    jitter part of it. Retries stop after max_tries attempts or when the next one would start later than max_elapsed
+    seconds after the first one.
+    """
+
+    def __init__(self, max_tries: int = 3, base_delay: float = 0.5, multiplier: float = 2.0, max_delay: float = 10.0,
+                 jitter: float = 0.5, max_elapsed: float = 30.0):
+        """
+        :param max_tries: attempts including the first one
+        :param base_delay: seconds before the first retry
+        :param multiplier: delay growth factor
+        :param max_delay: maximum delay between attempts
+        :param jitter: part of delay that is randomized, 0..1. 0 gives fixed delays
+        :param max_elapsed: do not start attempts later than this number of seconds after the first one
+        """
+        self.max_tries = max_tries
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+
+    def delays(self) -> Iterator[float]:
+        """Delays before retries, without max_elapsed limit"""
+        delay = self.base_delay
+        for _ in range(self.max_tries - 1):
+            capped = min(delay, self.max_delay)
+            yield capped - random.uniform(0, capped * self.jitter) if self.jitter else capped
+            delay *= self.multiplier
+
+    def run(self, action: Callable[[], T], retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+            on_retry: Callable[[Exception, int, float], None] = None,
+            fatal: Tuple[Type[BaseException], ...] = ()) -> T:
+        """
+        Call action until it succeeds
+        :param action: callable without arguments
+        :param retry_on: exceptions that cause retry, others are raised at once
+        :param on_retry: called with (exception, failed attempt number, delay) before every retry
+        :param fatal: exceptions that are raised at once even if they match retry_on
+        :return: action result
+        :raises: the last exception if all attempts are failed
+        """
+        started = time.monotonic()
+        delays = self.delays()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return action()
+            except retry_on as e:
+                if isinstance(e, fatal):
+                    raise
+                delay = next(delays, None)
+                if delay is None or time.monotonic() + delay - started > self.max_elapsed:
+                    raise
+                if on_retry is not None:
+                    on_retry(e, attempt, delay)
+                if delay > 0:
+                    time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Fast fail for devices that are known to be offline.
+
+    After failure_threshold failures in a row circuit opens and allow() returns False for cooldown seconds. Then one
+    attempt is allowed: success closes circuit, failure opens it again for twice longer time, up to max_cooldown.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, max_cooldown: float = 600.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._failures: int = 0
+        self._current_cooldown: float = cooldown
+        self._opened_at: Optional[float] = None
+        self._probing: bool = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return self.CLOSED
+            if self._probing or time.monotonic() >= self._opened_at + self._current_cooldown:
+                return self.HALF_OPEN
+            return self.OPEN
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next attempt is allowed"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self._current_cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Check if attempt may be done now. In half open state only one caller gets True until result is recorded.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() < self._opened_at + self._current_cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            self._current_cooldown = self.cooldown
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing:
+                self._probing = False
+                self._current_cooldown = min(self._current_cooldown * 2, self.max_cooldown)
+                self._opened_at = time.monotonic()
+                _LOGGER.debug("Circuit is open again for %.1f s", self._current_cooldown)
+            elif self._opened_at is None and self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                _LOGGER.debug("Circuit is open for %.1f s", self._current_cooldown)
+
+    def reset(self) -> None:
+        self.record_success()
@@ -2,12 +2,17 @@ import logging
 
 if __package__ == "":
     from tion_btle.tion import tion, TionException
+    from tion_btle.transport import Transport, TransportDisconnected
+    from tion_btle.loopback import LoopbackTransport, S3Emulator
+    from tion_btle.codec import S3_STATUS, S3_COMMAND
+    from tion_btle.state import TionState
 else:
     from .tion import tion, TionException
+    from .transport import Transport, TransportDisconnected
+    from .loopback import LoopbackTransport, S3Emulator
+    from .codec import S3_STATUS, S3_COMMAND
+    from .state import TionState
 
-from bluepy import btle
-
-logging.basicConfig(level=logging.DEBUG)
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -15,10 +20,6 @@ class S3(tion):
     uuid = "6e400001-b5a3-f393-e0a9-e50e24dcca9e"
     uuid_write = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
     uuid_notify = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
-    write = None
-    notify = None
-
-    _btle = None
 
     command_prefix = 61
     command_suffix = 90
@@ -27,18 +28,18 @@ class S3(tion):
     command_REQUEST_PARAMS = 1
     command_SET_PARAMS = 2
 
-    def __init__(self, mac: str):
-        super().__init__(mac)
+    def __init__(self, mac: str, transport: Transport = None, adapter: int = None):
+        super().__init__(mac, transport, adapter)
 
         # S3-specific properties
-        self._timer: bool = False
-        self._time: str = "unknown"
+        self._timer: int = 0
+        self._hours: int = 0
+        self._minutes: int = 0
         self._productivity: int = 0
-        self._fw_version: str = "unknown"
+        self._fw_version: int = 0
 
-        if self.mac == "dummy":
-            self._dummy_data = bytearray([0xb3, 0x10, 0x24, 0x14, 0x03, 0x00, 0x15, 0x14, 0x14, 0x8f, 0x00, 0x0c,
-                                          0x0a, 0x00, 0x4b, 0x0a, 0x00, 0x33, 0x00, 0x5a])
+    def _create_dummy_transport(self) -> Transport:
+        return LoopbackTransport(S3Emulator())
 
     @property
     def pair_command(self) -> bytearray:
@@ -48,11 +49,6 @@ class S3(tion):
     def get_status_command(self) -> bytearray:
         return self.create_command(self.command_REQUEST_PARAMS)
 
-    def __try_get_state(self) -> bytearray:
-        response = self._btle.getServiceByUUID(self.uuid).getCharacteristics()[0].read()
-        _LOGGER.debug("Response is %s", bytes(response).hex())
-        return response
-
     def _pair(self):
         _LOGGER.debug("Sending pair command")
         self._send_request(self.pair_command)
@@ -63,27 +59,24 @@ class S3(tion):
         return bytearray([self.command_prefix, command, command_special, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
                           self.command_suffix])
 
+    def _collect_message(self, package: bytearray) -> bool:
+        """S3 response always fits single notification"""
+        self._data = package
+        return True
+
     def _get_data_from_breezer(self) -> bytearray:
         have_data_from_breezer: bool = False
+        self._drain_notifications()
         self._do_action(self._try_write, request=self.get_status_command)
 
-        i = 0
         try:
-            while i < 10:
-                if self._delegation.haveNewData:
-                    have_data_from_breezer = True
-                    break
-                else:
-                    self._btle.waitForNotifications(1.0)
-                i += 1
-            else:
+            have_data_from_breezer = self._wait_for_response(self._collect_message)
+            if not have_data_from_breezer:
                 _LOGGER.debug("Waiting too long for data")
-                self.notify.read()
-        except btle.BTLEDisconnectError as e:
+        except TransportDisconnected as e:
             _LOGGER.debug("Got %s while waiting for notification", str(e))
 
         if have_data_from_breezer:
-            self._data = self._delegation.data
             result = self._data
 
         else:
@@ -92,44 +85,63 @@ class S3(tion):
         return result
 
     def _decode_response(self, response: bytearray):
-        _LOGGER.debug("Data is %s", bytes(response).hex())
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Data is %s", bytes(response).hex())
         try:
-            self._fan_speed = int(list("{:02x}".format(response[2]))[1])
-            self._mode = int(list("{:02x}".format(response[2]))[0])
-            self._heater = response[4] & 1
-            self._state = response[4] >> 1 & 1
-            self._target_temp = response[3]
-            self._sound = response[4] >> 3 & 1
-            self._out_temp = self.decode_temperature(response[7])
-            self._in_temp = self.decode_temperature(response[8])
-            self._filter_remain = response[10] * 256 + response[9]
-            self._error_code = response[13]
-
-            self._timer = self._process_status(response[4] >> 2 & 1)
-            self._time = "{}:{}".format(response[11], response[12])
-            self._productivity = response[14]
-            self._fw_version = "{:02x}{:02x}".format(response[18], response[17])
-
-        except IndexError as e:
+            values = S3_STATUS.decode(response)
+        except ValueError as e:
             raise TionException("s3 _decode_response", "Got bad response from Tion '%s': %s while parsing" % (response, str(e)))
 
-    def _generate_model_specific_json(self) -> dict:
-        return {
-            "code": 200,
-            "timer": self._timer,
-            "time": self._time,
-            "productivity": self._productivity,
-            "fw_version": self._fw_version,
-        }
+        self._fan_speed = values["fan_speed"]
+        self._mode = values["mode"]
+        self._heater = values["heater"]
+        self._state = values["state"]
+        self._target_temp = values["target_temp"]
+        self._sound = values["sound"]
+        self._out_temp = values["out_temp"]
+        self._in_temp = values["in_temp"]
+        self._filter_remain = values["filter_remain"]
+        self._error_code = values["error_code"]
+
+        self._timer = values["timer"]
+        self._hours = values["hours"]
+        self._minutes = values["minutes"]
+        self._productivity = values["productivity"]
+        self._fw_version = values["fw_version"]
+
+    def _create_state(self, common: dict) -> "S3State":
+        return S3State(
+            timer=self._process_status(self._timer),
+            hours=self._hours,
+            minutes=self._minutes,
+            productivity=self._productivity,
+            fw_version="{:04x}".format(self._fw_version),
+            **common
+        )
 
     def _encode_request(self, request: dict) -> bytearray:
-        new_settings = self.create_command(self.command_SET_PARAMS)
-        new_settings[2] = int(request["fan_speed"])
-        new_settings[3] = int(request["heater_temp"])
-        new_settings[4] = self._encode_mode(request["mode"])
-        new_settings[5] = self._encode_status(request["heater"]) | (self._encode_status(request["state"]) << 1) | (
-                    self._encode_status(request["sound"]) << 3)
-        return new_settings
+        return S3_COMMAND.encode({
+            "command": self.command_SET_PARAMS,
+            "fan_speed": int(request["fan_speed"]),
+            "heater_temp": int(request["heater_temp"]),
+            "mode": self._encode_mode(request["mode"]),
+            "heater": self._encode_status(request["heater"]),
+            "state": self._encode_status(request["state"]),
+            "sound": self._encode_status(request["sound"]),
+        })
 
     def _send_request(self, request: bytearray):
         self._do_action(self._try_write, request=request)
+
+
+class S3State(TionState):
+    __slots__ = ("timer", "hours", "minutes", "productivity", "fw_version")
+    _fields = TionState._fields + __slots__
+    _keys = TionState._keys + ("code", "timer", "productivity", "fw_version")
+    _counters = TionState._counters + ("hours", "minutes")
+    code = 200
+
+    @property
+    def time(self) -> str:
+        """Breezer time"""
+        return "{}:{}".format(self.hours, self.minutes)
@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+if __package__ == "":
+    from tion_btle.tion import tion, TionException
+    from tion_btle.s3 import S3
+    from tion_btle.lite import Lite
+else:
+    from .tion import tion, TionException
+    from .s3 import S3
+    from .lite import Lite
+
+_LOGGER = logging.getLogger(__name__)
+
+Advertisement = namedtuple("Advertisement", ["mac", "rssi", "uuids", "name"])
+"""Advertising data of one device as received by scan backend"""
+
+ScanResult = namedtuple("ScanResult", ["mac", "model", "rssi", "name", "adapter", "seen_at", "rssi_by_adapter"])
+"""Found breezer. model is device class, adapter is index of adapter that heard it with the best rssi,
+rssi_by_adapter is dictionary adapter -> rssi for all adapters that heard it"""
+
+ScanBackend = Callable[[int, float], Iterable[Advertisement]]
+
+MODELS: Dict[str, Type[tion]] = {S3.uuid: S3, Lite.uuid: Lite}
+"""Advertised service UUID -> device class"""
+
+MODEL_NAMES: Dict[str, Type[tion]] = {"s3": S3, "lite": Lite}
+"""Model names accepted in MODEL:MAC device specification -> device class"""
+
+# advertising data types with service UUIDs and names, Bluetooth Assigned Numbers
+_AD_SERVICES = (0x02, 0x03, 0x06, 0x07)
+_AD_NAMES = (0x09, 0x08)
+
+
+def bluepy_scan(adapter: int, timeout: float) -> List[Advertisement]:
+    """
+    Scan with bluepy. Active scan needs root or CAP_NET_ADMIN.
+    :param adapter: hci adapter index
+    :param timeout: scan duration in seconds
+    :return: advertisements of all found devices
+    """
+    from bluepy import btle
+
+    result = []
+    for entry in btle.Scanner(adapter).scan(timeout):
+        uuids = []
+        for ad_type in _AD_SERVICES:
+            text = entry.getValueText(ad_type)
+            if text:
+                uuids.extend(u.strip().lower() for u in text.split(","))
+        name = next((entry.getValueText(t) for t in _AD_NAMES if entry.getValueText(t)), "")
+        result.append(Advertisement(entry.addr.upper(), entry.rssi, uuids, name))
+    return result
+
+
+class TionScanner:
+    """
+    Finds breezers by advertised service UUID.
+
+    All adapters are scanned at the same time. Results are cached for ttl seconds, so repeated lookups of different
+    MACs do not start new scans. MAC that was not found is not looked for again during ttl seconds as well.
+    """
+
+    def __init__(self, adapters: Sequence[int] = (0,), ttl: float = 300.0, backend: ScanBackend = None):
+        """
+        :param adapters: indexes of hci adapters to scan with
+        :param ttl: seconds during which scan results are used without rescan
+        :param backend: scan function, default is bluepy_scan
+        """
+        self.adapters = tuple(adapters)
+        self.ttl = ttl
+        self._backend = backend if backend is not None else bluepy_scan
+        self._lock = threading.Lock()
+        self._found: Dict[str, ScanResult] = {}
+        self._scanned_at: float = 0.0
+        self._missing: Dict[str, float] = {}
+        """MAC -> time when scan did not find it"""
+
+    def _scan_adapter(self, adapter: int, timeout: float) -> List[ScanResult]:
+        try:
+            advertisements = self._backend(adapter, timeout)
+        except Exception as e:
+            _LOGGER.warning("Scan with hci%d failed: %s", adapter, e)
+            return []
+        now = time.time()
+        result = []
+        for ad in advertisements:
+            model = next((MODELS[uuid] for uuid in ad.uuids if uuid in MODELS), None)
+            if model is not None:
+                result.append(ScanResult(ad.mac.upper(), model, ad.rssi, ad.name, adapter, now, {adapter: ad.rssi}))
+        return result
+
+    def scan(self, timeout: float = 5.0, force: bool = False) -> List[ScanResult]:
+        """
+        Find breezers nearby
+        :param timeout: scan duration in seconds
+        :param force: scan even if cached results are not expired
+        :return: found breezers, sorted by MAC
+        """
+        with self._lock:
+            if force or time.monotonic() - self._scanned_at >= self.ttl:
+                _LOGGER.debug("Scanning with %d adapters for %.1f s", len(self.adapters), timeout)
+                with ThreadPoolExecutor(max_workers=len(self.adapters)) as executor:
+                    scans = list(executor.map(lambda a: self._scan_adapter(a, timeout), self.adapters))
+                found = {}
+                for results in scans:
+                    for r in results:
+                        known = found.get(r.mac)
+                        if known is not None:
+                            r.rssi_by_adapter.update(known.rssi_by_adapter)
+                            known.rssi_by_adapter.update(r.rssi_by_adapter)
+                            if r.rssi <= known.rssi:
+                                continue
+                        found[r.mac] = r
+                self._found = found
+                self._scanned_at = time.monotonic()
+                for mac in found:
+                    self._missing.pop(mac, None)
+            return sorted(self._found.values(), key=lambda r: r.mac)
+
+    def find(self, mac: str, timeout: float = 5.0) -> Optional[ScanResult]:
+        """
+        Find breezer with known MAC. Cached result is used if there is one, device missing in cache causes rescan
+        unless it was not found by scan during last ttl seconds.
+        :return: scan result, None if device is not found
+        """
+        mac = mac.upper()
+        with self._lock:
+            now = time.monotonic()
+            if now - self._scanned_at < self.ttl:
+                result = self._found.get(mac)
+                if result is not None:
+                    return result
+            missed_at = self._missing.get(mac)
+            if missed_at is not None and now - missed_at < self.ttl:
+                return None
+        self.scan(timeout, force=True)
+        with self._lock:
+            result = self._found.get(mac)
+            if result is None:
+                self._missing[mac] = time.monotonic()
+        return result
+
+    def create(self, mac: str, timeout: float = 5.0, **kwargs) -> tion:
+        """
+        Create object of right class for breezer
+        :param mac: breezer MAC address
+        :param timeout: scan duration, if scan is needed
+        :param kwargs: passed to device class constructor. Default adapter is one that hears breezer best
+        :return: S3 or Lite object
+        """
+        result = self.find(mac, timeout)
+        if result is None:
+            raise TionException("scan", "Breezer %s is not found" % mac)
+        kwargs.setdefault("adapter", result.adapter)
+        return result.model(mac, **kwargs)
+
+    def resolve(self, spec: str, timeout: float = 5.0) -> Tuple[Type[tion], str, Optional[ScanResult]]:
+        """
+        Parse breezer given by user as MODEL:MAC, e.g. lite:XX:XX:XX:XX:XX:XX, or as MAC with model detected by scan
+        :param spec: MODEL:MAC or MAC
+        :param timeout: scan duration, if scan is needed
+        :return: device class, MAC and scan result or None if model was given
+        :raises: TionException if breezer given as MAC is not found
+        """
+        model, _, mac = spec.partition(":")
+        if model.lower() in MODEL_NAMES:
+            return MODEL_NAMES[model.lower()], mac, None
+        result = self.find(spec, timeout)
+        if result is None:
+            raise TionException("scan", "Breezer %s is not found" % spec)
+        return result.model, spec, result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._found = {}
+            self._scanned_at = 0.0
+            self._missing = {}
@@ -0,0 +1,71 @@
+import json
+from time import localtime, strftime
+from typing import Iterable, Optional, Tuple
+
+
+class TionState:
+    """
+    Immutable snapshot of breezer state.
+
+    Attributes have the same names and values as keys of tion.get() result. Dictionary is built only by as_dict().
+    """
+    __slots__ = ("state", "heater", "heating", "sound", "mode", "out_temp", "in_temp", "heater_temp", "fan_speed",
+                 "filter_remain", "request_error_code", "model", "taken_at")
+
+    _fields: Tuple[str, ...] = __slots__
+    """All snapshot attributes"""
+    _keys: Tuple[str, ...] = ("state", "heater", "heating", "sound", "mode", "out_temp", "in_temp", "heater_temp",
+                              "fan_speed", "filter_remain", "time", "request_error_code", "model")
+    """Keys of as_dict() result, in order"""
+    _counters: Tuple[str, ...] = ("taken_at",)
+    """Attributes that change on every read and are ignored by diff() by default"""
+
+    def __init__(self, **values):
+        for name in self._fields:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    @property
+    def time(self) -> str:
+        """Time when state was taken"""
+        return strftime("%H:%M", localtime(self.taken_at))
+
+    def as_dict(self) -> dict:
+        """State in format of tion.get()"""
+        return {key: getattr(self, key) for key in self._keys}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict())
+
+    def diff(self, previous: Optional["TionState"], ignore: Iterable[str] = None) -> dict:
+        """
+        Find changed attributes
+        :param previous: older snapshot of the same device. None means that everything is changed
+        :param ignore: attributes to skip. Default is attributes that change on every read, like work time counters
+        :return: dictionary attribute -> new value for changed attributes
+        """
+        if ignore is None:
+            ignore = self._counters
+        if previous is None:
+            return {name: getattr(self, name) for name in self._fields if name not in ignore}
+        return {
+            name: getattr(self, name)
+            for name in self._fields
+            if name not in ignore and getattr(self, name) != getattr(previous, name, None)
+        }
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return not self.diff(other, ignore=("taken_at",))
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self._fields if name != "taken_at"))
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % (n, getattr(self, n)) for n in self._fields))
@@ -1,28 +1,43 @@
 import abc
 import logging
+import threading
 import time
-from typing import Callable, List
-from time import localtime, strftime
-
-from bluepy import btle
-from bluepy.btle import DefaultDelegate
+from typing import Callable, List, Optional, Sequence, Union
+
+if __package__ == "":
+    from tion_btle.exceptions import TionException
+    from tion_btle.transport import Transport, TransportDisconnected, TransportGattError, BluepyTransport
+    from tion_btle.handles import HandleCache, GattHandles
+    from tion_btle.retry import RetryPolicy, CircuitBreaker
+    from tion_btle.coalesce import SetCoalescer
+    from tion_btle.state import TionState
+    from tion_btle.recorder import FrameRecorder
+    from tion_btle.metrics import Instrumentation, PHASE_CONNECT, PHASE_DISCOVERY, PHASE_NOTIFY_ENABLE, PHASE_WRITE, \
+        PHASE_WAIT, PHASE_DECODE, PHASE_GET, PHASE_SET, COUNTER_CONNECT_RETRIES, COUNTER_FAILED_CONNECTS, \
+        COUNTER_ACTION_RETRIES, COUNTER_FAILED_ACTIONS, COUNTER_TIMEOUTS
+else:
+    from .exceptions import TionException
+    from .transport import Transport, TransportDisconnected, TransportGattError, BluepyTransport
+    from .handles import HandleCache, GattHandles
+    from .retry import RetryPolicy, CircuitBreaker
+    from .coalesce import SetCoalescer
+    from .state import TionState
+    from .recorder import FrameRecorder
+    from .metrics import Instrumentation, PHASE_CONNECT, PHASE_DISCOVERY, PHASE_NOTIFY_ENABLE, PHASE_WRITE, \
+        PHASE_WAIT, PHASE_DECODE, PHASE_GET, PHASE_SET, COUNTER_CONNECT_RETRIES, COUNTER_FAILED_CONNECTS, \
+        COUNTER_ACTION_RETRIES, COUNTER_FAILED_ACTIONS, COUNTER_TIMEOUTS
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class TionDelegation(DefaultDelegate):
+class TionDelegation:
     def __init__(self):
         self._data: List = []
-        self.__topic = None
-        DefaultDelegate.__init__(self)
 
     def handleNotification(self, handle: int, data: bytes):
         self._data.append(data)
-        _LOGGER.debug("Got data in %d response %s", handle, bytes(data).hex())
-        self.__topic.read()
-
-    def setReadTopic(self, topic):
-        self.__topic = topic
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Got data in %d response %s", handle, bytes(data).hex())
 
     @property
     def data(self) -> bytes:
@@ -32,54 +47,52 @@ class TionDelegation(DefaultDelegate):
     def haveNewData(self) -> bool:
         return len(self._data) > 0
 
-
-class TionException(Exception):
-    def __init__(self, expression, message):
-        self.expression = expression
-        self.message = message
+    def clear(self):
+        self._data.clear()
 
 
-class TionDummy:
-    """
-    Class for dummy methods, that should be used for tests
-    """
+class DeviceOffline(TionException):
+    """Device failed to connect several times in a row and is not tried until retry_in seconds pass"""
+    def __init__(self, mac: str, retry_in: float):
+        super().__init__("connect", "%s is offline, next attempt in %.0f s" % (mac, retry_in))
+        self.retry_in = retry_in
 
-    _dummy_data: bytearray
 
-    @staticmethod
-    def _connect_dummy(need_notifications: bool = True):
-        """dummy connection"""
-
-        _LOGGER.info("Dummy connect")
-        return
-
-    @staticmethod
-    def _disconnect_dummy():
-        return
-
-    def _get_data_from_breezer_dummy(self) -> bytearray:
-        return self._dummy_data
-
-    @staticmethod
-    def _try_write_dummy(request: bytearray):
-        _LOGGER.debug("Dummy write %s", bytes(request).hex())
-        return
-
-    @staticmethod
-    def _enable_notifications_dummy():
-        return
-
-
-class tion(TionDummy):
+class tion:
     statuses = ['off', 'on']
     modes = ['recirculation', 'mixed']  # 'recirculation', 'mixed' and 'outside', as Index exception
     uuid_notify: str = ""
     uuid_write: str = ""
-
-    def __init__(self, mac: str):
+    max_state_age: float = 10
+    """Seconds during which known state is used by set() instead of reading it from device"""
+    response_timeout: float = 10
+    """Seconds to wait for complete response from device"""
+    connect_retry: RetryPolicy = RetryPolicy(max_tries=2, base_delay=2.0, jitter=0.5, max_elapsed=20.0)
+    """Retries of connection attempts"""
+    action_retry: RetryPolicy = RetryPolicy(max_tries=3, base_delay=0.1, max_delay=1.0, jitter=0.5, max_elapsed=5.0)
+    """Retries of writes to connected device. Lost link is not retried, see connect_retry"""
+    handle_cache: Optional[HandleCache] = HandleCache()
+    """GATT handles of known devices, shared by all instances. Assign HandleCache(path) to keep it on disk or None to
+    discover handles on every connect"""
+
+    def __init__(self, mac: str, transport: Transport = None, adapter: int = None):
         self._mac = mac
-        self._btle: btle.Peripheral = btle.Peripheral(None)
+        if transport is None:
+            if mac == "dummy":
+                _LOGGER.warning("Dummy mode detected!")
+                transport = self._create_dummy_transport()
+            else:
+                transport = BluepyTransport()
+        self._transport: Transport = transport
+        if adapter is not None:
+            self.adapter = adapter
         self._delegation = TionDelegation()
+        self._notify_handle: int = 0
+        self._write_handle: int = 0
+        self._cccd_handle: int = 0
+        self._handles_cached: bool = False
+        """Handles are taken from handle_cache and not checked on current link yet"""
+        self._response_timed_out: bool = False
         self._fan_speed = 0
         self._model: str = self.__class__.__name__
         self._data: bytearray = bytearray()
@@ -96,17 +109,27 @@ class tion(TionDummy):
         self._heating: bool = False
         self._filter_remain: float = 0.0
         self._error_code: int = 0
-        self.__failed_connects: int = 0
+        self.breaker = CircuitBreaker()
+        """Fast fail of connects to device that is offline"""
+        self._coalescer: Optional[SetCoalescer] = None
+        self._subscribers: List[Callable[[TionState, dict], None]] = []
+        self._published: Optional[TionState] = None
         self.__connections_count: int = 0
+        self._known_state: Union[TionState, dict, None] = None
+        self._known_state_at: float = 0.0
+        self._lock = threading.RLock()
+        self.recorder: Optional[FrameRecorder] = None
+        """Recorder for raw packets, None to disable recording"""
+        self.metrics: Optional[Instrumentation] = None
+        """Receiver of per-phase timings and counters, None to disable instrumentation"""
 
-        if self.mac == "dummy":
-            _LOGGER.warning("Dummy mode detected!")
-            self._dummy_data: bytearray = bytearray()
-            self._connect = self._connect_dummy
-            self._disconnect = self._disconnect_dummy
-            self._try_write = self._try_write_dummy
-            self._enable_notifications = self._enable_notifications_dummy
-            self._get_data_from_breezer = self._get_data_from_breezer_dummy
+    @abc.abstractmethod
+    def _create_dummy_transport(self) -> Transport:
+        """ Create transport used in dummy mode
+        Returns:
+          transport connected to emulated device of this model
+        """
+        raise NotImplementedError()
 
     @abc.abstractmethod
     def _send_request(self, request: bytearray):
@@ -150,16 +173,18 @@ class tion(TionDummy):
         raise NotImplementedError()
 
     @abc.abstractmethod
-    def _generate_model_specific_json(self) -> dict:
+    def _create_state(self, common: dict) -> TionState:
         """
-        Generates dict with model-specific parameters based on class variables
-        :return: dict of model specific properties
+        Create model-specific state snapshot based on class variables
+        :param common: values of common TionState attributes
+        :return: state snapshot
         """
         raise NotImplementedError()
 
-    def __generate_common_json(self) -> dict:
+    def __common_state_values(self, taken_at: Optional[float] = None) -> dict:
         """
-        Generates dict with common parameters based on class properties
+        Collects common state attributes from class properties
+        :param taken_at: snapshot time, default is now
         :return: dict of common properties
         """
         return {
@@ -173,9 +198,9 @@ class tion(TionDummy):
             "heater_temp": self.target_temp,
             "fan_speed": self.fan_speed,
             "filter_remain": self.filter_remain,
-            "time": strftime("%H:%M", localtime()),
             "request_error_code": self._error_code,
             "model": self.model,
+            "taken_at": time.time() if taken_at is None else taken_at,
         }
 
     def __detect_heating_state(self,
@@ -215,29 +240,140 @@ class tion(TionDummy):
         :return:
           dictionary with device state
         """
-        try:
-            self.connect()
-            response = self._get_data_from_breezer()
-        finally:
-            if not keep_connection:
-                self.disconnect()
-            else:
-                _LOGGER.warning("You are using keep_connection parameter of get method. It will be removed in v2.0.0")
-                self.__connections_count -= 1
+        return self.get_state(keep_connection).as_dict()
+
+    def get_state(self, keep_connection: bool = False) -> TionState:
+        """
+        Get current device state as immutable snapshot
+        :param keep_connection: should we keep connection to device or disconnect after getting data
+        :return:
+          snapshot with device state. Use diff() to find what is changed since previous one
+        """
+        return self._timed(PHASE_GET, self._read_state, keep_connection)
 
+    def _read_state(self, keep_connection: bool) -> TionState:
+        with self._lock:
+            try:
+                self.connect()
+                response = self._checked_exchange(self._get_data_from_breezer)
+            finally:
+                if not keep_connection:
+                    self.disconnect()
+                else:
+                    _LOGGER.warning("You are using keep_connection parameter of get method. It will be removed in "
+                                    "v2.0.0. Use session() instead.")
+                    self.__connections_count -= 1
+
+            result = self._timed(PHASE_DECODE, self._state_from_response, response)
+            self._remember_state(result)
+            return result
+
+    def _state_from_response(self, response: bytearray, taken_at: Optional[float] = None) -> TionState:
+        """
+        Decode complete response and build state snapshot
+        :param response: data collected by _get_data_from_breezer
+        :param taken_at: time the response was received, default is now
+        :return: state snapshot
+        """
         self._decode_response(response)
         self.__detect_heating_state()
-        common = self.__generate_common_json()
-        model_specific_data = self._generate_model_specific_json()
+        return self._create_state(self.__common_state_values(taken_at))
+
+    def _remember_state(self, state: Union[TionState, dict]) -> None:
+        self._known_state = state
+        self._known_state_at = time.monotonic()
+        if isinstance(state, TionState):
+            self._publish(state)
+
+    def subscribe(self, callback: Callable[[TionState, dict], None]) -> Callable[[], None]:
+        """
+        Get state changes without polling.
+
+        callback(state, changes) is called with every new state that differs from previous one, where changes is
+        state.diff(previous). States come from get() and from notifications that device sends on its own, see
+        TionSession.listen(). Callback is called from the thread that talks to device and should be fast.
+        :param callback: function to call
+        :return: function that cancels subscription
+        """
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _publish(self, state: TionState) -> None:
+        if not self._subscribers:
+            return
+        changes = state.diff(self._published)
+        self._published = state
+        if not changes:
+            return
+        for callback in list(self._subscribers):
+            try:
+                callback(state, changes)
+            except Exception:
+                _LOGGER.exception("State subscriber of %s failed", self.mac)
 
-        return {**common, **model_specific_data}
+    def _is_state_response(self) -> bool:
+        """Check if collected frame carries device state"""
+        return True
 
-    def set(self, new_settings=None) -> None:
+    def _receive_notifications(self) -> int:
+        """
+        Decode notifications that came on open link without request
+        :return: number of decoded states
+        """
+        with self._lock:
+            if self.connection_status == "disc":
+                raise TransportDisconnected("%s is not connected" % self.mac)
+            while self._transport.wait_for_notifications(0):
+                pass
+            received = 0
+            while self._delegation.haveNewData:
+                if not self._collect_message(self._delegation.data) or not self._is_state_response():
+                    continue
+                try:
+                    state = self._state_from_response(self._data)
+                except TionException as e:
+                    _LOGGER.debug("Dropping unsolicited frame: %s", e.message)
+                    continue
+                self._remember_state(state)
+                received += 1
+            return received
+
+    def _get_current_state(self, max_age: float) -> dict:
+        """
+        Get state to merge new settings with
+        :param max_age: known state that is older than max_age seconds will be re-read from device
+        :return: dictionary with device state
+        """
+        if self._known_state is not None and time.monotonic() - self._known_state_at < max_age:
+            _LOGGER.debug("Using known state")
+            if isinstance(self._known_state, TionState):
+                return self._known_state.as_dict()
+            return self._known_state
+        return self.get()
+
+    def set(self, new_settings=None, max_state_age: float = None, confirm: bool = False) -> Optional[dict]:
         """
         Set new breezer state
         :param new_settings: json with new state
-        :return: None
+        :param max_state_age: do not read device state before write, if state known from previous get() or set() is
+          younger than max_state_age seconds. Default is self.max_state_age. Use 0 to always read.
+        :param confirm: get state from device in the same connection after write
+        :return: None, or dictionary with device state after write if confirm is True
         """
+        new_settings = self._normalize_settings(new_settings)
+        coalescer = self._coalescer
+        if coalescer is not None:
+            result = coalescer.submit(new_settings, max_state_age, confirm)
+            return result if confirm else None
+        return self._apply_settings(new_settings, max_state_age, confirm)
+
+    @staticmethod
+    def _normalize_settings(new_settings: Optional[dict]) -> dict:
+        """Settings in form expected by _apply_settings: fan speed 0 means turning off"""
         if new_settings is None:
             new_settings = {}
 
@@ -247,18 +383,73 @@ class tion(TionDummy):
                 new_settings["state"] = "off"
         except KeyError:
             pass
+        return new_settings
 
-        try:
-            self.connect()
-            current_settings = self.get()
+    @property
+    def coalescer(self) -> Optional[SetCoalescer]:
+        """Coalescer configured by coalesce(), None if coalescing is disabled"""
+        return self._coalescer
 
-            merged_settings = {**current_settings, **new_settings}
+    def coalesce(self, window: float, max_delay: float = None) -> None:
+        """
+        Merge settings passed to set() from different threads within short time to one write.
 
-            encoded_request = self._encode_request(merged_settings)
-            _LOGGER.debug("Will write %s", encoded_request)
-            self._send_request(encoded_request)
-        finally:
-            self.disconnect()
+        set() waits until no other set() is called for window seconds, but not longer than max_delay, and all merged
+        calls return when merged settings are written. AsyncTion and TionFleet merge concurrent coroutines with the
+        same window before their worker thread.
+        :param window: seconds, 0 disables coalescing
+        :param max_delay: maximum delay of write, default is 4 windows
+        :return: None
+        """
+        self._coalescer = SetCoalescer(self._apply_settings, window, max_delay) if window > 0 else None
+
+    def _apply_settings(self, new_settings: dict, max_state_age: Optional[float], confirm: bool = False) \
+            -> Optional[dict]:
+        if max_state_age is None:
+            max_state_age = self.max_state_age
+        return self._timed(PHASE_SET, self._write_settings, new_settings, max_state_age, confirm)
+
+    def _write_settings(self, new_settings: dict, max_state_age: float, confirm: bool) -> Optional[dict]:
+        with self._lock:
+            try:
+                self.connect()
+                current_settings = self._get_current_state(max_state_age)
+
+                merged_settings = {**current_settings, **new_settings}
+
+                encoded_request = self._encode_request(merged_settings)
+                _LOGGER.debug("Will write %s", encoded_request)
+                if not confirm and not self._handles_cached:
+                    self._send_request(encoded_request)
+                    # state is known only when write is done
+                    self._remember_state(merged_settings)
+                    return None
+                # write command to stale cached handle is dropped silently, so it is checked by reading state after
+                # it, and repeated over rediscovered handles if device does not answer
+                response = self._checked_exchange(self._send_confirmed_request, encoded_request)
+            finally:
+                self.disconnect()
+
+            result = self._timed(PHASE_DECODE, self._state_from_response, response)
+            self._remember_state(result)
+            return result.as_dict() if confirm else None
+
+    def _send_confirmed_request(self, request: bytearray) -> bytearray:
+        """
+        Send set request and get device state after it on the same link
+        :param request: encoded set request
+        :return: breezer response, same as from _get_data_from_breezer
+        """
+        self._send_request(request)
+        return self._get_data_from_breezer()
+
+    def session(self, idle_timeout: float = 30.0) -> "TionSession":
+        """
+        Create session that keeps link to the device between requests
+        :param idle_timeout: drop link after idle_timeout seconds without requests. It will be restored on next request
+        :return: session, that should be used as context manager
+        """
+        return TionSession(self, idle_timeout)
 
     @property
     def mac(self):
@@ -282,101 +473,237 @@ class tion(TionDummy):
             status = 'unknown'
         return status
 
+    @property
+    def transport(self) -> Transport:
+        return self._transport
+
     @property
     def connection_status(self):
-        connection_status = "disc"
-        try:
-            connection_status = self._btle.getState()
-        except btle.BTLEInternalError as e:
-            if str(e) == "Helper not started (did you call connect()?)":
-                pass
-            else:
-                raise e
-        except btle.BTLEDisconnectError as e:
-            pass
-        except BrokenPipeError as e:
-            self._btle = btle.Peripheral(None)
+        return self._transport.connection_status
+
+    @property
+    def adapter(self) -> Optional[int]:
+        """Index of bluetooth adapter used to connect to device, None for system default"""
+        return self._transport.adapter
 
-        return connection_status
+    @adapter.setter
+    def adapter(self, adapter: Optional[int]):
+        """Switch adapter. Current link is kept, new adapter is used by the next connect"""
+        self._transport.adapter = adapter
 
-    def _connect(self, need_notifications: bool = True):
+    def _connect(self, need_notifications: bool = True, use_cache: bool = True):
+        """
+        Connect to device
+        :param need_notifications: subscribe to notifications
+        :param use_cache: take handles from handle_cache. Disable it for link that sends only writes without answer:
+          nothing would show that cached handles are stale
+        """
         _LOGGER.debug("Connecting")
-        if self.connection_status == "disc":
+        if self.connection_status != "disc":
+            return
+        if not self.breaker.allow():
+            raise DeviceOffline(self.mac, self.breaker.retry_in)
+
+        def on_retry(e: Exception, attempt: int, delay: float):
+            self._count(COUNTER_CONNECT_RETRIES)
+            _LOGGER.warning("Got TransportDisconnected: %s. Will try again in %.1f s", e, delay)
+
+        try:
+            self.connect_retry.run(lambda: self.__establish(need_notifications, use_cache), (TransportDisconnected,),
+                                   on_retry)
+        except TransportDisconnected as e:
+            _LOGGER.warning("Could not connect to %s: %s", self.mac, e)
+            self._count(COUNTER_FAILED_CONNECTS)
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+
+    def __establish(self, need_notifications: bool, use_cache: bool):
+        self._timed(PHASE_CONNECT, self._transport.connect, self.mac)
+        cached = self.handle_cache.get(self.mac, self.model) if self.handle_cache is not None and use_cache else None
+        if cached is not None:
+            _LOGGER.debug("Using cached handles %s", cached)
+            self._write_handle, self._notify_handle, self._cccd_handle = cached
+            self._handles_cached = True
+        else:
+            self._timed(PHASE_DISCOVERY, self._discover_handles)
+        if need_notifications:
             try:
-                self._btle.connect(self.mac, btle.ADDR_TYPE_RANDOM)
-                for tc in self._btle.getCharacteristics():
-                    if tc.uuid == self.uuid_notify:
-                        self.notify = tc
-                    if tc.uuid == self.uuid_write:
-                        self.write = tc
-                if need_notifications:
-                    self._enable_notifications()
-                else:
-                    _LOGGER.debug("Notifications was not requested")
-                self.__failed_connects = 0
-            except btle.BTLEDisconnectError as e:
-                _LOGGER.warning("Got BTLEDisconnectError:%s", str(e))
-                if self.__failed_connects < 1:
-                    self.__failed_connects += 1
-                    _LOGGER.debug("Will try again.")
-                    time.sleep(2)
-                    self._connect(need_notifications)
-                else:
-                    raise e
+                self._timed(PHASE_NOTIFY_ENABLE, self._enable_notifications)
+            except TransportGattError:
+                if not self._handles_cached:
+                    raise
+                self._refresh_handles()
+        else:
+            _LOGGER.debug("Notifications was not requested")
+
+    def _discover_handles(self):
+        """Find characteristics on connected device and save their handles to cache"""
+        handles = self._transport.discover([self.uuid_notify, self.uuid_write])
+        self._notify_handle = handles.get(self.uuid_notify, 0)
+        self._write_handle = handles.get(self.uuid_write, 0)
+        self._cccd_handle = self._transport.find_cccd(self._notify_handle) if self._notify_handle else 0
+        self._handles_cached = False
+        if self.handle_cache is not None and self._notify_handle and self._write_handle:
+            self.handle_cache.put(self.mac, self.model,
+                                  GattHandles(self._write_handle, self._notify_handle, self._cccd_handle))
+
+    def _refresh_handles(self) -> bool:
+        """
+        Drop cached handles rejected by device and discover them again
+        :return: False if handles were not taken from cache, so there is nothing to refresh
+        """
+        if not self._handles_cached:
+            return False
+        _LOGGER.info("Cached handles of %s are not valid. Rediscovering", self.mac)
+        if self.handle_cache is not None:
+            self.handle_cache.invalidate(self.mac, self.model)
+        self._timed(PHASE_DISCOVERY, self._discover_handles)
+        self._timed(PHASE_NOTIFY_ENABLE, self._enable_notifications)
+        return True
+
+    def _checked_exchange(self, exchange: Callable, *args):
+        """
+        Run request-response exchange, checking handles taken from cache.
+
+        Device silently drops write commands to wrong handle, so handles that are changed since they were cached, e.g.
+        by firmware update, show up as response timeout. In this case cached handles are dropped, discovered again and
+        exchange is repeated once.
+        :param exchange: method that sends request and returns response
+        :return: exchange result
+        """
+        self._response_timed_out = False
+        try:
+            result = exchange(*args)
+        except TionException:
+            if not self._response_timed_out or not self._refresh_handles():
+                raise
+            result = exchange(*args)
+        # device answered, so handles are valid for this link
+        self._handles_cached = False
+        return result
 
     def _disconnect(self):
         if self.connection_status != "disc":
-            self._btle.disconnect()
+            self._transport.disconnect()
 
     def _try_write(self, request: bytearray):
-        _LOGGER.debug("Writing %s to %s", bytes(request).hex(), self.write.uuid)
-        return self.write.write(request)
+        try:
+            return self.__write(request)
+        except TransportGattError:
+            if not self._refresh_handles():
+                raise
+            return self.__write(request)
+
+    def __write(self, request: bytearray):
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Writing %s to %s", bytes(request).hex(), self._write_handle)
+        if self.recorder is not None:
+            self.recorder.record(FrameRecorder.DIRECTION_TX, self.mac, self._write_handle, request)
+        return self._timed(PHASE_WRITE, self._transport.write, self._write_handle, request)
+
+    def _try_write_frame(self, packets: Sequence[bytes]):
+        """Write all packets of one frame. Failed frame is retried as a whole, device drops incomplete frames"""
+        try:
+            return self.__write_frame(packets)
+        except TransportGattError:
+            if not self._refresh_handles():
+                raise
+            return self.__write_frame(packets)
+
+    def __write_frame(self, packets: Sequence[bytes]):
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug("Writing %s to %s", " ".join(bytes(p).hex() for p in packets), self._write_handle)
+        if self.recorder is not None:
+            for packet in packets:
+                self.recorder.record(FrameRecorder.DIRECTION_TX, self.mac, self._write_handle, packet)
+        with_response = not self._transport.can_write_without_response(self._write_handle)
+        return self._timed(PHASE_WRITE, self._transport.write_many, self._write_handle, packets, with_response)
+
+    def _timed(self, phase: str, action: Callable, *args):
+        """Call action and report its duration as phase to self.metrics"""
+        if self.metrics is None:
+            return action(*args)
+        started = time.monotonic()
+        try:
+            return action(*args)
+        finally:
+            self.metrics.timing(self.mac, phase, time.monotonic() - started)
 
-    def _do_action(self, action: Callable, max_tries: int = 3, *args, **kwargs):
-        tries: int = 0
-        while tries < max_tries:
-            _LOGGER.debug("Doing " + action.__name__ + ". Attempt " + str(tries + 1) + "/" + str(max_tries))
-            try:
-                response = action(*args, **kwargs)
-                break
-            except Exception as e:
-                tries += 1
-                _LOGGER.warning("Got exception while " + action.__name__ + ": " + str(e))
-                pass
-        else:
-            if action.__name__ == '_connect':
+    def _count(self, counter: str, value: int = 1):
+        if self.metrics is not None:
+            self.metrics.count(self.mac, counter, value)
+
+    def _handle_notification(self, handle: int, data: bytes):
+        if self.recorder is not None:
+            self.recorder.record(FrameRecorder.DIRECTION_RX, self.mac, handle, data)
+        self._delegation.handleNotification(handle, data)
+
+    def _do_action(self, action: Callable, *args, **kwargs):
+        name = action.__name__
+
+        def on_retry(e: Exception, attempt: int, delay: float):
+            self._count(COUNTER_ACTION_RETRIES)
+            _LOGGER.warning("Got exception while %s (attempt %d/%d): %s", name, attempt, self.action_retry.max_tries, e)
+
+        try:
+            # nothing reconnects between attempts, so lost link is not retried
+            return self.action_retry.run(lambda: action(*args, **kwargs), on_retry=on_retry,
+                                         fatal=(TransportDisconnected,))
+        except Exception as e:
+            if name == '_connect':
                 message = "Could not connect to " + self.mac
-            elif action.__name__ == '__try_write':
-                message = "Could not write request + " + kwargs['request'].hex()
-            elif action.__name__ == '__try_get_state':
-                message = "Could not get updated state"
+            elif name == '_try_write':
+                message = "Could not write request " + bytes(kwargs['request']).hex()
+            elif name == '_try_write_frame':
+                message = "Could not write request " + "".join(bytes(p).hex() for p in kwargs['packets'])
             else:
-                message = "Could not do " + action.__name__
+                message = "Could not do " + name
 
-            raise TionException(action.__name__, message)
+            self._count(COUNTER_FAILED_ACTIONS)
+            raise TionException(name, "%s: %s" % (message, e)) from e
 
-        return response
+    def _drain_notifications(self):
+        """Drop notifications left from previous requests on this link"""
+        while self._transport.wait_for_notifications(0):
+            pass
+        if self._delegation.haveNewData:
+            _LOGGER.debug("Dropping %d stale notifications", len(self._delegation._data))
+        self._delegation.clear()
+
+    def _wait_for_response(self, collect: Callable[[bytes], bool], timeout: float = None) -> bool:
+        """
+        Pass notifications to collect until it reports complete response
+        :param collect: called with every notification, returns True when response is complete
+        :param timeout: overall deadline for response in seconds. Default is self.response_timeout
+        :return: True if response is complete, False if deadline passed
+        """
+        if timeout is None:
+            timeout = self.response_timeout
+        complete = self._timed(PHASE_WAIT, self.__collect_until, collect, time.monotonic() + timeout)
+        if not complete:
+            self._count(COUNTER_TIMEOUTS)
+            self._response_timed_out = True
+        return complete
+
+    def __collect_until(self, collect: Callable[[bytes], bool], deadline: float) -> bool:
+        while True:
+            while self._delegation.haveNewData:
+                if collect(self._delegation.data):
+                    return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # returns as soon as notification is delivered
+            self._transport.wait_for_notifications(remaining)
 
     def _enable_notifications(self):
         _LOGGER.debug("Enabling notification")
-        setup_data = b"\x01\x00"
-
-        _LOGGER.debug("Notify handler is %s", self.notify.getHandle())
-        notify_handle = self.notify.getHandle() + 1
-
-        _LOGGER.debug("Will write %s to %s handle", setup_data, notify_handle)
-        result = self._btle.writeCharacteristic(notify_handle, setup_data, withResponse=True)
-        _LOGGER.debug("Result is %s", result)
-        self._btle.withDelegate(self._delegation)
-        _LOGGER.debug("Delegation enabled")
-        try:
-            data = self.notify.read()
-            _LOGGER.debug("First read done. Data is %s", bytes(data).hex())
-        except btle.BTLEDisconnectError as e:
-            _LOGGER.critical("_enable_notifications: got '%s' while first read! Could not continue!", str(e))
-            raise e
-
-        self._delegation.setReadTopic(self.notify)
+        _LOGGER.debug("Notify handler is %s", self._notify_handle)
+        self._transport.subscribe(self._notify_handle, self._handle_notification, self._cccd_handle)
         _LOGGER.debug("enable_notification is done")
 
     @property
@@ -489,12 +816,11 @@ class tion(TionDummy):
 
     def pair(self):
         _LOGGER.debug("Pairing")
-        self._connect(need_notifications=False)
+        # pair command gets no answer, so handles are discovered
+        self._connect(need_notifications=False, use_cache=False)
         _LOGGER.debug("Connected. BT pairing ...")
         try:
-            # use private methods to avoid disconnect if already paired
-            self._btle._writeCmd('pair' + '\n')
-            rsp = self._btle._waitResp('mgmt')
+            rsp = self._transport.pair()
             _LOGGER.debug("Got response while sending pair command: %s", rsp)
             try:
                 estat = rsp['estat'][0]
@@ -521,7 +847,7 @@ class tion(TionDummy):
             self._pair()
             _LOGGER.debug("Device pair is done")
         except Exception as e:
-            _LOGGER.critical(f"Got exception while pair {type(e).__name__}: {str(e)}")
+            _LOGGER.critical("Got exception while pair %s: %s", type(e).__name__, e)
             raise TionException('pair', f"{type(e).__name__}: {str(e)}")
         finally:
             _LOGGER.debug("disconnected")
@@ -535,7 +861,7 @@ class tion(TionDummy):
         if self.__connections_count < 0:
             self.__connections_count = 0
 
-        if self.__connections_count == 0:
+        if self.__connections_count == 0 or self.connection_status == "disc":
             self._connect()
 
         self.__connections_count += 1
@@ -544,3 +870,132 @@ class tion(TionDummy):
         self.__connections_count -= 1
         if self.__connections_count <= 0:
             self._disconnect()
+
+
+class TionSession:
+    """
+    Keeps link to the device between get() and set() calls.
+
+    Link is dropped after idle_timeout seconds without requests and restored by the next request. If link was lost
+    during request, request is repeated once over the new link.
+
+    After listen() link is kept until session is closed, and states sent by device on its own are passed to
+    device subscribers.
+    """
+
+    def __init__(self, device: tion, idle_timeout: float):
+        self._device = device
+        self._idle_timeout = idle_timeout
+        self._idle_timer: Optional[threading.Timer] = None
+        self._opened = False
+        self._listener: Optional[threading.Thread] = None
+        self._stop_listening = threading.Event()
+
+    @property
+    def device(self) -> tion:
+        return self._device
+
+    def open(self) -> None:
+        with self._device._lock:
+            if not self._opened:
+                self._device.connect()
+                self._opened = True
+        self._schedule_idle()
+
+    def close(self) -> None:
+        self._cancel_idle()
+        self._stop_listening.set()
+        if self._listener is not None and self._listener is not threading.current_thread():
+            self._listener.join()
+        self._listener = None
+        with self._device._lock:
+            if self._opened:
+                self._opened = False
+                self._device.disconnect()
+
+    def listen(self, poll_interval: float = 0.2) -> None:
+        """
+        Start background thread that checks link for notifications every poll_interval seconds and keeps link open.
+        Use device.subscribe() to get states.
+        :param poll_interval: seconds between checks
+        :return: None
+        """
+        if not self._opened:
+            raise TionException("session", "Session is closed")
+        if self._listener is not None:
+            return
+        self._cancel_idle()
+        self._stop_listening.clear()
+        self._listener = threading.Thread(target=self._listen, args=(poll_interval,),
+                                          name="tion-listen-%s" % self._device.mac, daemon=True)
+        self._listener.start()
+
+    def _listen(self, poll_interval: float):
+        while not self._stop_listening.wait(poll_interval):
+            try:
+                with self._device._lock:
+                    if not self._opened:
+                        return
+                    if self._device.connection_status == "disc":
+                        self._device._connect()
+                    self._device._receive_notifications()
+            except (TransportDisconnected, TionException) as e:
+                _LOGGER.debug("%s: listening failed: %s", self._device.mac, e)
+
+    def _schedule_idle(self) -> None:
+        self._cancel_idle()
+        if self._listener is not None:
+            return
+        self._idle_timer = threading.Timer(self._idle_timeout, self._on_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _cancel_idle(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _on_idle(self) -> None:
+        with self._device._lock:
+            if self._opened:
+                _LOGGER.debug("%s: session is idle, disconnecting", self._device.mac)
+                self._device._disconnect()
+
+    def _run(self, action: Callable, *args):
+        if not self._opened:
+            raise TionException("session", "Session is closed")
+        self._cancel_idle()
+        try:
+            with self._device._lock:
+                try:
+                    return action(*args)
+                except (TransportDisconnected, TionException):
+                    if self._device.connection_status != "disc":
+                        raise
+                    _LOGGER.debug("%s: link was lost, trying again", self._device.mac)
+                    return action(*args)
+        finally:
+            self._schedule_idle()
+
+    def get(self) -> dict:
+        return self._run(self._device.get)
+
+    def get_state(self) -> TionState:
+        return self._run(self._device.get_state)
+
+    def set(self, new_settings: dict = None, max_state_age: float = None, confirm: bool = False) -> Optional[dict]:
+        new_settings = self._device._normalize_settings(new_settings)
+        coalescer = self._device.coalescer
+        if coalescer is None:
+            return self._run(self._device._apply_settings, new_settings, max_state_age, confirm)
+        # batch is awaited without device lock: its leader may be another thread that needs the lock to write
+        result = coalescer.submit(new_settings, max_state_age, confirm,
+                                  apply=lambda *args: self._run(self._device._apply_settings, *args))
+        return result if confirm else None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
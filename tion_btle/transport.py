@@ -0,0 +1,366 @@
+import abc
+import logging
+from typing import Callable, Dict, Iterable, Optional, Sequence
+
+if __package__ == "":
+    from tion_btle.exceptions import TionException
+else:
+    from .exceptions import TionException
+
+_LOGGER = logging.getLogger(__name__)
+
+btle = None
+"""bluepy.btle, imported by the first BluepyTransport so that package may be used without bluepy"""
+
+
+def _import_bluepy():
+    global btle
+    if btle is None:
+        from bluepy import btle as module
+        btle = module
+
+
+NotificationCallback = Callable[[int, bytes], None]
+
+
+class TransportDisconnected(TionException):
+    """Link to the device was lost or could not be established"""
+    def __init__(self, message: str):
+        super().__init__("transport", message)
+
+
+class TransportGattError(TionException):
+    """Device rejected operation, e.g. handle is not valid"""
+    def __init__(self, message: str):
+        super().__init__("transport", message)
+
+
+class Transport(abc.ABC):
+    """
+    GATT client used by tion to talk to a breezer.
+
+    Characteristics are addressed by value handles obtained from discover().
+    """
+    adapter: Optional[int] = None
+    """Index of bluetooth adapter used by the next connect(), None for system default"""
+
+    @property
+    @abc.abstractmethod
+    def connection_status(self) -> str:
+        """ Link state
+        Returns:
+          "disc" if there is no link to device, anything else otherwise
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def connect(self, mac: str) -> None:
+        """ Establish link to device
+
+        Args:
+          mac: device MAC address
+        Raises:
+          TransportDisconnected if device is not reachable
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def disconnect(self) -> None:
+        """Drop link to device. Pending notifications are discarded."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def discover(self, uuids: Iterable[str]) -> Dict[str, int]:
+        """ Find characteristics
+
+        Args:
+          uuids: characteristic UUIDs to look for
+        Returns:
+          dictionary uuid -> value handle for every found characteristic
+        """
+        raise NotImplementedError()
+
+    def find_cccd(self, handle: int) -> int:
+        """ Find client characteristic configuration descriptor
+
+        Args:
+          handle: characteristic value handle
+        Returns:
+          descriptor handle. Default is the handle that follows characteristic value
+        """
+        return handle + 1
+
+    @abc.abstractmethod
+    def write(self, handle: int, data: bytes, with_response: bool = False) -> None:
+        """ Write value to characteristic
+
+        Args:
+          handle: characteristic value handle
+          data: bytes to write
+          with_response: wait for write confirmation from device
+        """
+        raise NotImplementedError()
+
+    def write_many(self, handle: int, packets: Sequence[bytes], with_response: bool = False) -> None:
+        """ Write several values to characteristic one after another, e.g. packets of one frame
+
+        Default implementation writes them one by one, transport may pipeline them.
+
+        Args:
+          handle: characteristic value handle
+          packets: values to write, in order
+          with_response: wait for write confirmation from device
+        """
+        for packet in packets:
+            self.write(handle, packet, with_response)
+
+    def can_write_without_response(self, handle: int) -> bool:
+        """ Check if characteristic accepts write commands
+
+        Args:
+          handle: characteristic value handle
+        Returns:
+          False if discover() found that characteristic requires write request, True otherwise
+        """
+        return True
+
+    @abc.abstractmethod
+    def read(self, handle: int) -> bytes:
+        """ Read characteristic value
+
+        Args:
+          handle: characteristic value handle
+        Returns:
+          characteristic value
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def subscribe(self, handle: int, callback: NotificationCallback, cccd_handle: int = None) -> None:
+        """ Enable notifications for characteristic
+
+        Args:
+          handle: characteristic value handle
+          callback: will be called with (handle, data) for every notification
+          cccd_handle: handle of characteristic configuration descriptor, default is find_cccd(handle)
+        Raises:
+          TransportGattError if device rejected one of handles
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def wait_for_notifications(self, timeout: float) -> bool:
+        """ Wait for one notification and pass it to subscriber
+
+        Args:
+          timeout: seconds to wait
+        Returns:
+          True if notification was delivered, False on timeout
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def pair(self) -> dict:
+        """ Perform bluetooth pairing with connected device
+
+        Returns:
+          management response, as returned by bluez: dictionary with "code" and optional "estat"/"emsg" lists
+        """
+        raise NotImplementedError()
+
+
+class _BluepyDelegation:
+    """Notification handler for bluepy Peripheral, same interface as btle.DefaultDelegate"""
+    def __init__(self, transport: "BluepyTransport"):
+        self.__transport = transport
+        self.callback = None
+        self.read_topic = None
+        self.suspended = False
+        """Reads are postponed, e.g. while helper responses to pipelined writes are pending"""
+        self._read_postponed = False
+
+    def handleNotification(self, handle: int, data: bytes):
+        if self.callback is not None:
+            self.callback(handle, data)
+        if self.read_topic is not None:
+            if self.suspended:
+                self._read_postponed = True
+            else:
+                self.__transport.read(self.read_topic)
+
+    def resume(self, read: bool = True):
+        """
+        Allow reads again
+        :param read: do read postponed while suspended
+        """
+        self.suspended = False
+        postponed, self._read_postponed = self._read_postponed, False
+        if read and postponed and self.read_topic is not None:
+            self.__transport.read(self.read_topic)
+
+
+class BluepyTransport(Transport):
+    """Transport over bluez using bluepy"""
+    uuid_cccd = "00002902-0000-1000-8000-00805f9b34fb"
+    max_in_flight: int = 4
+    """Writes of write_many() sent to bluepy helper before waiting for their confirmations"""
+
+    def __init__(self, adapter: int = None):
+        """
+        :param adapter: index of hci adapter, None for system default
+        """
+        _import_bluepy()
+        self.adapter = adapter
+        self._peripheral = btle.Peripheral(None)
+        self._delegation = _BluepyDelegation(self)
+        self._properties: Dict[int, int] = {}
+
+    @property
+    def connection_status(self) -> str:
+        connection_status = "disc"
+        try:
+            connection_status = self._peripheral.getState()
+        except btle.BTLEInternalError as e:
+            if str(e) == "Helper not started (did you call connect()?)":
+                pass
+            else:
+                raise e
+        except btle.BTLEDisconnectError as e:
+            pass
+        except BrokenPipeError as e:
+            self._peripheral = btle.Peripheral(None)
+
+        return connection_status
+
+    def connect(self, mac: str) -> None:
+        try:
+            self._peripheral.connect(mac, btle.ADDR_TYPE_RANDOM, iface=self.adapter)
+        except btle.BTLEDisconnectError as e:
+            raise TransportDisconnected(str(e)) from e
+
+    def disconnect(self) -> None:
+        self._delegation.read_topic = None
+        if self.connection_status != "disc":
+            self._peripheral.disconnect()
+
+    def discover(self, uuids: Iterable[str]) -> Dict[str, int]:
+        handles = {}
+        try:
+            for tc in self._peripheral.getCharacteristics():
+                for uuid in uuids:
+                    if tc.uuid == uuid:
+                        handles[uuid] = tc.getHandle()
+                        self._properties[handles[uuid]] = tc.properties
+        except btle.BTLEDisconnectError as e:
+            raise TransportDisconnected(str(e)) from e
+        return handles
+
+    def find_cccd(self, handle: int) -> int:
+        try:
+            for descriptor in self._peripheral.getDescriptors(handle + 1, handle + 3):
+                if descriptor.uuid == self.uuid_cccd:
+                    return descriptor.handle
+        except btle.BTLEDisconnectError as e:
+            raise TransportDisconnected(str(e)) from e
+        except btle.BTLEGattError as e:
+            _LOGGER.debug("Descriptors discovery failed: %s", str(e))
+        return super().find_cccd(handle)
+
+    def write(self, handle: int, data: bytes, with_response: bool = False) -> None:
+        try:
+            self._peripheral.writeCharacteristic(handle, bytes(data), withResponse=with_response)
+        except btle.BTLEDisconnectError as e:
+            raise TransportDisconnected(str(e)) from e
+        except btle.BTLEGattError as e:
+            raise TransportGattError(str(e)) from e
+
+    def write_many(self, handle: int, packets: Sequence[bytes], with_response: bool = False) -> None:
+        """
+        Pipelined writes: up to max_in_flight commands are passed to bluepy helper before the first confirmation is
+        read, instead of one helper round trip per packet. Same as writeCharacteristic() does, but split in halves.
+
+        Notification handler does not read characteristic until all confirmations are read, as such read would take
+        confirmation of pending write as its own response.
+        """
+        command = "wrr" if with_response else "wr"
+        in_flight = 0
+        error = None
+        self._delegation.suspended = True
+        try:
+            try:
+                for packet in packets:
+                    if in_flight >= self.max_in_flight:
+                        in_flight -= 1
+                        self._peripheral._getResp('wr')
+                    self._peripheral._writeCmd("%s %X %s\n" % (command, handle, bytes(packet).hex()))
+                    in_flight += 1
+            except btle.BTLEDisconnectError:
+                raise
+            except btle.BTLEException as e:
+                # e.g. BTLEGattError, or BTLEInternalError if helper response was taken by somebody else
+                error = e
+            finally:
+                # every sent command is confirmed by helper, read them all to keep responses in sync with commands
+                while in_flight:
+                    in_flight -= 1
+                    try:
+                        self._peripheral._getResp('wr')
+                    except btle.BTLEDisconnectError:
+                        raise
+                    except btle.BTLEException as e:
+                        error = error or e
+        except btle.BTLEDisconnectError as e:
+            self._delegation.resume(read=False)
+            raise TransportDisconnected(str(e)) from e
+        except BaseException:
+            self._delegation.resume(read=False)
+            raise
+        self._delegation.resume(read=error is None)
+        if error is not None:
+            raise TransportGattError(str(error)) from error
+
+    def can_write_without_response(self, handle: int) -> bool:
+        properties = self._properties.get(handle)
+        return properties is None or bool(properties & btle.Characteristic.props["WRITE_NO_RESP"])
+
+    def read(self, handle: int) -> bytes:
+        try:
+            return self._peripheral.readCharacteristic(handle)
+        except btle.BTLEDisconnectError as e:
+            raise TransportDisconnected(str(e)) from e
+        except btle.BTLEGattError as e:
+            raise TransportGattError(str(e)) from e
+
+    def subscribe(self, handle: int, callback: NotificationCallback, cccd_handle: int = None) -> None:
+        setup_data = b"\x01\x00"
+        if cccd_handle is None:
+            cccd_handle = self.find_cccd(handle)
+
+        _LOGGER.debug("Will write %s to %s handle", setup_data, cccd_handle)
+        try:
+            result = self._peripheral.writeCharacteristic(cccd_handle, setup_data, withResponse=True)
+            _LOGGER.debug("Result is %s", result)
+            self._delegation.callback = callback
+            self._peripheral.withDelegate(self._delegation)
+            _LOGGER.debug("Delegation enabled")
+            data = self._peripheral.readCharacteristic(handle)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("First read done. Data is %s", bytes(data).hex())
+        except btle.BTLEDisconnectError as e:
+            _LOGGER.critical("subscribe: got '%s' while first read! Could not continue!", str(e))
+            raise TransportDisconnected(str(e)) from e
+        except btle.BTLEGattError as e:
+            raise TransportGattError(str(e)) from e
+
+        self._delegation.read_topic = handle
+
+    def wait_for_notifications(self, timeout: float) -> bool:
+        try:
+            return self._peripheral.waitForNotifications(timeout)
+        except btle.BTLEDisconnectError as e:
+            raise TransportDisconnected(str(e)) from e
+
+    def pair(self) -> dict:
+        # use private methods to avoid disconnect if already paired
+        self._peripheral._writeCmd('pair' + '\n')
+        return self._peripheral._waitResp('mgmt')